@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import scipy
+
+from engine import (MANDATORY_GROUP, SPECIAL_SOLO, prepare_pmf, classify_semesters, filter_pmf_by_degree,
+                    select_semester_papers, idm_courses_from_pmf, build_enrollment_index,
+                    auto_schedule_exams_by_program_gap, auto_schedule_exams_by_program_dense,
+                    auto_schedule_exams_multi_slot, auto_schedule_exams_by_coloring, flatten_schedule_to_list,
+                    check_full_schedule_conflict, find_clashes, resolve_conflicts, build_timetable,
+                    build_programme_timetables, student_load_metrics, term_runs, schedule_term_jointly,
+                    clash_delta, gap_exam_days)
+from seating import allocate_seats
+
+# (degree prefix, number of semesters, share of programmes)
+DEGREE_SHAPES = [("U", 8, 0.6), ("P", 4, 0.2), ("M", 4, 0.1), ("BPAM", 8, 0.1)]
+CC_WEIGHTS = {"DSC": 0.55, "IDM": 0.15, "SEC": 0.1, "AEC": 0.1, "VAC": 0.1}
+
+SCALES = {
+    "small": {"programmes": 10, "papers_per_semester": 6, "students": 2000, "code_columns": 6, "window_days": 60},
+    "medium": {"programmes": 40, "papers_per_semester": 8, "students": 20000, "code_columns": 8, "window_days": 180},
+    "large": {"programmes": 120, "papers_per_semester": 10, "students": 100000, "code_columns": 10, "window_days": 720},
+}
+START_DATE = date(2025, 5, 1)
+WEEKENDS = {6}
+HALLS = 40
+HALL_LAYOUT = (8, 10)
+
+
+def synthetic_pmf(programmes=10, papers_per_semester=6, seed=0):
+    rng = np.random.default_rng(seed)
+    shapes, shares = [s[:2] for s in DEGREE_SHAPES], np.array([s[2] for s in DEGREE_SHAPES])
+    cc_values, cc_weights = list(CC_WEIGHTS), np.array(list(CC_WEIGHTS.values()))
+    rows = []
+    for p in range(programmes):
+        prefix, n_semesters = shapes[rng.choice(len(shapes), p=shares / shares.sum())]
+        subject = "".join(chr(ord("A") + (p // 26 ** k) % 26) for k in (2, 1, 0))
+        programme = f"{prefix}-{subject}"
+        for sem in range(1, n_semesters + 1):
+            for n in range(1, papers_per_semester + 1):
+                if prefix == "BPAM":
+                    code = f"BPAM-{sem}0{n}{p:02d}"
+                else:
+                    code = f"{prefix}{subject}-{sem}{n:02d}"
+                rows.append((code, f"{subject} Paper {sem}.{n}", programme, rng.choice(cc_values, p=cc_weights)))
+    for code in sorted(MANDATORY_GROUP | SPECIAL_SOLO):
+        rows.append((code, f"Ability Enhancement {code}", "Common", "AEC"))
+    pmf_df = pd.DataFrame(rows, columns=['Paper Code', 'Paper Title', 'Programme Name', 'CC'])
+    # IDM papers are offered to other programmes too, which duplicates their codes across programmes
+    idm = pmf_df[pmf_df['CC'] == "IDM"]
+    shared = idm.sample(frac=0.5, random_state=seed)
+    shared = shared.assign(**{'Programme Name': rng.choice(pmf_df['Programme Name'].unique(), len(shared))})
+    return prepare_pmf(pd.concat([pmf_df, shared], ignore_index=True))
+
+def synthetic_nrf(pmf_df, students=2000, code_columns=6, elective_overlap=0.3, seed=0):
+    """One row per student with Programme Name, Semester and `code_columns` Paper N Code columns.
+
+    Students take their programme's DSC papers for the semester first; each remaining column is an
+    elective drawn from another programme's IDM papers with probability `elective_overlap`, otherwise
+    from the student's own programme. UG semester II students also take one mandatory language paper.
+    """
+    rng = np.random.default_rng(seed)
+    papers = pmf_df.drop_duplicates(subset=['Paper Code', 'Programme Name'])
+    papers = papers.assign(Semester=classify_semesters(papers['Paper Code'])['Derived Semester'])
+    papers = papers.dropna(subset=['Semester'])
+    # the shared language and ability papers are handed out below rather than forming a programme of their own
+    pools = {key: group for key, group in papers.groupby(['Programme Name', 'Semester']) if key[0] != "Common"}
+    idm_by_semester = {sem: group['Paper Code'].unique() for sem, group in papers[papers['Is IDM']].groupby('Semester')}
+    keys = list(pools)
+    assignment = rng.integers(0, len(keys), students)
+    codes = np.full((students, code_columns), None, dtype=object)
+    for k, (programme, semester) in enumerate(keys):
+        members = np.flatnonzero(assignment == k)
+        if not len(members):
+            continue
+        pool = pools[(programme, semester)]
+        core = pool.loc[~pool['Is IDM'], 'Paper Code'].unique()[:code_columns]
+        codes[members, :len(core)] = core
+        n_electives = code_columns - len(core)
+        if n_electives <= 0:
+            continue
+        own = pool['Paper Code'].unique()
+        other = idm_by_semester.get(semester, own)
+        draw_other = rng.random((len(members), n_electives)) < elective_overlap
+        electives = np.where(draw_other,
+                             rng.choice(other, (len(members), n_electives)),
+                             rng.choice(own, (len(members), n_electives)))
+        codes[members, len(core):] = electives
+    # UG semester II students take exactly one of the mandatory language papers
+    languages = sorted(MANDATORY_GROUP)
+    takes_language = np.array([keys[k][0].startswith("U-") and keys[k][1] == "II" for k in assignment], dtype=bool)
+    codes[takes_language, -1] = rng.choice(languages, int(takes_language.sum()))
+    nrf_df = pd.DataFrame(codes, columns=[f"Paper {c + 1} Code" for c in range(code_columns)])
+    nrf_df.insert(0, "Semester", [keys[k][1] for k in assignment])
+    nrf_df.insert(0, "Programme Name", [keys[k][0] for k in assignment])
+    nrf_df.insert(0, "Regd. No.", [f"R{seed:02d}{i:07d}" for i in range(students)])
+    nrf_df.insert(0, "Sl. No.", np.arange(1, students + 1))
+    return nrf_df
+
+
+def time_call(func, repeat):
+    runs = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - started)
+    return result, {"min": min(runs), "median": statistics.median(runs), "runs": runs}
+
+def run_scale(name, params, repeat=3, seed=0):
+    pmf_df = synthetic_pmf(params["programmes"], params["papers_per_semester"], seed)
+    nrf_df = synthetic_nrf(pmf_df, params["students"], params["code_columns"], params.get("elective_overlap", 0.3), seed)
+    end_date = START_DATE + timedelta(days=params["window_days"])
+    holidays = []
+    results = []
+
+    def record(case, func, **size):
+        value, seconds = time_call(func, repeat)
+        results.append({"scale": name, "case": case, "seconds": seconds, "size": size})
+        print(f"{name:>8} {case:<38} {seconds['median'] * 1000:10.1f} ms", file=sys.stderr)
+        return value
+
+    record("extract_semester", lambda: classify_semesters(pmf_df['Paper Code']), rows=len(pmf_df))
+    degree_df = record("filter_pmf_by_degree", lambda: filter_pmf_by_degree(pmf_df, "UG"), rows=len(pmf_df))
+    index = record("build_enrollment_index", lambda: build_enrollment_index(nrf_df),
+                   students=len(nrf_df), code_columns=params["code_columns"])
+    record("student_count", index.student_counts_frame, courses=len(index.course_codes))
+    # the busiest derived semester gives the largest single scheduling run
+    semester = degree_df['Derived Semester'].value_counts().idxmax()
+    papers = record("select_semester_papers", lambda: select_semester_papers(degree_df, semester, index),
+                    rows=len(degree_df))
+    courses = papers['Paper Code'].unique().tolist()
+    n = len(courses)
+
+    gap = record("auto_schedule_exams_by_program_gap",
+                 lambda: auto_schedule_exams_by_program_gap(courses, papers, START_DATE, end_date, holidays, WEEKENDS,
+                                                            semester, rng=random.Random(seed)),
+                 courses=n, semester=semester)
+    record("auto_schedule_exams_by_program_dense",
+           lambda: auto_schedule_exams_by_program_dense(courses, START_DATE, end_date, holidays, WEEKENDS), courses=n)
+    record("auto_schedule_exams_multi_slot",
+           lambda: auto_schedule_exams_multi_slot(courses, START_DATE, end_date, holidays, WEEKENDS), courses=n)
+    record("gap_exam_days", lambda: gap_exam_days(START_DATE, end_date, holidays, WEEKENDS),
+           days=params["window_days"])
+    record("auto_schedule_exams_by_coloring",
+           lambda: auto_schedule_exams_by_coloring(courses, index, START_DATE, end_date, holidays, WEEKENDS, semester),
+           courses=n)
+    # every degree and semester of the term in one run
+    runs = term_runs(pmf_df, index)
+    record("schedule_term_jointly",
+           lambda: schedule_term_jointly(runs, index, START_DATE, end_date, holidays, WEEKENDS),
+           courses=len({c for _, _, papers in runs for c in papers['Paper Code']}), runs=len(runs))
+    if gap is None:
+        print(f"{name}: gap scheduling did not fit {n} papers, skipping schedule-dependent cases", file=sys.stderr)
+        return results
+
+    exam_list = flatten_schedule_to_list(gap)
+    record("check_full_schedule_conflict", lambda: check_full_schedule_conflict(index, exam_list), exams=len(exam_list))
+    record("find_clashes", lambda: find_clashes(index, exam_list), exams=len(exam_list))
+    # a timetable-editor edit: a handful of papers moved onto the first exam day
+    edited = [(code, exam_list[0][1], slot) if i % (len(exam_list) // 5 or 1) == 0 else (code, dt_obj, slot)
+              for i, (code, dt_obj, slot) in enumerate(exam_list)]
+    record("clash_delta", lambda: clash_delta(index, exam_list, edited), exams=len(exam_list))
+    record("student_load_metrics", lambda: student_load_metrics(index, exam_list), exams=len(exam_list),
+           students=index.n_students)
+    halls = pd.DataFrame({'Hall': [f"Hall {h + 1}" for h in range(HALLS)], 'Rows': HALL_LAYOUT[0],
+                          'Columns': HALL_LAYOUT[1]})
+    record("allocate_seats", lambda: allocate_seats(index, exam_list, halls, interleave=True), exams=len(exam_list),
+           halls=HALLS)
+    idm_courses = idm_courses_from_pmf(pmf_df)
+    record("resolve_conflicts", lambda: resolve_conflicts(exam_list, index, holidays, WEEKENDS, idm_courses=idm_courses),
+           exams=len(exam_list))
+    record("build_timetable", lambda: build_timetable(exam_list, papers), exams=len(exam_list), rows=len(papers))
+    record("build_programme_timetables", lambda: build_programme_timetables(exam_list, papers),
+           exams=len(exam_list), programmes=papers['Programme Name'].nunique())
+    return results
+
+def environment():
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scipy": scipy.__version__,
+    }
+
+def compare(results, baseline, threshold=1.25):
+    # best-of-repeat times are the least noisy figure to compare across runs
+    previous = {(r["scale"], r["case"]): r["seconds"]["min"] for r in baseline["results"]}
+    for r in results:
+        before = previous.get((r["scale"], r["case"]))
+        if before:
+            ratio = r["seconds"]["min"] / before
+            flag = "  REGRESSION" if ratio > threshold else ""
+            print(f"{r['scale']:>8} {r['case']:<38} {ratio:6.2f}x{flag}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark TimeTable PRO hot paths on synthetic PMF/NRF data.")
+    parser.add_argument("--scale", action="append", choices=list(SCALES), help="repeatable; default small and medium")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="", help="free-form version label stored in the report")
+    parser.add_argument("--output", default="benchmark.json", help="JSON report path")
+    parser.add_argument("--compare", metavar="JSON", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    parser.add_argument("--dump-data", metavar="DIR", help="also write the synthetic PMF/NRF CSVs of each scale")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = []
+    for name in args.scale or ["small", "medium"]:
+        if args.dump_data:
+            os.makedirs(args.dump_data, exist_ok=True)
+            params = SCALES[name]
+            pmf_df = synthetic_pmf(params["programmes"], params["papers_per_semester"], args.seed)
+            pmf_df.to_csv(os.path.join(args.dump_data, f"{name}_pmf.csv"), index=False)
+            synthetic_nrf(pmf_df, params["students"], params["code_columns"], seed=args.seed).to_csv(
+                os.path.join(args.dump_data, f"{name}_nrf.csv"), index=False)
+        results.extend(run_scale(name, SCALES[name], args.repeat, args.seed))
+    report = {"label": args.label, "environment": environment(), "seed": args.seed, "repeat": args.repeat,
+              "scales": {name: SCALES[name] for name in args.scale or ["small", "medium"]}, "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f), args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from functools import lru_cache
+
+DEFAULT_WEEKENDS = frozenset({6})
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+# business days are precomputed a few years at a time, so a long window or a later term rarely extends them
+SPAN_YEARS = 4
+
+
+def as_date(value):
+    # datetimes and Timestamps count by their calendar day
+    return value.date() if isinstance(value, datetime) else value
+
+
+class BusinessCalendar:
+    """Exam-eligible days (not a weekend, not a holiday) as sorted ordinals, queried by bisection.
+
+    The day list covers whole years around every date asked about and grows on demand, so window, next-day
+    and gap queries cost a bisection rather than a walk over the calendar.
+    """
+
+    def __init__(self, holidays=(), weekends=DEFAULT_WEEKENDS):
+        self.holidays = frozenset(as_date(d).toordinal() for d in holidays)
+        self.weekends = frozenset(weekends)
+        # (first covered ordinal, last covered ordinal, business-day ordinals), replaced as one value so
+        # scheduling threads can read while another extends it
+        self._span = (0, -1, [])
+        self._lock = threading.Lock()
+
+    def _days(self, first, last):
+        lo, hi, days = self._span
+        if lo <= first and last <= hi:
+            return days
+        with self._lock:
+            lo, hi, days = self._span
+            if hi < lo:
+                lo, hi = first, last
+            lo = date(max(date.fromordinal(min(lo, first)).year - 1, 1), 1, 1).toordinal()
+            hi = date(min(date.fromordinal(max(hi, last)).year + SPAN_YEARS, 9999), 12, 31).toordinal()
+            # ordinal 1 (0001-01-01) is a Monday
+            days = [d for d in range(lo, hi + 1) if (d - 1) % 7 not in self.weekends and d not in self.holidays]
+            self._span = (lo, hi, days)
+            return days
+
+    def is_valid(self, day):
+        day = as_date(day)
+        return day.weekday() not in self.weekends and day.toordinal() not in self.holidays
+
+    def ordinals(self, start, end):
+        """Ordinals of the valid days from start to end, both inclusive."""
+        first, last = as_date(start).toordinal(), as_date(end).toordinal()
+        if last < first:
+            return []
+        days = self._days(first, last)
+        return days[bisect_left(days, first):bisect_right(days, last)]
+
+    def valid_days(self, start, end):
+        return [date.fromordinal(d) for d in self.ordinals(start, end)]
+
+    def next_valid(self, day, end=None):
+        """The first valid day on or after `day`, or None when there is none up to `end`."""
+        first = as_date(day).toordinal()
+        last = as_date(end).toordinal() if end is not None else min(first + 366, date.max.toordinal())
+        while True:
+            days = self._days(first, last)
+            pos = bisect_left(days, first)
+            if pos < len(days) and days[pos] <= last:
+                return date.fromordinal(days[pos])
+            if end is not None or last >= date.max.toordinal():
+                return None
+            # a run of holidays longer than a year; keep looking
+            last = min(last + 366 * SPAN_YEARS, date.max.toordinal())
+
+    def gap_days(self, start, end, gap_days=2):
+        """Valid days from start to end at least `gap_days` calendar days apart, each as early as possible."""
+        first, last = as_date(start).toordinal(), as_date(end).toordinal()
+        if last < first:
+            return []
+        days = self._days(first, last)
+        exam_days = []
+        pos = bisect_left(days, first)
+        while pos < len(days) and days[pos] <= last:
+            exam_days.append(date.fromordinal(days[pos]))
+            pos = bisect_left(days, days[pos] + gap_days, pos + 1)
+        return exam_days
+
+    def free_day(self, start, end, taken=()):
+        """The first valid day from start to end that is not in `taken` (dates or "%Y-%m-%d" strings), or None."""
+        taken = {as_date(d) if not isinstance(d, str) else date.fromisoformat(d) for d in taken}
+        for d in self.ordinals(start, end):
+            day = date.fromordinal(d)
+            if day not in taken:
+                return day
+        return None
+
+
+@lru_cache(maxsize=32)
+def _shared_calendar(holidays, weekends):
+    return BusinessCalendar(holidays, weekends)
+
+def get_calendar(holidays=(), weekends=DEFAULT_WEEKENDS):
+    """The calendar for these holidays and weekends, shared by every scheduler call that uses the same ones."""
+    holidays = frozenset(as_date(d) for d in holidays if d is not None)
+    return _shared_calendar(holidays, frozenset(weekends))
@@ -0,0 +1,262 @@
+import argparse
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from engine import (DEFAULT_SLOTS, DEGREE_TYPES, SCHEDULING_MODES, SEMESTER_RULES, build_enrollment_index,
+                    idm_courses_from_pmf, filter_pmf_by_degree, derived_semesters, select_semester_papers,
+                    schedule_exams, flatten_schedule_to_list, find_clashes, clashes_to_frame, resolve_conflicts,
+                    optimize_schedule, build_timetable, build_programme_timetables, semester_rules_from_frame,
+                    student_load_metrics, student_load_summary, default_groups, term_runs, schedule_term_jointly,
+                    run_exam_list, papers_per_day_bounds)
+from export import EXPORT_FORMATS, export_bundle
+from ingest import load_holidays, load_pmf, load_nrf, load_nrf_index, read_upload
+from profiling import Profiler
+
+
+def read_table(loader, path):
+    with open(path, "rb") as f:
+        df, _ = loader(f.read(), path)
+    return df
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def parse_group(value):
+    # "2025-05-02:UCS-101,UCS-102" or "Name@2025-05-02:UCS-101,UCS-102"
+    head, codes = value.split(":", 1)
+    name, _, date_str = head.rpartition("@")
+    return {
+        "group_name": name or f"Group {date_str}",
+        "courses": [c.strip() for c in codes.split(",") if c.strip()],
+        "date": datetime.combine(parse_date(date_str), datetime.min.time()),
+    }
+
+def parse_slot(value):
+    # "09:00 - 10:30" or "09:00 - 10:30=400" for a slot with 400 seats
+    name, sep, seats = value.rpartition("=")
+    if not sep:
+        return value.strip(), None
+    return name.strip(), int(seats)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless TimeTable PRO scheduler.")
+    parser.add_argument("--pmf", required=True, help="Paper Master File (xlsx/xls/csv)")
+    parser.add_argument("--nrf", help="Nominal Role File (xlsx/xls/csv)")
+    parser.add_argument("--stream-nrf", action="store_true",
+                        help="read the NRF chunk by chunk and keep only the enrollment index")
+    parser.add_argument("--start", required=True, type=parse_date, help="first exam date, YYYY-MM-DD")
+    parser.add_argument("--end", type=parse_date, help="last exam date, YYYY-MM-DD (default: start + 15 days)")
+    parser.add_argument("--holiday", action="append", type=parse_date, default=[], help="holiday date, repeatable")
+    parser.add_argument("--holiday-file", action="append", default=[],
+                        help="holiday list as CSV/Excel (a date column) or ICS calendar, repeatable")
+    parser.add_argument("--weekend", action="append", type=int, default=None,
+                        help="weekday number treated as weekend (0=Mon .. 6=Sun), repeatable; default 6")
+    parser.add_argument("--degree", action="append", choices=DEGREE_TYPES, help="degree type, repeatable; default all")
+    parser.add_argument("--semester", action="append", help="mapped semester (I..VIII), repeatable; default all")
+    parser.add_argument("--semester-rules", help="CSV rule table (name, pattern, semester) replacing the built-in semester rules")
+    parser.add_argument("--mode", choices=SCHEDULING_MODES, default="gap")
+    parser.add_argument("--joint", action="store_true",
+                        help="schedule every selected degree and semester together against shared days and slots "
+                             "(coloring on the whole term, needs --nrf)")
+    parser.add_argument("--group", action="append", type=parse_group, default=[],
+                        help="combination group as [NAME@]YYYY-MM-DD:CODE1,CODE2 , repeatable")
+    parser.add_argument("--n-starts", type=int, default=32, help="seeded runs for --mode best-of-n")
+    parser.add_argument("--slot", action="append", type=parse_slot, default=[],
+                        help="exam slot as LABEL[=SEATS], repeatable, in sitting order; default 09:00 - 10:30")
+    parser.add_argument("--seats", type=int, help="seats for every slot without its own =SEATS (default unlimited)")
+    parser.add_argument("--time-limit", type=float, default=30.0, help="solver time limit in seconds for --mode exact")
+    parser.add_argument("--resolve", action="store_true", help="run conflict resolution after scheduling")
+    parser.add_argument("--optimize", type=float, default=0.0, metavar="SECONDS",
+                        help="local-search optimization budget per timetable")
+    parser.add_argument("--by-programme", action="store_true",
+                        help="also write one timetable CSV per programme")
+    parser.add_argument("--export", action="store_true",
+                        help="also write a zip bundle per timetable with XLSX, PDF and ICS outputs")
+    parser.add_argument("--export-format", action="append", choices=EXPORT_FORMATS,
+                        help="bundle format, repeatable; default all")
+    parser.add_argument("--no-personal", action="store_true", help="leave per-student timetables out of the bundle")
+    parser.add_argument("--halls", help="hall inventory (xlsx/xls/csv with Hall and Capacity and/or Rows, Columns); "
+                                        "writes a seating zip per timetable (needs --nrf)")
+    parser.add_argument("--interleave", action="store_true",
+                        help="alternate papers seat by seat within a hall instead of seating each paper in a block")
+    parser.add_argument("--student-load", action="store_true",
+                        help="also write per-student load metrics and a per-programme/semester summary (needs --nrf)")
+    parser.add_argument("--save-version", metavar="ACADEMIC_YEAR",
+                        help="save each timetable as a schedule version of its term in the project store")
+    parser.add_argument("--store", help="project store SQLite file for --save-version (default: TIMETABLE_STORE or "
+                                        "the app's store)")
+    parser.add_argument("--profile", metavar="JSON", help="write per-step timings and counters to this file")
+    parser.add_argument("--profile-memory", action="store_true", help="also trace peak memory per step (slower)")
+    parser.add_argument("--output-dir", default="timetable_output")
+    return parser
+
+def run(args):
+    pmf_df = read_table(load_pmf, args.pmf)
+    if args.nrf and args.stream_nrf:
+        index = read_table(load_nrf_index, args.nrf)
+    elif args.nrf:
+        index = build_enrollment_index(read_table(load_nrf, args.nrf))
+    else:
+        index = None
+    end_date = args.end or args.start + timedelta(days=15)
+    weekends = set(args.weekend) if args.weekend else {6}
+    holidays = list(args.holiday)
+    for path in args.holiday_file:
+        with open(path, "rb") as f:
+            holidays += load_holidays(f.read(), path)
+    holidays = sorted(set(holidays))
+    idm_courses = idm_courses_from_pmf(pmf_df)
+    rules = SEMESTER_RULES
+    if args.semester_rules:
+        with open(args.semester_rules, "rb") as f:
+            rules = semester_rules_from_frame(read_upload(f.read(), args.semester_rules))
+    slots = [name for name, _ in args.slot] or list(DEFAULT_SLOTS)
+    seat_capacity = {name: seats or args.seats for name, seats in args.slot} if args.slot else args.seats
+    os.makedirs(args.output_dir, exist_ok=True)
+    project_store = None
+    if args.save_version:
+        from store import STORE_PATH, ProjectStore
+        project_store = ProjectStore(args.store or STORE_PATH)
+    if args.halls:
+        with open(args.halls, "rb") as f:
+            args.halls_df = read_upload(f.read(), args.halls)
+
+    if index is not None:
+        index.student_counts_frame().to_csv(os.path.join(args.output_dir, "student_count.csv"), index=False)
+
+    if args.joint:
+        return run_joint(args, pmf_df, index, end_date, holidays, weekends, idm_courses, rules, slots, seat_capacity,
+                         project_store)
+
+    failed = 0
+    for degree_type in args.degree or DEGREE_TYPES:
+        degree_df = filter_pmf_by_degree(pmf_df, degree_type, rules)
+        for semester in args.semester or derived_semesters(degree_df):
+            papers = select_semester_papers(degree_df, semester, index)
+            courses = papers['Paper Code'].unique().tolist()
+            if not courses:
+                continue
+            label = f"{degree_type}_{semester}"
+            course_set = set(courses)
+            groups = [g for g in args.group if course_set.intersection(g["courses"])]
+            groups = default_groups(courses, semester, groups, args.start, end_date, holidays, weekends)
+            schedule, details = schedule_exams(courses, args.start, end_date, holidays, weekends, semester,
+                                               mode=args.mode, groups=groups, index=index, pmf_df=papers,
+                                               n_starts=args.n_starts, seat_capacity=seat_capacity, time_limit=args.time_limit,
+                                               slots=slots)
+            if schedule is None and args.mode == "exact":
+                print(f"{label}: exact solver found no feasible timetable ({details['status']})", file=sys.stderr)
+                failed += 1
+                continue
+            if schedule is None:
+                print(f"{label}: not enough valid business days or slot seats to schedule {len(courses)} papers", file=sys.stderr)
+                failed += 1
+                continue
+            exam_list = improve_schedule(args, flatten_schedule_to_list(schedule), index, holidays, weekends,
+                                         idm_courses, slots, seat_capacity, groups, papers,
+                                         *papers_per_day_bounds(semester))
+            if project_store is not None:
+                save_run(project_store, args.save_version, degree_type, semester, holidays, groups, exam_list,
+                         args.mode)
+            write_outputs(args, label, exam_list, papers, pmf_df, index)
+    return 1 if failed else 0
+
+def improve_schedule(args, exam_list, index, holidays, weekends, idm_courses, slots, seat_capacity, groups, papers,
+                     min_papers=None, max_papers=None, runs=None):
+    # papers per sitting from min_papers/max_papers, or from each of the joint runs' semesters
+    if index is not None and args.resolve:
+        exam_list, _ = resolve_conflicts(exam_list, index, holidays, weekends, idm_courses=idm_courses,
+                                         slots=slots, seat_capacity=seat_capacity)
+    if index is not None and args.optimize > 0:
+        fixed_courses = {c for g in groups for c in g["courses"]} | {"UELS-201"}
+        exam_list, _ = optimize_schedule(exam_list, index, holidays, weekends, time_limit=args.optimize,
+                                         fixed_courses=fixed_courses, min_papers_per_slot=min_papers,
+                                         max_papers_per_slot=max_papers, runs=runs, slots=slots,
+                                         seat_capacity=seat_capacity, pmf_df=papers)
+    return exam_list
+
+def save_run(project_store, academic_year, degree_type, semester, holidays, groups, exam_list, mode):
+    term_id = project_store.term_id(academic_year, degree_type, semester)
+    project_store.save_term(term_id, holidays=holidays, groups=groups)
+    project_store.save_version(term_id, exam_list, f"cli {mode}", mode)
+
+def write_outputs(args, label, exam_list, papers, pmf_df, index):
+    _, timetable_df = build_timetable(exam_list, papers)
+    if timetable_df is not None:
+        timetable_df['Date'] = timetable_df['Date'].dt.strftime('%d/%m/%Y')
+        timetable_df.to_csv(os.path.join(args.output_dir, f"{label}_timetable.csv"), index=False)
+    if args.by_programme:
+        for programme, (_, programme_df) in build_programme_timetables(exam_list, papers).items():
+            programme_df['Date'] = programme_df['Date'].dt.strftime('%d/%m/%Y')
+            safe_name = re.sub(r"[^\w-]+", "_", programme).strip("_")
+            programme_df.to_csv(os.path.join(args.output_dir, f"{label}_{safe_name}_timetable.csv"), index=False)
+    if args.export:
+        with open(os.path.join(args.output_dir, f"{label}_export.zip"), "wb") as f:
+            export_bundle(f, exam_list, papers, index, formats=args.export_format or EXPORT_FORMATS,
+                          personal=not args.no_personal, name=f"{label}_timetable")
+    n_clashes = 0
+    if index is not None:
+        clash_df = clashes_to_frame(find_clashes(index, exam_list, include_students=True))
+        clash_df.to_csv(os.path.join(args.output_dir, f"{label}_conflicts.csv"), index=False)
+        n_clashes = len(clash_df)
+    if index is not None and args.halls:
+        from seating import allocate_seats, export_seating
+        seats_df, summary_df = allocate_seats(index, exam_list, args.halls_df, interleave=args.interleave)
+        with open(os.path.join(args.output_dir, f"{label}_seating.zip"), "wb") as f:
+            export_seating(f, seats_df, summary_df)
+    if index is not None and args.student_load:
+        load_df = student_load_metrics(index, exam_list, pmf_df)
+        load_df.to_csv(os.path.join(args.output_dir, f"{label}_student_load.csv"), index=False)
+        student_load_summary(load_df).to_csv(
+            os.path.join(args.output_dir, f"{label}_student_load_summary.csv"), index=False)
+    print(f"{label}: {len(exam_list)} exams, {n_clashes} clashing course pairs")
+
+def run_joint(args, pmf_df, index, end_date, holidays, weekends, idm_courses, rules, slots, seat_capacity,
+              project_store):
+    # one timetable for the whole term; per-run files are cut from it, and the "joint" files check all
+    # students against every run at once
+    if index is None:
+        print("--joint needs the Nominal Role File (--nrf)", file=sys.stderr)
+        return 1
+    runs = term_runs(pmf_df, index, args.degree or DEGREE_TYPES, args.semester, rules)
+    schedule, details = schedule_term_jointly(runs, index, args.start, end_date, holidays, weekends,
+                                              groups=args.group, slots=slots, seat_capacity=seat_capacity)
+    if schedule is None:
+        print(f"joint: not enough valid business days or slot seats to schedule {details.get('courses', 0)} papers",
+              file=sys.stderr)
+        return 1
+    groups = details["groups"]
+    # every programme row of the term, so papers shared between programmes keep each programme's gap
+    term_papers = pd.concat([papers for _, _, papers in runs])
+    exam_list = improve_schedule(args, flatten_schedule_to_list(schedule), index, holidays, weekends, idm_courses,
+                                 slots, seat_capacity, groups, term_papers, runs=runs)
+    for degree_type, semester, papers in runs:
+        run_exams = run_exam_list(exam_list, papers)
+        if project_store is not None:
+            course_set = set(papers['Paper Code'].astype(str).str.strip())
+            save_run(project_store, args.save_version, degree_type, semester, holidays,
+                     [g for g in groups if course_set.intersection(g["courses"])], run_exams, "joint")
+        write_outputs(args, f"{degree_type}_{semester}", run_exams, papers, pmf_df, index)
+    all_papers = term_papers.drop_duplicates(subset=['Paper Code'])
+    write_outputs(args, "joint", exam_list, all_papers, pmf_df, index)
+    return 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not args.profile:
+        return run(args)
+    with Profiler(trace_memory=args.profile_memory).activate() as profiler:
+        status = run(args)
+    with open(args.profile, "w") as f:
+        f.write(profiler.to_json())
+    for row in profiler.summary():
+        print(f"{row['name']:<38} {row['calls']:>4} calls {row['seconds'] * 1000:10.1f} ms", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1877 @@
+import hashlib
+import heapq
+import importlib.util
+import math
+import multiprocessing
+import random
+import re
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from business_calendar import get_calendar
+from jobs import JobCancelled, progress
+from profiling import count, instrument
+
+# OR-Tools loads slowly, so only the exact mode imports it
+HAS_CPSAT = importlib.util.find_spec("ortools") is not None
+
+
+def get_code_columns(nominal_df):
+    return [col for col in nominal_df.columns if "Code" in col and not col.startswith(("Programme", "Sl"))]
+
+def hash_bytes(data):
+    return hashlib.sha1(data).hexdigest()
+
+def _build_csr(rows, cols, n_rows):
+    # rows must already be sorted
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols.astype(np.int32, copy=False)
+
+
+# Paper Master Handling
+SEM_MAPPING = {
+    '1': "I", '2': "II", '3': "III", '4': "IV",
+    '5': "V", '6': "VI", '7': "VII", '8': "VIII"
+}
+
+# Ordered (name, pattern, semester) rules evaluated against the upper-cased Paper Code; the first
+# matching rule wins. A string semester is assigned on any match, a dict maps the captured text and
+# None maps the captured digit through SEM_MAPPING.
+SEMESTER_RULES = (
+    ("bpam-even", r"^BPAM-?([2468])0", None),
+    ("bpam", r"^BPAM", "I"),
+    # first digit run containing "20" or "30" decides, "30" taking precedence within that run
+    ("run-20-30", r"(?<!\d)\d*?(30|20(?!\d*30))", {"30": "IV", "20": "II"}),
+    # first semester digit of the last three-digit block
+    ("last-block", r"(?<!\d)(?:\d{3})*(?=\d{3}\d{0,2}(?!\d)(?!.*\d{3}))[09]{0,2}([1-8])", None),
+    ("first-digit", r"([1-8])", None),
+)
+
+# compiled rule tables by content, so per-code callers do not recompile the patterns
+_compiled_rules = {}
+
+def compile_semester_rules(rules=SEMESTER_RULES):
+    key = tuple((name, pattern, tuple(sorted(semester.items())) if isinstance(semester, dict) else semester)
+                for name, pattern, semester in rules)
+    if key in _compiled_rules:
+        return _compiled_rules[key]
+    compiled = []
+    for name, pattern, semester in rules:
+        regex = re.compile(pattern)
+        if not isinstance(semester, str) and regex.groups != 1:
+            raise ValueError(f"Semester rule '{name}' must capture exactly one group.")
+        compiled.append((name, regex, SEM_MAPPING if semester is None else semester))
+    _compiled_rules[key] = compiled
+    return compiled
+
+def semester_rules_from_frame(rules_df):
+    # institution rule tables: columns name, pattern and an optional semester (blank maps the captured digit)
+    semesters = rules_df['semester'] if 'semester' in rules_df.columns else pd.Series(None, index=rules_df.index)
+    return tuple((str(name), str(pattern), None if pd.isna(semester) or str(semester).strip() == "" else str(semester).strip())
+                 for name, pattern, semester in zip(rules_df['name'], rules_df['pattern'], semesters))
+
+@instrument("classify_semesters")
+def classify_semesters(codes, rules=SEMESTER_RULES):
+    """Derived semester and matching rule name for every code, evaluated once per distinct code."""
+    codes = pd.Series(codes)
+    keys, uniques = pd.factorize(codes, use_na_sentinel=False)
+    normalized = pd.Series(uniques, dtype=object).map(str).str.strip().str.upper()
+    semesters = pd.Series(None, index=normalized.index, dtype=object)
+    matched_rules = pd.Series(None, index=normalized.index, dtype=object)
+    count(rows=len(codes), distinct=len(normalized))
+    pending = normalized
+    for name, regex, semester in compile_semester_rules(rules):
+        if pending.empty:
+            break
+        if isinstance(semester, str):
+            hits = pending.str.contains(regex)
+            values = pd.Series(semester, index=pending.index[hits])
+        else:
+            values = pending.str.extract(regex, expand=False).dropna().map(semester).dropna()
+        semesters[values.index] = values
+        matched_rules[values.index] = name
+        pending = pending.drop(values.index)
+    return pd.DataFrame({'Derived Semester': semesters.to_numpy()[keys],
+                         'Semester Rule': matched_rules.to_numpy()[keys]}, index=codes.index)
+
+def extract_semester(paper_code, rules=SEMESTER_RULES):
+    # one code through the compiled rules, None when none matches; columns go through classify_semesters
+    code = str(paper_code).strip().upper()
+    for _, regex, semester in compile_semester_rules(rules):
+        match = regex.search(code)
+        if match is None:
+            continue
+        if isinstance(semester, str):
+            return semester
+        if match.group(1) in semester:
+            return semester[match.group(1)]
+    return None
+
+MANDATORY_GROUP = {"UTEL-201", "UHIN-201", "USAN-201", "UENG-201"}
+SPECIAL_SOLO = {"UELS-201"}
+
+def prepare_pmf(pmf_df):
+    if 'CC' not in pmf_df.columns:
+        raise ValueError("PMF must contain a 'CC' column to classify IDM/DSC courses.")
+    pmf_df['Is IDM'] = pmf_df['CC'].str.contains('IDM', case=False, na=False)
+    pmf_df['Is DSC'] = pmf_df['CC'].str.contains('DSC', case=False, na=False)
+    return pmf_df
+
+def idm_courses_from_pmf(pmf_df):
+    if pmf_df is None:
+        return set()
+    return set(pmf_df[pmf_df['Is IDM']]['Paper Code'].astype(str).str.strip())
+
+@instrument("filter_pmf_by_degree")
+def filter_pmf_by_degree(pmf_df, degree_type, rules=SEMESTER_RULES):
+    df = pmf_df.copy()
+    if degree_type == 'UG':
+        df = df[(df['Paper Code'].astype(str).str.startswith('U')) |
+                (df['Paper Code'].astype(str).str.upper().str.startswith('BPAM'))]
+    elif degree_type == 'PG':
+        df = df[df['Paper Code'].astype(str).str.startswith('P')]
+    elif degree_type == 'Professional':
+        df = df[df['Paper Code'].astype(str).str.startswith('M')]
+    df = df[~df['Paper Code'].astype(str).str.startswith('UAWR')]
+    df[['Derived Semester', 'Semester Rule']] = classify_semesters(df['Paper Code'], rules)
+    count(rows=len(pmf_df), kept=len(df))
+    return df
+
+def derived_semesters(df):
+    return sorted(set(df['Derived Semester'].dropna()), key=lambda s: list(SEM_MAPPING.values()).index(s) if s in SEM_MAPPING.values() else 99)
+
+@instrument("select_semester_papers")
+def select_semester_papers(df, semester, index=None):
+    # Base filtering by derived semester
+    base_df = df[df['Derived Semester'] == semester].copy()
+    if index is None:
+        return base_df
+
+    # Augment with NRF data: codes that students in this semester are enrolled in
+    enrolled_codes = index.enrolled_codes(semester)
+    additional_df = df[df['Paper Code'].astype(str).str.strip().isin(enrolled_codes) &
+                       ~df['Paper Code'].isin(base_df['Paper Code'])]
+    count(rows=len(df), derived=len(base_df), from_nrf=len(additional_df))
+    return pd.concat([base_df, additional_df]).drop_duplicates(subset=['Paper Code'])
+
+
+# Enrollment Index
+class EnrollmentIndex:
+    # the numeric enrolment arrays; together with course_codes they are all an index needs to score schedules
+    ARRAYS = ("pair_students", "pair_courses", "student_indptr", "student_courses", "course_indptr",
+              "course_students")
+
+    def __init__(self, reg_nos, course_codes, pair_students, pair_courses):
+        self.reg_nos = np.asarray(reg_nos, dtype=object)
+        self._setup(course_codes, len(self.reg_nos))
+        self.pair_students = np.asarray(pair_students, dtype=np.int32)
+        self.pair_courses = np.asarray(pair_courses, dtype=np.int32)
+
+        order = np.lexsort((self.pair_courses, self.pair_students))
+        self.student_indptr, self.student_courses = _build_csr(
+            self.pair_students[order], self.pair_courses[order], self.n_students)
+        order = np.lexsort((self.pair_students, self.pair_courses))
+        self.course_indptr, self.course_students = _build_csr(
+            self.pair_courses[order], self.pair_students[order], self.n_courses)
+
+    @classmethod
+    def from_arrays(cls, course_codes, arrays, reg_nos=None):
+        # wraps ARRAYS taken from another index, e.g. views onto shared memory, without copying or sorting them;
+        # without reg_nos the index can score schedules but not name students
+        index = cls.__new__(cls)
+        index.reg_nos = None if reg_nos is None else np.asarray(reg_nos, dtype=object)
+        index._setup(course_codes, len(arrays["student_indptr"]) - 1)
+        for name in cls.ARRAYS:
+            setattr(index, name, arrays[name])
+        return index
+
+    def _setup(self, course_codes, n_students):
+        self.course_codes = np.asarray(course_codes, dtype=object)
+        self.n_students = n_students
+        self.n_courses = len(self.course_codes)
+        self.course_lookup = {code: i for i, code in enumerate(self.course_codes)}
+        self._incidence = None
+        self._co_enrollment = None
+        # NRF 'Semester' value -> enrolled course ids, None when the NRF has no Semester column
+        self.semester_courses = None
+        # STUDENT_GROUP_COLUMNS present in the NRF -> per-student values
+        self.student_groups = {}
+
+    def course_id(self, code):
+        return self.course_lookup.get(str(code).strip())
+
+    def students_of(self, code):
+        cid = self.course_id(code)
+        if cid is None:
+            return np.empty(0, dtype=np.int32)
+        return self.course_students[self.course_indptr[cid]:self.course_indptr[cid + 1]]
+
+    def courses_of(self, student):
+        return self.student_courses[self.student_indptr[student]:self.student_indptr[student + 1]]
+
+    def course_codes_of(self, student):
+        return self.course_codes[self.courses_of(student)].tolist()
+
+    def student_count(self, code):
+        return len(self.students_of(code))
+
+    def course_sizes(self):
+        return np.diff(self.course_indptr)
+
+    def shared_students(self, code_a, code_b):
+        return np.intersect1d(self.students_of(code_a), self.students_of(code_b), assume_unique=True)
+
+    def incidence(self):
+        if self._incidence is None:
+            # pairs are unique, so the student-side CSR already is the incidence's structure
+            data = np.ones(len(self.student_courses), dtype=np.int32)
+            self._incidence = sparse.csr_matrix(
+                (data, self.student_courses, self.student_indptr), shape=(self.n_students, self.n_courses))
+        return self._incidence
+
+    def co_enrollment(self):
+        # course x course shared-student counts, diagonal holds course sizes
+        if self._co_enrollment is None:
+            incidence = self.incidence()
+            self._co_enrollment = (incidence.T @ incidence).tocsr()
+        return self._co_enrollment
+
+    def enrolled_codes(self, semester=None):
+        if self.semester_courses is None:
+            return set(self.course_codes)
+        return set(self.course_codes[self.semester_courses.get(semester, np.empty(0, dtype=np.int64))])
+
+    def student_counts_frame(self):
+        df = pd.DataFrame({'Paper Code': self.course_codes, 'Student Count': self.course_sizes()})
+        return df.sort_values(by='Paper Code').reset_index(drop=True)
+
+
+class _Interner:
+    def __init__(self):
+        self.lookup = {}
+        self.values = []
+
+    def ids(self, values):
+        local_ids, uniques = pd.factorize(values)
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, value in enumerate(uniques):
+            gid = self.lookup.get(value)
+            if gid is None:
+                gid = self.lookup[value] = len(self.values)
+                self.values.append(value)
+            mapping[i] = gid
+        ids = mapping[local_ids] if len(uniques) else np.full(len(local_ids), -1, dtype=np.int64)
+        ids[local_ids < 0] = -1
+        return ids
+
+def _registration_numbers(frame):
+    if "Regd. No." in frame.columns:
+        reg = frame["Regd. No."].to_numpy(dtype=object).copy()
+        missing = pd.isna(reg)
+        if missing.any():
+            reg[missing] = [f"Student_{idx}" for idx in frame.index[missing]]
+        return reg
+    return np.array([f"Student_{idx}" for idx in frame.index], dtype=object)
+
+def _melt_codes(frame):
+    # Melt the wide Code columns into (row, code) pairs
+    code_columns = get_code_columns(frame)
+    values = frame[code_columns].to_numpy(dtype=object).ravel()
+    rows = np.repeat(np.arange(len(frame)), len(code_columns))
+    present = pd.notna(values)
+    codes = pd.Series(values[present], dtype=object).astype(str).str.strip().to_numpy(dtype=object)
+    rows = rows[present]
+    keep = codes != ""
+    return rows[keep], codes[keep]
+
+STUDENT_GROUP_COLUMNS = ['Programme Name', 'Semester']
+
+@instrument("build_enrollment_index_from_chunks")
+def build_enrollment_index_from_chunks(chunks):
+    # chunks are row slices of the NRF whose index continues across chunks;
+    # only integer (student, course) pairs are kept between chunks
+    students, courses, semesters = _Interner(), _Interner(), _Interner()
+    pair_students, pair_courses, pair_semesters = [], [], []
+    group_values = defaultdict(list)
+    has_semester = False
+    for chunk in chunks:
+        count(chunks=1, rows=len(chunk))
+        rows, codes = _melt_codes(chunk)
+        chunk_students = students.ids(_registration_numbers(chunk))
+        pair_students.append(chunk_students[rows])
+        for column in STUDENT_GROUP_COLUMNS:
+            if column in chunk.columns:
+                group_values[column].append((chunk_students, chunk[column].to_numpy(dtype=object)))
+        pair_courses.append(courses.ids(codes))
+        if 'Semester' in chunk.columns:
+            has_semester = True
+            pair_semesters.append(semesters.ids(chunk['Semester'].to_numpy(dtype=object))[rows])
+        else:
+            pair_semesters.append(np.full(len(rows), -1, dtype=np.int64))
+
+    course_codes = np.array(courses.values, dtype=object)
+    order = np.argsort(course_codes.astype(str), kind="stable")
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    student_ids = np.concatenate(pair_students) if pair_students else np.empty(0, dtype=np.int64)
+    course_ids = rank[np.concatenate(pair_courses)] if pair_courses else np.empty(0, dtype=np.int64)
+    n_courses = max(len(course_codes), 1)
+    keys = np.unique(student_ids * n_courses + course_ids)
+    index = EnrollmentIndex(students.values, course_codes[order], keys // n_courses, keys % n_courses)
+    count(students=len(students.values), courses=len(course_codes), pairs=len(keys))
+    for column, parts in group_values.items():
+        # a student listed on several rows keeps the value of the last one
+        values = np.full(index.n_students, None, dtype=object)
+        for ids, column_values in parts:
+            values[ids] = column_values
+        index.student_groups[column] = values
+    if has_semester:
+        semester_ids = np.concatenate(pair_semesters)
+        index.semester_courses = {value: np.unique(course_ids[semester_ids == sid])
+                                  for sid, value in enumerate(semesters.values)}
+    return index
+
+def build_enrollment_index(nominal_df):
+    return build_enrollment_index_from_chunks([nominal_df])
+
+
+# Compact Schedule
+class CompactSchedule:
+    # interned course codes and slots with day ordinals; exam_date_list tuples only at the edges
+    __slots__ = ("codes", "slots", "course", "day", "slot", "_code_lookup", "_slot_lookup")
+
+    def __init__(self, codes=(), slots=(), course=(), day=(), slot=()):
+        self.codes = list(codes)
+        self.slots = list(slots)
+        self._code_lookup = {code: i for i, code in enumerate(self.codes)}
+        self._slot_lookup = {name: i for i, name in enumerate(self.slots)}
+        self.course = np.asarray(course, dtype=np.int32)
+        self.day = np.asarray(day, dtype=np.int64)
+        self.slot = np.asarray(slot, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.course)
+
+    def code_id(self, code):
+        cid = self._code_lookup.get(code)
+        if cid is None:
+            cid = self._code_lookup[code] = len(self.codes)
+            self.codes.append(code)
+        return cid
+
+    def slot_id(self, slot):
+        sid = self._slot_lookup.get(slot)
+        if sid is None:
+            sid = self._slot_lookup[slot] = len(self.slots)
+            self.slots.append(slot)
+        return sid
+
+    @classmethod
+    def from_exam_list(cls, exam_list):
+        if isinstance(exam_list, cls):
+            return exam_list
+        schedule = cls()
+        n = len(exam_list)
+        course = np.empty(n, dtype=np.int32)
+        day = np.empty(n, dtype=np.int64)
+        slot = np.empty(n, dtype=np.int32)
+        for i, (code, dt_obj, slot_name) in enumerate(exam_list):
+            course[i] = schedule.code_id(code.strip())
+            day[i] = dt_obj.toordinal()
+            slot[i] = schedule.slot_id(slot_name)
+        schedule.course, schedule.day, schedule.slot = course, day, slot
+        return schedule
+
+    @classmethod
+    def from_schedule_dict(cls, schedule_dict):
+        schedule = cls()
+        course, day, slot = [], [], []
+        for date_str, slot_dict in schedule_dict.items():
+            ordinal = date.fromisoformat(date_str).toordinal()
+            for slot_name, courses in slot_dict.items():
+                sid = schedule.slot_id(slot_name)
+                for code in courses:
+                    course.append(schedule.code_id(code))
+                    day.append(ordinal)
+                    slot.append(sid)
+        schedule.course = np.asarray(course, dtype=np.int32)
+        schedule.day = np.asarray(day, dtype=np.int64)
+        schedule.slot = np.asarray(slot, dtype=np.int32)
+        return schedule
+
+    def with_assignment(self, day, slot=None):
+        return CompactSchedule(self.codes, self.slots, self.course, day, self.slot if slot is None else slot)
+
+    def slot_rank(self):
+        # position of each slot id in sorted slot-name order
+        rank = np.empty(len(self.slots), dtype=np.int64)
+        rank[np.argsort(np.array(self.slots, dtype=object))] = np.arange(len(self.slots))
+        return rank
+
+    def sort_order(self):
+        if not len(self):
+            return np.empty(0, dtype=np.int64)
+        return np.lexsort((self.slot_rank()[self.slot], self.day))
+
+    def day_labels(self, fmt="%Y-%m-%d"):
+        return {int(d): date.fromordinal(int(d)).strftime(fmt) for d in np.unique(self.day)}
+
+    def unique(self):
+        keys = np.stack([self.course.astype(np.int64), self.day, self.slot.astype(np.int64)], axis=1)
+        _, first = np.unique(keys, axis=0, return_index=True) if len(self) else (None, np.empty(0, dtype=np.int64))
+        keep = np.sort(first)
+        return CompactSchedule(self.codes, self.slots, self.course[keep], self.day[keep], self.slot[keep])
+
+    def index_course_ids(self, index):
+        lookup = np.array([index.course_lookup.get(code, -1) for code in self.codes], dtype=np.int64)
+        return lookup[self.course] if len(lookup) else np.empty(0, dtype=np.int64)
+
+    def to_exam_list(self):
+        days = {int(d): datetime.fromordinal(int(d)) for d in np.unique(self.day)}
+        order = self.sort_order()
+        return [(self.codes[c], days[d], self.slots[s])
+                for c, d, s in zip(self.course[order].tolist(), self.day[order].tolist(), self.slot[order].tolist())]
+
+
+# Conflict Engine
+def _slot_groups(index, schedule):
+    # (day ordinal, slot id, sorted unique index course ids) per occupied (date, slot), in date/slot order
+    course_ids = schedule.index_course_ids(index)
+    known = course_ids >= 0
+    if not known.any():
+        return
+    day, slot, course_ids = schedule.day[known], schedule.slot[known], course_ids[known]
+    slot_rank = schedule.slot_rank()
+    order = np.lexsort((course_ids, slot_rank[slot], day))
+    day, slot, course_ids = day[order], slot[order], course_ids[order]
+    bounds = np.flatnonzero((np.diff(day) != 0) | (np.diff(slot) != 0)) + 1
+    for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(day)]):
+        yield int(day[start]), int(slot[start]), np.unique(course_ids[start:end])
+
+def _clash_pairs(index, schedule):
+    co = index.co_enrollment()
+    for day, slot, ids in _slot_groups(index, schedule):
+        if len(ids) < 2:
+            continue
+        block = sparse.triu(co[ids][:, ids], k=1).tocoo()
+        for i, j, shared in zip(block.row, block.col, block.data):
+            yield day, slot, int(ids[i]), int(ids[j]), int(shared)
+
+@instrument("find_clashes")
+def find_clashes(index, exam_list, include_students=False):
+    schedule = CompactSchedule.from_exam_list(exam_list)
+    labels = schedule.day_labels()
+    clashes = []
+    for day, slot, cid_a, cid_b, shared in _clash_pairs(index, schedule):
+        course_a, course_b = index.course_codes[cid_a], index.course_codes[cid_b]
+        clash = {
+            "date": labels[day],
+            "slot": schedule.slots[slot],
+            "course_a": course_a,
+            "course_b": course_b,
+            "shared_students": shared,
+        }
+        if include_students:
+            clash["students"] = index.reg_nos[index.shared_students(course_a, course_b)].tolist()
+        clashes.append(clash)
+    count(exams=len(schedule.course), conflicts=len(clashes))
+    return clashes
+
+def clashes_to_frame(clashes):
+    columns = {"date": "Exam Date", "slot": "Time Slot", "course_a": "Course A",
+               "course_b": "Course B", "shared_students": "Shared Students", "students": "Students"}
+    df = pd.DataFrame(clashes, columns=[c for c in columns if not clashes or c in clashes[0]])
+    if "students" in df.columns:
+        df["students"] = df["students"].apply(lambda regs: ", ".join(map(str, regs)))
+    return df.rename(columns=columns)
+
+@instrument("check_full_schedule_conflict")
+def check_full_schedule_conflict(index, exam_list):
+    conflicts = []
+    schedule = CompactSchedule.from_exam_list(exam_list)
+    labels = schedule.day_labels()
+    incidence = index.incidence()
+    co = index.co_enrollment()
+    for day, slot, ids in _slot_groups(index, schedule):
+        if len(ids) < 2 or not sparse.triu(co[ids][:, ids], k=1).nnz:
+            continue
+        sub = incidence[:, ids].tocsr()
+        for student in np.flatnonzero(np.diff(sub.indptr) > 1):
+            courses = index.course_codes[ids[sub.indices[sub.indptr[student]:sub.indptr[student + 1]]]]
+            conflicts.append(
+                f"Student {index.reg_nos[student]} has multiple exams on {labels[day]} in slot '{schedule.slots[slot]}': {', '.join(courses)}"
+            )
+    count(exams=len(schedule.course), conflicts=len(conflicts))
+    return conflicts
+
+
+def _exam_bins(exam_list):
+    # (day ordinal, slot) -> codes sitting in it
+    bins = defaultdict(set)
+    for code, dt_obj, slot_name in exam_list:
+        bins[(dt_obj.toordinal(), slot_name)].add(code.strip())
+    return bins
+
+def _moved_clashes(index, bins, moved):
+    # {(day, slot, course_a, course_b): shared students} for the pairs with at least one moved course,
+    # counted from the course -> students lists of just those courses
+    clashes = {}
+    mark = np.zeros(index.n_students, dtype=bool)
+    for (day, slot), codes in bins.items():
+        known = sorted(c for c in codes if index.course_id(c) is not None)
+        for code in (c for c in known if c in moved):
+            students = index.students_of(code)
+            mark[students] = True
+            for other in known:
+                # a pair of two moved courses is counted once, from its smaller code
+                if other == code or (other in moved and other < code):
+                    continue
+                shared = int(np.count_nonzero(mark[index.students_of(other)]))
+                if shared:
+                    clashes[(day, slot) + tuple(sorted((code, other)))] = shared
+            mark[students] = False
+    return clashes
+
+@instrument("clash_delta")
+def clash_delta(index, before, after):
+    """Clashes an edit adds and removes, in find_clashes form, plus the codes whose date or slot changed.
+
+    Pairs of two unmoved courses are the same on both sides, so only pairs with a moved course are
+    recomputed; the cost follows the edit rather than the timetable or the NRF.
+    """
+    old, new = _exam_bins(before), _exam_bins(after)
+    moved = set()
+    for key in old.keys() | new.keys():
+        moved |= old.get(key, set()) ^ new.get(key, set())
+    old_clashes = _moved_clashes(index, {k: v for k, v in old.items() if not v.isdisjoint(moved)}, moved)
+    new_clashes = _moved_clashes(index, {k: v for k, v in new.items() if not v.isdisjoint(moved)}, moved)
+
+    def rows(clashes, other):
+        return [{"date": date.fromordinal(day).strftime("%Y-%m-%d"), "slot": slot, "course_a": course_a,
+                 "course_b": course_b, "shared_students": shared}
+                for (day, slot, course_a, course_b), shared in sorted(clashes.items()) if
+                (day, slot, course_a, course_b) not in other]
+
+    added, removed = rows(new_clashes, old_clashes), rows(old_clashes, new_clashes)
+    count(moved=len(moved), added=len(added), removed=len(removed))
+    return added, removed, sorted(moved)
+
+
+# Scheduling
+DEFAULT_SLOT = "09:00 - 10:30"
+DEFAULT_SLOTS = (DEFAULT_SLOT,)
+# suggested sittings for the slot editors; any "HH:MM - HH:MM" label works
+SLOT_PRESETS = ["09:00 - 10:30", "09:00 - 11:00", "13:00 - 14:30", "16:00 - 17:30"]
+
+def papers_per_day_bounds(semester):
+    # papers per sitting; a day with several slots holds this many in each slot
+    if semester == "II":
+        return 4, 7
+    elif semester == "IV":
+        return 5, 20
+    return 3, 8
+
+def slot_capacity(seat_capacity, slot):
+    # seat_capacity is one seat count for every slot or a {slot: seats} mapping; None or 0 is unlimited
+    if isinstance(seat_capacity, dict):
+        return seat_capacity.get(slot) or None
+    return seat_capacity or None
+
+def course_seats(index, courses):
+    # enrolled students per course, 0 for courses nobody in the NRF takes
+    sizes = index.course_sizes()
+    return {c: int(sizes[cid]) if cid is not None else 0 for c, cid in zip(courses, map(index.course_id, courses))}
+
+def _fill_slot(courses, limit, capacity, seats):
+    # leading papers, at most `limit`, whose students fit the slot's seats
+    if not capacity or seats is None:
+        return courses[:limit]
+    taken, used = 0, 0
+    while taken < min(limit, len(courses)) and used + seats.get(courses[taken], 0) <= capacity:
+        used += seats.get(courses[taken], 0)
+        taken += 1
+    return courses[:taken]
+
+def flatten_schedule_to_list(schedule_dict):
+    return CompactSchedule.from_schedule_dict(schedule_dict).to_exam_list()
+
+@instrument("auto_schedule_exams_by_program_gap")
+def auto_schedule_exams_by_program_gap(courses, pmf_df, start_date, end_date, holidays, weekends, semester, rng=None,
+                                       slots=DEFAULT_SLOTS, seat_capacity=None, seats=None):
+    rng = rng or random
+    courses = list(dict.fromkeys(courses))
+    calendar = get_calendar(holidays, weekends)
+    if calendar.next_valid(start_date, end_date) is None:
+        return None
+    min_papers, max_papers = papers_per_day_bounds(semester)
+    schedule = defaultdict(lambda: defaultdict(list))
+    last_scheduled_date = None
+    while courses:
+        if last_scheduled_date is None:
+            min_date = start_date
+        else:
+            min_date = last_scheduled_date + timedelta(days=2)
+        chosen_day = calendar.next_valid(min_date, end_date)
+        if chosen_day is None:
+            return None
+        date_str = chosen_day.strftime("%Y-%m-%d")
+        for slot in slots:
+            if not courses:
+                break
+            num_papers = min(rng.randint(min_papers, max_papers), len(courses))
+            papers_to_schedule = _fill_slot(courses, num_papers, slot_capacity(seat_capacity, slot), seats)
+            if papers_to_schedule:
+                schedule[date_str][slot] = papers_to_schedule
+                courses = courses[len(papers_to_schedule):]
+        if date_str not in schedule:
+            # the next paper has more students than any slot seats
+            return None
+        last_scheduled_date = chosen_day
+    return schedule
+
+def find_valid_date_for_UELS(start_date, end_date, holidays, weekends, existing_schedule):
+    # None when every valid day of the window already holds exams
+    return get_calendar(holidays, weekends).free_day(start_date, end_date, existing_schedule)
+
+@instrument("auto_schedule_exams_by_program_dense")
+def auto_schedule_exams_by_program_dense(courses, start_date, end_date, holidays, weekends,
+                                         slots=DEFAULT_SLOTS, seat_capacity=None, seats=None):
+    calendar = get_calendar(holidays, weekends)
+    if calendar.next_valid(start_date, end_date) is None:
+        return None
+    schedule = defaultdict(lambda: defaultdict(list))
+    last_scheduled_date = None
+    while courses:
+        if last_scheduled_date is None:
+            min_date = start_date
+        else:
+            min_date = last_scheduled_date + timedelta(days=2)
+        chosen_day = calendar.next_valid(min_date, end_date)
+        if chosen_day is None:
+            return None
+        date_str = chosen_day.strftime("%Y-%m-%d")
+        for slot in slots:
+            papers_to_schedule = _fill_slot(courses, 5, slot_capacity(seat_capacity, slot), seats)
+            if papers_to_schedule:
+                schedule[date_str][slot] = papers_to_schedule
+                courses = courses[len(papers_to_schedule):]
+        if date_str not in schedule:
+            return None
+        last_scheduled_date = chosen_day
+    return schedule
+
+@instrument("auto_schedule_exams_multi_slot")
+def auto_schedule_exams_multi_slot(courses, start_date, end_date, holidays, weekends,
+                                   slots=DEFAULT_SLOTS, seat_capacity=None, seats=None):
+    valid_days = get_calendar(holidays, weekends).valid_days(start_date, end_date)
+    if not valid_days:
+        return None
+    schedule = defaultdict(lambda: defaultdict(list))
+    course_index = 0
+    total_slots = len(valid_days) * len(slots)
+    if len(courses) > total_slots:
+        return None
+    for day in valid_days:
+        date_str = day.strftime("%Y-%m-%d")
+        for slot in slots:
+            if course_index < len(courses):
+                # a slot too small for the next paper stays empty and the paper moves on to the next slot
+                if _fill_slot(courses[course_index:], 1, slot_capacity(seat_capacity, slot), seats):
+                    schedule[date_str][slot].append(courses[course_index])
+                    course_index += 1
+            else:
+                break
+        if course_index >= len(courses):
+            break
+    if course_index < len(courses):
+        return None
+    return schedule
+
+def assign_combination_groups_to_schedule(schedule, groups, slot=DEFAULT_SLOT):
+    for group in groups:
+        date_str = group["date"].strftime("%Y-%m-%d")
+        if date_str not in schedule:
+            schedule[date_str] = {slot: []}
+        for c in group["courses"]:
+            schedule[date_str].setdefault(slot, []).append(c)
+    return schedule
+
+
+# Conflict-Free Scheduling
+def gap_exam_days(start_date, end_date, holidays, weekends, gap_days=2):
+    return get_calendar(holidays, weekends).gap_days(start_date, end_date, gap_days)
+
+def build_conflict_graph(index, courses):
+    # adjacency between positions in `courses`; courses nobody is enrolled in stay isolated
+    neighbors = [set() for _ in courses]
+    known = [(pos, index.course_id(c)) for pos, c in enumerate(courses)]
+    known = [(pos, cid) for pos, cid in known if cid is not None]
+    if len(known) < 2:
+        return neighbors
+    positions = np.array([pos for pos, _ in known])
+    ids = np.array([cid for _, cid in known])
+    block = sparse.triu(index.co_enrollment()[ids][:, ids], k=1).tocoo()
+    for i, j in zip(positions[block.row], positions[block.col]):
+        neighbors[i].add(j)
+        neighbors[j].add(i)
+    return neighbors
+
+def _dsatur_bins(neighbors, n_bins, capacity, course_runs, blocked, seats=None, seat_limits=None, seat_load=None,
+                 bin_days=None, programmes=None, programme_days=None, gap_days=2):
+    # colours are (day, slot) bins; capacity[r] caps the papers of run r per bin, for the runs listed in
+    # course_runs per course, and seat_limits[b] caps the summed `seats` of the courses placed in bin b.
+    # With `programmes`, no course lands within gap_days of another exam day (bin_days[b], an ordinal) of
+    # one of its programmes; programme_days holds days the programmes already sit
+    n = len(neighbors)
+    assignment = [-1] * n
+    bin_load = [0] * n_bins
+    run_load = [[0] * n_bins for _ in capacity]
+    bin_seats = list(seat_load) if seat_load is not None else [0] * n_bins
+    used_days = defaultdict(set, {p: set(days) for p, days in (programme_days or {}).items()})
+    neighbor_bins = [set() for _ in range(n)]
+    heap = [(0, -len(neighbors[c]), c) for c in range(n)]
+    heapq.heapify(heap)
+    while heap:
+        neg_sat, _, course = heapq.heappop(heap)
+        if assignment[course] != -1 or -neg_sat != len(neighbor_bins[course]):
+            continue
+        taken = neighbor_bins[course] | blocked[course]
+        need = seats[course] if seats is not None else 0
+        runs = course_runs[course]
+        near = set()
+        for p in (programmes[course] if programmes is not None else ()):
+            near.update(d + k for d in used_days[p] for k in range(1 - gap_days, gap_days) if k)
+        feasible = [b for b in range(n_bins) if b not in taken and all(run_load[r][b] < capacity[r] for r in runs)
+                    and (seat_limits is None or seat_limits[b] is None or bin_seats[b] + need <= seat_limits[b])
+                    and (not near or bin_days[b] not in near)]
+        if not feasible:
+            return None
+        chosen = min(feasible, key=lambda b: (bin_load[b], b))
+        assignment[course] = chosen
+        bin_load[chosen] += 1
+        for r in runs:
+            run_load[r][chosen] += 1
+        bin_seats[chosen] += need
+        for p in (programmes[course] if programmes is not None else ()):
+            used_days[p].add(bin_days[chosen])
+        for other in neighbors[course]:
+            if assignment[other] == -1 and chosen not in neighbor_bins[other]:
+                neighbor_bins[other].add(chosen)
+                heapq.heappush(heap, (-len(neighbor_bins[other]), -len(neighbors[other]), other))
+    return assignment
+
+def _run_limits(courses, runs):
+    # (run positions per course, papers per sitting per run) from (degree, semester, papers) runs
+    position = {c.strip(): pos for pos, c in enumerate(courses)}
+    course_runs = [[] for _ in courses]
+    for r, (_, _, papers) in enumerate(runs):
+        for code in set(papers['Paper Code'].astype(str).str.strip()):
+            if code in position:
+                course_runs[position[code]].append(r)
+    return course_runs, [papers_per_day_bounds(semester)[1] for _, semester, _ in runs]
+
+@instrument("auto_schedule_exams_by_coloring")
+def auto_schedule_exams_by_coloring(courses, index, start_date, end_date, holidays, weekends, semester, groups=(),
+                                    slots=DEFAULT_SLOTS, seat_capacity=None, runs=None, gap_days=2):
+    """Conflict-free (day, slot) bins by DSatur coloring over the fewest exam days that fit.
+
+    Alone, the semester's paper limit holds per sitting and exam days are gap_days apart term-wide. With
+    `runs` ((degree, semester, papers) as from term_runs), each run keeps its own semester's limit per
+    sitting, and only the exam days of one programme (the runs' Programme Name rows) need the gap, so
+    programmes that share no paper can sit on neighbouring days.
+
+    The semester's minimum papers per sitting is not enforced. Each paper goes to the emptiest bin it may
+    take, which keeps sittings balanced, but conflicts, seats and the gap can still leave a sitting short.
+    """
+    courses = list(dict.fromkeys(c.strip() for c in courses))
+    slots = list(slots)
+    n_slots = len(slots)
+    if runs is None:
+        exam_days = gap_exam_days(start_date, end_date, holidays, weekends, gap_days)
+    else:
+        exam_days = get_calendar(holidays, weekends).valid_days(start_date, end_date)
+    if not exam_days:
+        return None
+    schedule = defaultdict(lambda: defaultdict(list))
+    if not courses:
+        return schedule
+    if runs is None:
+        course_runs, capacity = [(0,)] * len(courses), [papers_per_day_bounds(semester)[1]]
+        programmes = programme_days = None
+    else:
+        course_runs, capacity = _run_limits(courses, runs)
+        term_papers = pd.concat([papers for _, _, papers in runs])
+        # without Programme Name rows there is no programme to keep apart
+        programmes = [p.tolist() for p in _course_programmes(courses, term_papers) or ()] or None
+        # combination groups' days count as exam days of their papers' programmes
+        programme_days = defaultdict(set)
+        for group in groups:
+            group_day = (group["date"].date() if isinstance(group["date"], datetime) else group["date"]).toordinal()
+            for group_programmes in _course_programmes(group["courses"], term_papers) or ():
+                for p in group_programmes.tolist():
+                    programme_days[p].add(group_day)
+    neighbors = build_conflict_graph(index, courses)
+    seats = list(course_seats(index, courses).values()) if seat_capacity else None
+
+    # courses sharing students with a combination group cannot sit in that group's (date, first slot) bin,
+    # whose seats the group already takes
+    day_pos = {day: d for d, day in enumerate(exam_days)}
+    course_ids = [index.course_id(c) for c in courses]
+    blocked = [set() for _ in courses]
+    group_seats = {}
+    for group in groups:
+        group_date = group["date"].date() if isinstance(group["date"], datetime) else group["date"]
+        group_ids = [cid for cid in map(index.course_id, group["courses"]) if cid is not None]
+        if group_date not in day_pos or not group_ids:
+            continue
+        group_bin = day_pos[group_date] * n_slots
+        group_seats[group_bin] = group_seats.get(group_bin, 0) + int(index.course_sizes()[group_ids].sum())
+        touched = set(index.co_enrollment()[group_ids].indices.tolist())
+        for pos, cid in enumerate(course_ids):
+            if cid in touched:
+                blocked[pos].add(group_bin)
+
+    # fewest exam days whose slots fit every run's papers at its limit. More days only add bins, so whether the
+    # coloring fits is taken as monotone in the day count and the count is found by bisection
+    run_sizes = Counter(r for runs_of in course_runs for r in runs_of)
+    min_days = max([-(-size // (capacity[r] * n_slots)) for r, size in run_sizes.items()] + [1])
+    bin_days = [exam_days[b // n_slots].toordinal() for b in range(len(exam_days) * n_slots)]
+    attempts = {}
+
+    def colour(n_days):
+        if n_days not in attempts:
+            n_bins = n_days * n_slots
+            seat_limits = [slot_capacity(seat_capacity, slots[b % n_slots]) for b in range(n_bins)] if seats else None
+            seat_load = [group_seats.get(b, 0) for b in range(n_bins)]
+            progress(days=n_days)
+            attempts[n_days] = _dsatur_bins(neighbors, n_bins, capacity, course_runs, blocked, seats, seat_limits,
+                                            seat_load, bin_days, programmes, programme_days, gap_days)
+        return attempts[n_days]
+
+    if min_days > len(exam_days) or colour(len(exam_days)) is None:
+        return None
+    n_days = bisect_left(range(min_days, len(exam_days) + 1), True, key=lambda n: colour(n) is not None) + min_days
+    count(colorings=len(attempts))
+    for pos, b in enumerate(colour(n_days)):
+        schedule[exam_days[b // n_slots].strftime("%Y-%m-%d")][slots[b % n_slots]].append(courses[pos])
+    return schedule
+
+
+# Conflict Resolution
+@instrument("resolve_conflicts")
+def resolve_conflicts(exam_list, index, holidays, weekends, idm_courses=(), slots=(), seat_capacity=None):
+    schedule = CompactSchedule.from_exam_list(exam_list).unique()
+    # configured slots that hold no exam yet are still places to move a paper to
+    for slot_name in slots:
+        schedule.slot_id(slot_name)
+    resolution_log = []
+    clashes = sorted(_clash_pairs(index, schedule), key=lambda c: -c[4])
+    count(exams=len(schedule.course), conflicts=len(clashes))
+    if not clashes:
+        return schedule.to_exam_list(), resolution_log
+
+    first_day = int(schedule.day.min())
+    last_day = int(schedule.day.max()) + 14
+    valid_days = get_calendar(holidays, weekends).ordinals(date.fromordinal(first_day), date.fromordinal(last_day))
+    days = np.unique(np.r_[np.asarray(valid_days, dtype=np.int64), schedule.day])
+    n_slots = len(schedule.slots)
+    day_pos = np.searchsorted(days, schedule.day)
+    valid_pos = np.searchsorted(days, valid_days)
+
+    # occupancy[bin, student] = exams the student sits in that (date, slot); bin = day position * n_slots + slot
+    occupancy = np.zeros((len(days) * n_slots, index.n_students), dtype=np.int16)
+    item_bin = day_pos * n_slots + schedule.slot
+    item_course = schedule.index_course_ids(index)
+    placement = {}
+    for i, (cid, b) in enumerate(zip(item_course.tolist(), item_bin.tolist())):
+        if cid >= 0:
+            placement[(cid, b)] = i
+            occupancy[b, index.course_students[index.course_indptr[cid]:index.course_indptr[cid + 1]]] += 1
+
+    idm_courses = set(idm_courses)
+    sizes = index.course_sizes()
+    bin_seats = np.zeros(len(days) * n_slots, dtype=np.int64)
+    np.add.at(bin_seats, item_bin[item_course >= 0], sizes[item_course[item_course >= 0]])
+    seat_limits = np.array([slot_capacity(seat_capacity, name) or np.iinfo(np.int64).max for name in schedule.slots])
+    label = lambda b: f"{date.fromordinal(int(days[b // n_slots])).strftime('%Y-%m-%d')} in slot {schedule.slots[b % n_slots]}"
+    moves = 0
+    for processed, (day, slot, cid_a, cid_b, shared) in enumerate(clashes):
+        progress(processed, len(clashes), moves=moves)
+        b = int(np.searchsorted(days, day)) * n_slots + slot
+        if (cid_a, b) not in placement or (cid_b, b) not in placement:
+            continue
+        cid_move = min((cid_a, cid_b), key=lambda c: (0 if index.course_codes[c] in idm_courses else 1, sizes[c]))
+        course_to_move = index.course_codes[cid_move]
+        other = index.course_codes[cid_b if cid_move == cid_a else cid_a]
+        students = index.course_students[index.course_indptr[cid_move]:index.course_indptr[cid_move + 1]]
+        current = int(occupancy[b, students].sum()) - len(students)
+        # any (valid date, slot) bin with seats left for the moved paper
+        candidates = (valid_pos[:, None] * n_slots + np.arange(n_slots)).ravel()
+        candidates = candidates[(candidates != b)
+                                & (bin_seats[candidates] + len(students) <= seat_limits[candidates % n_slots])]
+        count(moves_attempted=1, candidates=len(candidates))
+        if not len(candidates):
+            resolution_log.append(f"Could not resolve conflict for {course_to_move} on {label(b)}")
+            continue
+        added = occupancy[np.ix_(candidates, students)].sum(axis=1)
+        best = int(np.argmin(added))
+        if added[best] >= current:
+            resolution_log.append(f"Could not resolve conflict for {course_to_move} on {label(b)}")
+            continue
+        new_bin = int(candidates[best])
+        occupancy[b, students] -= 1
+        occupancy[new_bin, students] += 1
+        bin_seats[b] -= len(students)
+        bin_seats[new_bin] += len(students)
+        i = placement.pop((cid_move, b))
+        placement[(cid_move, new_bin)] = i
+        item_bin[i] = new_bin
+        moves += 1
+        count(moves=1)
+        resolution_log.append(
+            f"Moved {course_to_move} from {label(b)} to {label(new_bin)} "
+            f"({shared} students shared with {other}; {current} clashes removed, {int(added[best])} added)"
+        )
+
+    resolved = schedule.with_assignment(days[item_bin // n_slots], item_bin % n_slots)
+    return resolved.to_exam_list(), resolution_log
+
+
+# Local Search Optimization
+SOFT_COST_WEIGHTS = {"clashes": 1000.0, "consecutive": 10.0, "balance": 1.0, "window": 50.0}
+
+class _SearchState:
+    def __init__(self, schedule, index, first_day, n_days, seat_capacity=None, course_runs=None, run_caps=(),
+                 min_papers_per_slot=None, programmes=None, gap_days=2):
+        self.schedule = schedule
+        self.first_day = first_day
+        self.n_slots = len(schedule.slots)
+        self.courses = [schedule.codes[c] for c in schedule.course.tolist()]
+        self.students = [index.students_of(course) for course in self.courses]
+        self.day = schedule.day - first_day
+        self.slot = schedule.slot.astype(np.int64)
+        # occupancy by (day, slot) bin for clashes, by padded day for consecutive-day pairs
+        self.occ_bin = np.zeros((n_days * self.n_slots, index.n_students), dtype=np.int16)
+        self.occ_day = np.zeros((n_days + 2, index.n_students), dtype=np.int16)
+        self.loads = np.zeros(n_days, dtype=np.int64)
+        # hard limits per (day, slot) bin: seats taken against the slot's seats, and each run's papers (the runs
+        # listed per course in course_runs) against its run_caps entry
+        self.seat_limits = np.array([slot_capacity(seat_capacity, name) or np.iinfo(np.int64).max
+                                     for name in schedule.slots], dtype=np.int64)
+        self.min_papers = min_papers_per_slot
+        self.course_runs = [np.asarray(runs, dtype=np.int64) for runs in course_runs or [()] * len(self.courses)]
+        self.run_caps = np.asarray(run_caps, dtype=np.int64)
+        self.bin_seats = np.zeros(n_days * self.n_slots, dtype=np.int64)
+        self.bin_papers = np.zeros(n_days * self.n_slots, dtype=np.int64)
+        self.run_papers = np.zeros((len(self.run_caps), n_days * self.n_slots), dtype=np.int64)
+        # exam papers per (programme, padded day); a programme's exam days stay gap_days apart
+        self.programmes = programmes if programmes is not None else [np.empty(0, dtype=np.int64)] * len(self.courses)
+        n_programmes = max((int(p.max()) + 1 for p in self.programmes if len(p)), default=0)
+        self.gap = max(int(gap_days), 1)
+        self.occ_prog = np.zeros((n_programmes, n_days + 2 * self.gap), dtype=np.int64)
+        for i in range(len(self.courses)):
+            self._add(i, self.day[i], self.slot[i])
+        # days of special solo papers take no other paper
+        self.blocked = np.zeros(n_days, dtype=bool)
+        self.blocked[[self.day[i] for i, course in enumerate(self.courses) if course.strip() in SPECIAL_SOLO]] = True
+
+    def _add(self, i, d, s):
+        students = self.students[i]
+        b = d * self.n_slots + s
+        self.occ_bin[b, students] += 1
+        self.occ_day[d + 1, students] += 1
+        self.loads[d] += 1
+        self.bin_seats[b] += len(students)
+        self.bin_papers[b] += 1
+        self.run_papers[self.course_runs[i], b] += 1
+        self.occ_prog[self.programmes[i], d + self.gap] += 1
+        self.day[i] = d
+        self.slot[i] = s
+
+    def _remove(self, i):
+        d, s = self.day[i], self.slot[i]
+        students = self.students[i]
+        b = d * self.n_slots + s
+        self.occ_bin[b, students] -= 1
+        self.occ_day[d + 1, students] -= 1
+        self.loads[d] -= 1
+        self.bin_seats[b] -= len(students)
+        self.bin_papers[b] -= 1
+        self.run_papers[self.course_runs[i], b] -= 1
+        self.occ_prog[self.programmes[i], d + self.gap] -= 1
+
+    def window(self):
+        used = np.flatnonzero(self.loads)
+        return int(used[-1] - used[0]) if len(used) else 0
+
+    def components(self):
+        occ_bin = self.occ_bin.astype(np.int64)
+        occ_day = self.occ_day.astype(np.int64)
+        return {
+            "clashes": int((occ_bin * (occ_bin - 1) // 2).sum()),
+            "consecutive": int((occ_day[:-1] * occ_day[1:]).sum()),
+            "balance": int((self.loads ** 2).sum()),
+            "window": self.window(),
+        }
+
+    def gap_ok(self, i, d1):
+        # d1 is no solo paper's day, and no other exam day of any of the course's programmes is within gap_days of it
+        d0 = self.day[i]
+        if d1 == d0:
+            return True
+        if self.blocked[d1]:
+            return False
+        if not len(self.programmes[i]):
+            return True
+        near = self.occ_prog[self.programmes[i], d1 + 1:d1 + 2 * self.gap].sum(axis=1) - \
+            self.occ_prog[self.programmes[i], d1 + self.gap]
+        if abs(d1 - d0) < self.gap:
+            near -= 1
+        return not near.any()
+
+    def overfull(self, b, seats_before, papers_before):
+        # over a limit and fuller than before; bins already over their limit may still shed load.
+        # papers_before is the bin's run_papers column before the change
+        seats = self.bin_seats[b]
+        papers = self.run_papers[:, b]
+        return bool((seats > self.seat_limits[b % self.n_slots] and seats > seats_before)
+                    or ((papers > self.run_caps) & (papers > papers_before)).any())
+
+    def fits(self, i, d1, s1):
+        b = d1 * self.n_slots + s1
+        if self.blocked[d1] or self.bin_seats[b] + len(self.students[i]) > self.seat_limits[s1]:
+            return False
+        runs = self.course_runs[i]
+        if (self.run_papers[runs, b] >= self.run_caps[runs]).any():
+            return False
+        # a sitting keeps min_papers_per_slot or empties; a single paper never opens a new one
+        left = self.bin_papers[self.day[i] * self.n_slots + self.slot[i]] - 1
+        return not self.min_papers or ((left == 0 or left >= self.min_papers)
+                                       and (self.bin_papers[b] > 0 or self.min_papers <= 1))
+
+    def move_delta(self, i, d1, s1, weights):
+        d0, s0 = self.day[i], self.slot[i]
+        students = self.students[i]
+        n = len(students)
+        clashes = (int(self.occ_bin[d1 * self.n_slots + s1, students].sum())
+                   - int(self.occ_bin[d0 * self.n_slots + s0, students].sum()) + n)
+        if d1 == d0:
+            return weights["clashes"] * clashes
+        removed = int(self.occ_day[d0, students].sum()) + int(self.occ_day[d0 + 2, students].sum())
+        added = int(self.occ_day[d1, students].sum()) + int(self.occ_day[d1 + 2, students].sum())
+        if abs(d1 - d0) == 1:
+            added -= n
+        balance = 2 * (int(self.loads[d1]) - int(self.loads[d0]) + 1)
+        window = 0
+        if self.loads[d0] == 1 or self.loads[d1] == 0:
+            window = self.window()
+            self.loads[d0] -= 1
+            self.loads[d1] += 1
+            window = self.window() - window
+            self.loads[d0] += 1
+            self.loads[d1] -= 1
+        return (weights["clashes"] * clashes + weights["consecutive"] * (added - removed)
+                + weights["balance"] * balance + weights["window"] * window)
+
+    def move(self, i, d1, s1):
+        self._remove(i)
+        self._add(i, d1, s1)
+
+    def to_exam_list(self):
+        return self.schedule.with_assignment(self.day + self.first_day, self.slot).to_exam_list()
+
+
+def schedule_cost(components, weights=None):
+    weights = weights or SOFT_COST_WEIGHTS
+    return sum(weights[key] * value for key, value in components.items())
+
+def _course_programmes(courses, pmf_df):
+    # programme ids per course from the PMF's Paper Code / Programme Name rows; a paper may serve several
+    if pmf_df is None or 'Programme Name' not in pmf_df.columns:
+        return None
+    rows = pmf_df.dropna(subset=['Paper Code', 'Programme Name'])
+    codes = rows['Paper Code'].astype(str).str.strip().to_numpy(dtype=object)
+    programme_ids, _ = pd.factorize(rows['Programme Name'])
+    by_code = defaultdict(set)
+    for code, pid in zip(codes, programme_ids.tolist()):
+        by_code[code].add(pid)
+    return [np.array(sorted(by_code.get(course.strip(), ())), dtype=np.int64) for course in courses]
+
+@instrument("optimize_schedule")
+def optimize_schedule(exam_list, index, holidays, weekends, time_limit=2.0, weights=None,
+                      fixed_courses=(), max_papers_per_slot=None, seed=0, slots=(), seat_capacity=None,
+                      pmf_df=None, gap_days=2, min_papers_per_slot=None, runs=None):
+    """Simulated annealing over (date, slot) moves and swaps, minimizing the weighted soft costs.
+
+    Seat capacities, max_papers_per_slot, min_papers_per_slot (a sitting holds at least that many papers or
+    none), the solo days of SPECIAL_SOLO papers and, when `pmf_df` maps papers to programmes, the gap_days
+    minimum between a programme's exam days are hard: no accepted move breaks one that the schedule kept.
+    SPECIAL_SOLO papers stay where they are, like `fixed_courses`. With `runs` ((degree, semester, papers) as
+    from term_runs), each run's papers per sitting keep its own semester's limit instead of max_papers_per_slot.
+    """
+    weights = weights or SOFT_COST_WEIGHTS
+    report = {"iterations": 0, "accepted": 0, "trajectory": []}
+    if not exam_list:
+        report.update(initial_cost=0.0, final_cost=0.0, initial_components={}, final_components={})
+        return list(exam_list), report
+    schedule = CompactSchedule.from_exam_list(exam_list)
+    # configured slots that hold no exam yet are still places to move a paper to
+    for slot_name in slots:
+        schedule.slot_id(slot_name)
+    first_day = int(schedule.day.min())
+    n_days = int(schedule.day.max()) - first_day + 1
+    allowed = [d - first_day for d in get_calendar(holidays, weekends).ordinals(
+        date.fromordinal(first_day), date.fromordinal(first_day + n_days - 1))]
+    courses = [schedule.codes[c] for c in schedule.course.tolist()]
+    if runs is not None:
+        course_runs, run_caps = _run_limits(courses, runs)
+    elif max_papers_per_slot:
+        course_runs, run_caps = [(0,)] * len(courses), [max_papers_per_slot]
+    else:
+        course_runs, run_caps = None, ()
+    state = _SearchState(schedule, index, first_day, n_days, seat_capacity=seat_capacity, course_runs=course_runs,
+                         run_caps=run_caps, min_papers_per_slot=min_papers_per_slot,
+                         programmes=_course_programmes(courses, pmf_df), gap_days=gap_days)
+    fixed_courses = {c.strip() for c in fixed_courses} | SPECIAL_SOLO
+    movable = [i for i, course in enumerate(state.courses) if course.strip() not in fixed_courses]
+
+    components = state.components()
+    cost = best_cost = schedule_cost(components, weights)
+    best_day = state.day.copy()
+    best_slot = state.slot.copy()
+    report["initial_components"] = components
+    report["initial_cost"] = cost
+    if not movable or len(allowed) * state.n_slots < 2:
+        report.update(final_cost=cost, final_components=components)
+        return state.to_exam_list(), report
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    temperature_start = max(weights["consecutive"], 1.0) * 10
+    temperature_end = 0.01
+    temperature = temperature_start
+    iteration = 0
+    report["trajectory"].append({"time": 0.0, "iteration": 0, "cost": cost, "best": best_cost})
+    while True:
+        iteration += 1
+        if iteration % 256 == 0:
+            elapsed = time.perf_counter() - start
+            if elapsed >= time_limit:
+                break
+            temperature = temperature_start * (temperature_end / temperature_start) ** (elapsed / time_limit)
+            progress(elapsed, time_limit, iterations=iteration, cost=cost, best=best_cost)
+            if iteration % 4096 == 0:
+                report["trajectory"].append({"time": elapsed, "iteration": iteration, "cost": cost, "best": best_cost})
+
+        i = movable[rng.randrange(len(movable))]
+        d0, s0 = state.day[i], state.slot[i]
+        if rng.random() < 0.5:
+            # swap with a course in another (date, slot)
+            j = movable[rng.randrange(len(movable))]
+            d1, s1 = state.day[j], state.slot[j]
+            if (d1, s1) == (d0, s0) or not state.gap_ok(i, d1):
+                continue
+            b0, b1 = d0 * state.n_slots + s0, d1 * state.n_slots + s1
+            before = (state.bin_seats[b0], state.run_papers[:, b0].copy(), state.bin_seats[b1],
+                      state.run_papers[:, b1].copy())
+            delta = state.move_delta(i, d1, s1, weights)
+            state.move(i, d1, s1)
+            if not state.gap_ok(j, d0):
+                state.move(i, d0, s0)
+                continue
+            delta += state.move_delta(j, d0, s0, weights)
+            state.move(j, d0, s0)
+            if (not state.overfull(b0, before[0], before[1]) and not state.overfull(b1, before[2], before[3])
+                    and (delta <= 0 or rng.random() < math.exp(-delta / temperature))):
+                cost += delta
+                report["accepted"] += 1
+            else:
+                state.move(j, d1, s1)
+                state.move(i, d0, s0)
+                continue
+        else:
+            d1 = allowed[rng.randrange(len(allowed))]
+            s1 = rng.randrange(state.n_slots)
+            if (d1, s1) == (d0, s0) or not state.fits(i, d1, s1) or not state.gap_ok(i, d1):
+                continue
+            delta = state.move_delta(i, d1, s1, weights)
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                state.move(i, d1, s1)
+                cost += delta
+                report["accepted"] += 1
+            else:
+                continue
+        if cost < best_cost - 1e-9:
+            best_cost = cost
+            best_day = state.day.copy()
+            best_slot = state.slot.copy()
+
+    report["iterations"] = iteration
+    count(iterations=iteration, accepted=report["accepted"])
+    report["trajectory"].append({"time": time.perf_counter() - start, "iteration": iteration, "cost": cost, "best": best_cost})
+    for i in range(len(state.courses)):
+        if state.day[i] != best_day[i] or state.slot[i] != best_slot[i]:
+            state.move(i, best_day[i], best_slot[i])
+    report["final_components"] = state.components()
+    report["final_cost"] = schedule_cost(report["final_components"], weights)
+    return state.to_exam_list(), report
+
+
+# Parallel Multi-Start Scheduling
+def evaluate_schedule(index, exam_list):
+    schedule = CompactSchedule.from_exam_list(exam_list)
+    if not len(schedule):
+        return {"clashes": 0, "consecutive": 0, "balance": 0, "window": 0}
+    n_slots = len(schedule.slots)
+    days = schedule.day - schedule.day.min()
+    bins = days * n_slots + schedule.slot
+    course_ids = schedule.index_course_ids(index)
+    known = course_ids >= 0
+    n_days = int(days.max()) + 1
+
+    # students x bins and students x days exam counts via one sparse product each
+    def student_counts(columns, n_columns):
+        placement = sparse.csr_matrix((np.ones(known.sum(), dtype=np.int32), (course_ids[known], columns[known])),
+                                      shape=(index.n_courses, n_columns))
+        return (index.incidence() @ placement).tocsc()
+
+    per_bin = student_counts(bins, n_days * n_slots)
+    per_day = student_counts(days, n_days)
+    clashes = int((per_bin.data.astype(np.int64) * (per_bin.data - 1) // 2).sum())
+    consecutive = int(per_day[:, :-1].multiply(per_day[:, 1:]).sum()) if n_days > 1 else 0
+    loads = np.bincount(days, minlength=n_days)
+    used = np.flatnonzero(loads)
+    return {
+        "clashes": clashes,
+        "consecutive": consecutive,
+        "balance": int((loads ** 2).sum()),
+        "window": int(used[-1] - used[0]),
+    }
+
+# set once in each worker process by the pool initializer; the scheduling process never reads or writes it
+_worker_index = None
+_worker_blocks = []
+
+def _share_index(index):
+    # one shared memory block per index array, so workers map the enrolments instead of each unpickling a copy;
+    # the caller closes and unlinks the blocks once the pool has shut down
+    blocks, specs = [], {}
+    try:
+        for name in EnrollmentIndex.ARRAYS:
+            array = getattr(index, name)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            blocks.append(block)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            specs[name] = (block.name, array.shape, array.dtype.str)
+    except BaseException:
+        _release_blocks(blocks)
+        raise
+    return blocks, (list(index.course_codes), specs)
+
+def _release_blocks(blocks):
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+def _init_worker(course_codes, specs):
+    global _worker_index
+    arrays = {}
+    for name, (block_name, shape, dtype) in specs.items():
+        # the worker keeps the blocks open for as long as it lives, so the arrays stay mapped
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker_blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    _worker_index = EnrollmentIndex.from_arrays(course_codes, arrays)
+
+def _pool_context():
+    # background jobs run on threads, and forking a threaded process can copy held locks into the child;
+    # forkserver workers fork from a clean single-threaded server instead
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+def _score_seed(seed, courses, start_date, end_date, holidays, weekends, semester, weights, fixed_exams, slot_args):
+    schedule = auto_schedule_exams_by_program_gap(list(courses), None, start_date, end_date, holidays, weekends,
+                                                  semester, rng=random.Random(seed), **slot_args)
+    if schedule is None:
+        return {"seed": seed, "cost": math.inf, "components": None}
+    components = evaluate_schedule(_worker_index, flatten_schedule_to_list(schedule) + list(fixed_exams))
+    return {"seed": seed, "cost": schedule_cost(components, weights), "components": components}
+
+@instrument("best_of_n_schedules")
+def best_of_n_schedules(courses, index, start_date, end_date, holidays, weekends, semester, n_starts=32,
+                        max_workers=None, weights=None, fixed_exams=(), base_seed=0, slots=DEFAULT_SLOTS,
+                        seat_capacity=None, seats=None):
+    weights = weights or SOFT_COST_WEIGHTS
+    seeds = [base_seed + i for i in range(n_starts)]
+    count(n_starts=n_starts, courses=len(courses))
+    slot_args = {"slots": list(slots), "seat_capacity": seat_capacity, "seats": seats}
+    args = (list(courses), start_date, end_date, list(holidays), set(weekends), semester, weights, list(fixed_exams),
+            slot_args)
+    # each pool maps its own copy of the index arrays, so concurrent runs never see each other's; workers share
+    # that one copy rather than holding one each, and only build their own incidence data (4 bytes per enrolment)
+    blocks, shared = _share_index(index)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=_pool_context(), initializer=_init_worker,
+                                 initargs=shared) as executor:
+            futures = [executor.submit(_score_seed, seed, *args) for seed in seeds]
+            results = []
+            try:
+                for future in as_completed(futures):
+                    results.append(future.result())
+                    progress(len(results), n_starts)
+            except JobCancelled:
+                # seeds not started yet are dropped rather than waited for
+                for future in futures:
+                    future.cancel()
+                raise
+    finally:
+        _release_blocks(blocks)
+    results.sort(key=lambda r: (r["cost"], r["seed"]))
+    best = results[0]
+    if math.isinf(best["cost"]):
+        return None, None, results
+    schedule = auto_schedule_exams_by_program_gap(list(courses), None, start_date, end_date, holidays, weekends,
+                                                  semester, rng=random.Random(best["seed"]), **slot_args)
+    return schedule, best["seed"], results
+
+
+# Student Load Analytics
+LOAD_METRIC_COLUMNS = ['Exams', 'Exam Days', 'Max Exams Per Day', 'Multi-Exam Days', 'Back-to-Back Days',
+                       'Min Gap Days', 'Longest Streak']
+
+def _student_programmes(index, pmf_df):
+    # programme of most of the student's papers, for NRFs without a Programme Name column
+    codes = pmf_df.dropna(subset=['Paper Code', 'Programme Name']).drop_duplicates(subset=['Paper Code'])
+    lookup = pd.Series(codes['Programme Name'].to_numpy(dtype=object),
+                       index=codes['Paper Code'].astype(str).str.strip().to_numpy(dtype=object))
+    programmes = lookup.reindex(index.course_codes).to_numpy(dtype=object)[index.pair_courses]
+    pairs = pd.DataFrame({'student': index.pair_students, 'programme': programmes}).dropna()
+    top = pairs.groupby(['student', 'programme']).size().sort_values(ascending=False, kind="stable").reset_index()
+    top = top.drop_duplicates(subset=['student'])
+    values = np.full(index.n_students, None, dtype=object)
+    values[top['student'].to_numpy()] = top['programme'].to_numpy(dtype=object)
+    return values
+
+@instrument("student_load_metrics")
+def student_load_metrics(index, exam_list, pmf_df=None):
+    """One row per student with an exam in `exam_list`: exam count, busiest day, back-to-back and gap figures.
+
+    Days are calendar days, so a Friday/Monday pair is a three-day gap. Programme and semester come from
+    the NRF, falling back to the PMF programme of most of the student's papers.
+    """
+    schedule = CompactSchedule.from_exam_list(exam_list).unique()
+    course_ids = schedule.index_course_ids(index)
+    known = course_ids >= 0
+    columns = ['Regd. No.'] + STUDENT_GROUP_COLUMNS + LOAD_METRIC_COLUMNS
+    if not known.any():
+        return pd.DataFrame(columns=columns)
+    first_day = int(schedule.day[known].min())
+    days = schedule.day[known] - first_day
+    n_days = int(days.max()) + 1
+
+    # students x calendar days exam counts; CSR rows list each student's exam days in order
+    placement = sparse.csr_matrix((np.ones(known.sum(), dtype=np.int32), (course_ids[known], days)),
+                                  shape=(index.n_courses, n_days))
+    per_day = (index.incidence() @ placement).tocsr()
+    per_day.sum_duplicates()
+    per_day.sort_indices()
+    exam_days = np.diff(per_day.indptr)
+    students = np.flatnonzero(exam_days)
+    row_of = np.repeat(np.arange(index.n_students), exam_days)
+
+    # gaps between a student's consecutive exam days; the first entry of each row has no predecessor
+    gaps = np.diff(per_day.indices, prepend=0)
+    has_prev = np.ones(len(gaps), dtype=bool)
+    has_prev[per_day.indptr[students]] = False
+    min_gap = np.full(index.n_students, np.inf)
+    np.minimum.at(min_gap, row_of[has_prev], gaps[has_prev])
+    back_to_back = np.bincount(row_of[has_prev & (gaps == 1)], minlength=index.n_students)
+
+    # streaks are runs of entries whose gap to the previous exam day is one
+    run_start = ~has_prev | (gaps != 1)
+    run_id = np.cumsum(run_start) - 1
+    run_length = np.bincount(run_id)
+    longest = np.zeros(index.n_students, dtype=np.int64)
+    np.maximum.at(longest, row_of[run_start], run_length)
+
+    max_per_day = np.zeros(index.n_students, dtype=np.int64)
+    np.maximum.at(max_per_day, row_of, per_day.data)
+    metrics = pd.DataFrame({
+        'Regd. No.': index.reg_nos[students],
+        'Exams': np.asarray(per_day.sum(axis=1)).ravel()[students],
+        'Exam Days': exam_days[students],
+        'Max Exams Per Day': max_per_day[students],
+        'Multi-Exam Days': np.bincount(row_of[per_day.data > 1], minlength=index.n_students)[students],
+        'Back-to-Back Days': back_to_back[students],
+        'Min Gap Days': np.where(np.isinf(min_gap), np.nan, min_gap)[students],
+        'Longest Streak': longest[students],
+    })
+    groups = dict(index.student_groups)
+    if 'Programme Name' not in groups and pmf_df is not None:
+        groups['Programme Name'] = _student_programmes(index, pmf_df)
+    for position, column in enumerate(STUDENT_GROUP_COLUMNS, start=1):
+        values = groups[column][students] if column in groups else np.full(len(students), None, dtype=object)
+        metrics.insert(position, column, pd.Series(values, dtype=object).fillna("Unknown").astype(str).to_numpy())
+    count(students=len(students), exams=len(schedule))
+    return metrics
+
+def student_load_summary(metrics, by=('Programme Name', 'Semester')):
+    # distribution of each metric per group; a Min Gap Days of NaN means the student sits a single exam day
+    by = [column for column in by if column in metrics.columns]
+    grouped = metrics.groupby(by, sort=True) if by else metrics.assign(All="All").groupby('All')
+    summary = grouped.agg(**{
+        'Students': ('Regd. No.', 'size'),
+        'Mean Exams': ('Exams', 'mean'),
+        'Max Exams Per Day': ('Max Exams Per Day', 'max'),
+        'Students With Multi-Exam Days': ('Multi-Exam Days', lambda s: int((s > 0).sum())),
+        'Students With Back-to-Back': ('Back-to-Back Days', lambda s: int((s > 0).sum())),
+        'Mean Back-to-Back Days': ('Back-to-Back Days', 'mean'),
+        'Min Gap Days': ('Min Gap Days', 'min'),
+        'Median Min Gap Days': ('Min Gap Days', 'median'),
+        'Longest Streak': ('Longest Streak', 'max'),
+    }).reset_index()
+    summary['Back-to-Back Share'] = summary['Students With Back-to-Back'] / summary['Students']
+    return summary
+
+def metric_distribution(metrics, column, by=('Programme Name', 'Semester')):
+    # students per metric value, one column per value, for histograms and side-by-side comparison
+    by = [c for c in by if c in metrics.columns]
+    values = metrics[column].fillna(-1).astype(np.int64)
+    table = pd.crosstab([metrics[c] for c in by] if by else np.zeros(len(metrics), dtype=int), values)
+    return table.rename(columns={-1: "n/a"})
+
+def worst_student_loads(metrics, n=10, by=('Programme Name', 'Semester')):
+    # heaviest timetables first: busiest day, back-to-back days, longest streak, then the tightest gap
+    by = [c for c in by if c in metrics.columns]
+    ranked = metrics.assign(_gap=metrics['Min Gap Days'].fillna(np.inf)).sort_values(
+        ['Max Exams Per Day', 'Back-to-Back Days', 'Longest Streak', '_gap'],
+        ascending=[False, False, False, True], kind="stable")
+    worst = ranked.groupby(by, sort=True).head(n) if by else ranked.head(n)
+    worst = worst.sort_values(by, kind="stable") if by else worst
+    return worst.drop(columns='_gap').reset_index(drop=True)
+
+
+# Exact Scheduling
+EXACT_BACKENDS = ["auto", "highs", "cp-sat"]
+
+def _exam_window_days(start_date, end_date, holidays, weekends):
+    return get_calendar(holidays, weekends).valid_days(start_date, end_date)
+
+def _exact_model(courses, index, days, slots, semester, groups, seat_capacity, gap_days):
+    """Binary model over x[course, (day, slot)] followed by one day-used flag per day.
+
+    Rows are returned as a sparse matrix with lower/upper bounds so either backend can consume them.
+    """
+    n_courses, n_slots, n_days = len(courses), len(slots), len(days)
+    n_bins = n_days * n_slots
+    n_x = n_courses * n_bins
+    position = {c: i for i, c in enumerate(courses)}
+    day_pos = {d: k for k, d in enumerate(days)}
+    _, max_papers = papers_per_day_bounds(semester)
+    x = np.arange(n_x).reshape(n_courses, n_bins)
+    used = n_x + np.arange(n_days)
+    blocks = []
+
+    def add_rows(cols, vals, lo, hi):
+        # one row per line of `cols`; vals broadcast against it
+        cols = np.atleast_2d(cols)
+        if cols.size:
+            blocks.append((cols, np.broadcast_to(vals, cols.shape), lo, hi))
+
+    # the mandatory language papers of semester II share one bin unless a group already fixes them
+    mandatory = [position[c] for c in sorted(MANDATORY_GROUP) if c in position]
+    tie_mandatory = (semester == "II" and len(mandatory) > 1
+                     and not any(MANDATORY_GROUP.intersection(g["courses"]) for g in groups))
+    together = [{position[c] for c in g["courses"] if c in position} for g in groups]
+    if tie_mandatory:
+        together.append(set(mandatory))
+
+    var_upper = np.ones(n_x + n_days)
+    fixed_days = set()
+    for group in groups:
+        group_date = group["date"].date() if isinstance(group["date"], datetime) else group["date"]
+        if group_date not in day_pos:
+            continue
+        fixed_days.add(day_pos[group_date])
+        for c in group["courses"]:
+            if c in position:
+                var_upper[x[position[c]]] = 0
+                var_upper[x[position[c], day_pos[group_date] * n_slots]] = 1
+
+    # every course sits exactly once
+    add_rows(x, 1, 1, 1)
+
+    # co-enrolled courses never share a (day, slot) bin, except papers deliberately sat together
+    known = [(i, index.course_id(c)) for i, c in enumerate(courses)]
+    known = [(i, cid) for i, cid in known if cid is not None]
+    if len(known) > 1:
+        positions = np.array([i for i, _ in known])
+        ids = np.array([cid for _, cid in known])
+        block = sparse.triu(index.co_enrollment()[ids][:, ids], k=1).tocoo()
+        pair_a, pair_b = positions[block.row], positions[block.col]
+        apart = np.array([not any(a in t and b in t for t in together)
+                          for a, b in zip(pair_a.tolist(), pair_b.tolist())], dtype=bool)
+        pair_a, pair_b = pair_a[apart], pair_b[apart]
+        add_rows(np.stack([x[pair_a].ravel(), x[pair_b].ravel()], axis=1), 1, -np.inf, 1)
+
+    # seats per slot from the enrolled student counts
+    if seat_capacity:
+        sizes = index.course_sizes()
+        seats = np.array([sizes[cid] if cid is not None else 0 for cid in map(index.course_id, courses)])
+        for s, slot in enumerate(slots):
+            capacity = seat_capacity.get(slot) if isinstance(seat_capacity, dict) else seat_capacity
+            if capacity:
+                add_rows(x[:, s::n_slots].T, seats, -np.inf, int(capacity))
+
+    # papers per day, linked to the day-used flags; UELS-201 sits alone on its day and, like the
+    # heuristic schedulers' solo placement, does not count as an exam day for the gap rule
+    solos = [position[c] for c in SPECIAL_SOLO if c in position]
+    day_x = x.reshape(n_courses, n_days, n_slots).transpose(1, 0, 2).reshape(n_days, -1)
+    day_papers = max_papers * n_slots
+    weights = np.ones((n_courses, n_slots))
+    weights[solos] = 0
+    add_rows(np.hstack([day_x, used[:, None]]), np.r_[weights.ravel(), -day_papers], -np.inf, 0)
+    if n_slots > 1:
+        # max_papers bounds each sitting, not the whole day
+        add_rows(x.T, 1, -np.inf, max_papers)
+    for solo in solos:
+        weights = np.ones((n_courses, n_slots))
+        weights[solo] = day_papers
+        add_rows(day_x, weights.ravel(), -np.inf, day_papers)
+
+    # exam days at least gap_days apart, except between two fixed combination-group dates
+    ordinals = np.array([d.toordinal() for d in days])
+    near_a, near_b = np.nonzero(np.triu((ordinals[None, :] - ordinals[:, None]) < gap_days, k=1))
+    keep = [not (a in fixed_days and b in fixed_days) for a, b in zip(near_a.tolist(), near_b.tolist())]
+    add_rows(np.stack([used[near_a[keep]], used[near_b[keep]]], axis=1), 1, -np.inf, 1)
+
+    if tie_mandatory:
+        for i in mandatory[1:]:
+            add_rows(np.stack([x[mandatory[0]], x[i]], axis=1), np.array([1, -1]), 0, 0)
+
+    # earliest days first, with each extra exam day costing a full pass over the window
+    cost = np.zeros(n_x + n_days)
+    cost[:n_x] = np.tile(np.arange(n_bins) // n_slots, n_courses)
+    cost[n_x:] = n_days
+
+    row_counts = [cols.shape[0] for cols, _, _, _ in blocks]
+    offsets = np.cumsum([0] + row_counts)
+    row_ids = np.concatenate([np.repeat(np.arange(offsets[k], offsets[k + 1]), cols.shape[1])
+                              for k, (cols, _, _, _) in enumerate(blocks)])
+    matrix = sparse.csr_matrix(
+        (np.concatenate([vals.ravel() for _, vals, _, _ in blocks]).astype(float),
+         (row_ids, np.concatenate([cols.ravel() for cols, _, _, _ in blocks]))),
+        shape=(offsets[-1], n_x + n_days))
+    lower = np.repeat([lo for _, _, lo, _ in blocks], row_counts).astype(float)
+    upper = np.repeat([hi for _, _, _, hi in blocks], row_counts).astype(float)
+    matrix.eliminate_zeros()
+    return matrix, lower, upper, var_upper, cost
+
+def _warm_start_vector(exam_list, courses, days, slots):
+    position = {c: i for i, c in enumerate(courses)}
+    day_pos = {d: k for k, d in enumerate(days)}
+    slot_pos = {s: k for k, s in enumerate(slots)}
+    n_bins = len(days) * len(slots)
+    vector = np.zeros(len(courses) * n_bins + len(days))
+    for course, dt_obj, slot in exam_list:
+        day = dt_obj.date() if isinstance(dt_obj, datetime) else dt_obj
+        i, d, s = position.get(course.strip()), day_pos.get(day), slot_pos.get(slot)
+        if i is None or d is None or s is None:
+            return None
+        vector[i * n_bins + d * len(slots) + s] = 1
+        if course.strip() not in SPECIAL_SOLO:
+            vector[len(courses) * n_bins + d] = 1
+    return vector
+
+def _solve_highs(matrix, lower, upper, var_upper, cost, time_limit, warm, hint):
+    from scipy.optimize import Bounds, LinearConstraint, milp
+    constraints = [LinearConstraint(matrix, lower, upper)]
+    if warm is not None:
+        # HiGHS takes no initial solution through scipy, so a feasible heuristic schedule bounds the objective instead
+        constraints.append(LinearConstraint(cost.reshape(1, -1), -np.inf, float(cost @ warm)))
+    result = milp(cost, constraints=constraints, integrality=np.ones(len(cost)), bounds=Bounds(0, var_upper),
+                  options={"time_limit": time_limit, "disp": False})
+    status = {0: "optimal", 1: "time-limit", 2: "infeasible"}.get(result.status, result.message)
+    return (None if result.x is None else np.round(result.x)), status
+
+def _solve_cpsat(matrix, lower, upper, var_upper, cost, time_limit, warm, hint):
+    from ortools.sat.python import cp_model
+    model = cp_model.CpModel()
+    variables = [model.NewIntVar(0, int(ub), f"v{k}") for k, ub in enumerate(var_upper)]
+    for r in range(matrix.shape[0]):
+        start, stop = matrix.indptr[r], matrix.indptr[r + 1]
+        expr = sum(int(v) * variables[c] for c, v in zip(matrix.indices[start:stop], matrix.data[start:stop]))
+        if np.isfinite(lower[r]):
+            model.Add(expr >= int(lower[r]))
+        if np.isfinite(upper[r]):
+            model.Add(expr <= int(upper[r]))
+    model.Minimize(sum(int(c) * v for c, v in zip(cost, variables) if c))
+    if hint is not None:
+        # CP-SAT repairs hints that break constraints, so even an infeasible heuristic schedule helps
+        for variable, value in zip(variables, hint):
+            model.AddHint(variable, int(value))
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = float(time_limit)
+    status = solver.Solve(model)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None, solver.StatusName(status).lower()
+    return np.array([solver.Value(v) for v in variables], dtype=float), solver.StatusName(status).lower()
+
+@instrument("solve_schedule_exact")
+def solve_schedule_exact(courses, index, start_date, end_date, holidays, weekends, semester, groups=(),
+                         slots=DEFAULT_SLOTS, seat_capacity=None, gap_days=2, time_limit=30.0,
+                         warm_start=None, backend="auto"):
+    """Exact day/slot assignment with clash, seat, group, solo, mandatory-group and gap constraints.
+
+    Returns (schedule dict, details); the schedule is None when the solver finds no feasible assignment.
+    """
+    if backend == "auto":
+        backend = "cp-sat" if HAS_CPSAT else "highs"
+    if backend == "cp-sat" and not HAS_CPSAT:
+        raise ValueError("The cp-sat backend needs OR-Tools (pip install ortools).")
+    courses = list(dict.fromkeys(c.strip() for c in courses))
+    slots = list(slots)
+    days = _exam_window_days(start_date, end_date, holidays, weekends)
+    for group in groups:
+        group_date = group["date"].date() if isinstance(group["date"], datetime) else group["date"]
+        if group_date not in days:
+            days.append(group_date)
+    days.sort()
+    details = {"backend": backend, "status": "no-days", "warm_start": "none"}
+    if not days or not courses:
+        return (None if not days else defaultdict(lambda: defaultdict(list))), details
+
+    warm = hint = None
+    if warm_start:
+        # a warm start that fits the model bounds the horizon to its last exam day
+        warm_days = [dt.date() if isinstance(dt, datetime) else dt for _, dt, _ in warm_start]
+        horizon = [d for d in days if d <= max(warm_days)]
+        matrix, lower, upper, var_upper, cost = _exact_model(courses, index, horizon, slots, semester, groups,
+                                                             seat_capacity, gap_days)
+        warm = _warm_start_vector(warm_start, courses, horizon, slots)
+        if warm is not None and np.all(warm <= var_upper) and np.all((matrix @ warm >= lower) & (matrix @ warm <= upper)):
+            days = horizon
+            hint = warm
+            details["warm_start"] = "feasible"
+        else:
+            warm = None
+            details["warm_start"] = "infeasible"
+    if warm is None:
+        matrix, lower, upper, var_upper, cost = _exact_model(courses, index, days, slots, semester, groups,
+                                                             seat_capacity, gap_days)
+        if warm_start:
+            hint = _warm_start_vector(warm_start, courses, days, slots)
+    count(courses=len(courses), bins=len(days) * len(slots), variables=matrix.shape[1], constraints=matrix.shape[0])
+
+    solve = _solve_cpsat if backend == "cp-sat" else _solve_highs
+    solution, details["status"] = solve(matrix, lower, upper, var_upper, cost, time_limit, warm, hint)
+    if solution is None and warm is not None:
+        solution, details["status"] = warm, details["status"] + " (warm start kept)"
+    if solution is None:
+        return None, details
+    details["objective"] = float(cost @ solution)
+
+    n_bins = len(days) * len(slots)
+    schedule = defaultdict(lambda: defaultdict(list))
+    assigned = solution[:len(courses) * n_bins].reshape(len(courses), n_bins).argmax(axis=1)
+    for i, b in enumerate(assigned.tolist()):
+        schedule[days[b // len(slots)].strftime("%Y-%m-%d")][slots[b % len(slots)]].append(courses[i])
+    return schedule, details
+
+
+# Scheduling Pipeline
+SCHEDULING_MODES = ["gap", "dense", "multi-slot", "coloring", "best-of-n", "exact"]
+
+@instrument("schedule_exams")
+def schedule_exams(courses, start_date, end_date, holidays, weekends, semester, mode="gap", groups=(),
+                   index=None, pmf_df=None, n_starts=32, seat_capacity=None, time_limit=30.0, slots=DEFAULT_SLOTS,
+                   runs=None):
+    count(courses=len(courses), groups=len(groups))
+    slots = list(slots) or list(DEFAULT_SLOTS)
+    # special solo papers get a day of their own below, never a group's date as well
+    groups = [dict(grp, courses=[c for c in grp["courses"] if c not in SPECIAL_SOLO]) for grp in groups]
+    groups = [grp for grp in groups if grp["courses"]]
+    grouped_courses = set(course for grp in groups for course in grp["courses"])
+    remaining_courses = [course for course in courses if course not in grouped_courses and course not in SPECIAL_SOLO]
+    details = {}
+    if mode in ("coloring", "best-of-n", "exact") and index is None:
+        raise ValueError(f"Scheduling mode '{mode}' needs the Nominal Role File.")
+    # seat counts come from the NRF; without it slot capacities cannot be checked
+    seats = course_seats(index, remaining_courses) if seat_capacity and index is not None else None
+    slot_args = {"slots": slots, "seat_capacity": seat_capacity, "seats": seats}
+    if mode == "exact":
+        # groups, UELS-201 and the mandatory papers are constraints of the model itself
+        heuristic, _ = schedule_exams(courses, start_date, end_date, holidays, weekends, semester, mode="coloring",
+                                      groups=groups, index=index, seat_capacity=seat_capacity, slots=slots)
+        all_courses = list(courses) + [c for grp in groups for c in grp["courses"]]
+        return solve_schedule_exact(all_courses, index, start_date, end_date, holidays, weekends, semester, groups,
+                                    slots=slots, seat_capacity=seat_capacity, time_limit=time_limit,
+                                    warm_start=flatten_schedule_to_list(heuristic) if heuristic else None)
+    if mode == "coloring":
+        schedule = auto_schedule_exams_by_coloring(remaining_courses, index, start_date, end_date,
+                                                   holidays, weekends, semester, groups,
+                                                   slots=slots, seat_capacity=seat_capacity, runs=runs)
+    elif mode == "multi-slot":
+        schedule = auto_schedule_exams_multi_slot(remaining_courses, start_date, end_date, holidays, weekends,
+                                                  **slot_args)
+    elif mode == "best-of-n":
+        fixed_exams = [(c, grp["date"], slots[0]) for grp in groups for c in grp["courses"]]
+        schedule, best_seed, runs = best_of_n_schedules(remaining_courses, index, start_date, end_date, holidays,
+                                                        weekends, semester, n_starts=n_starts, fixed_exams=fixed_exams,
+                                                        **slot_args)
+        details = {"seed": best_seed, "runs": runs}
+    elif mode == "dense":
+        schedule = auto_schedule_exams_by_program_dense(remaining_courses.copy(), start_date, end_date, holidays,
+                                                        weekends, **slot_args)
+    else:
+        schedule = auto_schedule_exams_by_program_gap(remaining_courses.copy(), pmf_df, start_date, end_date,
+                                                      holidays, weekends, semester, **slot_args)
+    if schedule is None:
+        return None, details
+
+    if groups:
+        schedule = assign_combination_groups_to_schedule(schedule, groups, slots[0])
+    if "UELS-201" in courses:
+        uels_date = find_valid_date_for_UELS(start_date, end_date, holidays, weekends, schedule)
+        if uels_date is None:
+            # UELS-201 sits alone on a day of its own, and none is left in the window
+            return None, details
+        schedule[uels_date.strftime("%Y-%m-%d")] = {slots[0]: ["UELS-201"]}
+    return schedule, details
+
+def default_groups(courses, semester, groups, start_date, end_date, holidays, weekends):
+    # Semester II keeps the mandatory language papers together on the first exam day unless a group is given
+    mandatory_selected = MANDATORY_GROUP.intersection(courses)
+    if semester != "II" or not mandatory_selected or any(mandatory_selected.issubset(g["courses"]) for g in groups):
+        return list(groups)
+    exam_days = gap_exam_days(start_date, end_date, holidays, weekends)
+    if not exam_days:
+        return list(groups)
+    return [{
+        "group_name": "Mandatory Language Group",
+        "courses": sorted(mandatory_selected),
+        "date": datetime.combine(exam_days[0], datetime.min.time()),
+    }] + list(groups)
+
+
+# Joint Term Scheduling
+DEGREE_TYPES = ['UG', 'PG', 'Professional']
+
+@instrument("term_runs")
+def term_runs(pmf_df, index=None, degrees=DEGREE_TYPES, semesters=None, rules=SEMESTER_RULES):
+    """(degree, semester, papers) for every run the per-semester pipeline would schedule separately."""
+    runs = []
+    for degree_type in degrees:
+        degree_df = filter_pmf_by_degree(pmf_df, degree_type, rules)
+        for semester in semesters or derived_semesters(degree_df):
+            papers = select_semester_papers(degree_df, semester, index)
+            if len(papers):
+                runs.append((degree_type, semester, papers))
+    count(runs=len(runs))
+    return runs
+
+@instrument("schedule_term_jointly")
+def schedule_term_jointly(runs, index, start_date, end_date, holidays, weekends, groups=(), slots=DEFAULT_SLOTS,
+                          seat_capacity=None):
+    """One coloring of every run's papers over shared (day, slot) bins.
+
+    A paper listed by several runs (NRF cross-semester enrollments, shared IDM papers) is scheduled once,
+    and the conflict graph spans all students, so no two runs can put clashing papers in the same sitting.
+    Every run keeps its own semester's paper limit in each sitting, and the exam-day gap holds per programme
+    rather than across the whole term.
+    """
+    courses = list(dict.fromkeys(code for _, _, papers in runs
+                                 for code in papers['Paper Code'].astype(str).str.strip()))
+    if not courses:
+        return None, {}
+    semesters = {semester for _, semester, _ in runs}
+    groups = default_groups(courses, "II" if "II" in semesters else None, groups, start_date, end_date,
+                            holidays, weekends)
+    count(runs=len(runs), courses=len(courses))
+    schedule, details = schedule_exams(courses, start_date, end_date, holidays, weekends, None, mode="coloring",
+                                       groups=groups, index=index, seat_capacity=seat_capacity, slots=slots,
+                                       runs=runs)
+    details.update(groups=groups, courses=len(courses))
+    return schedule, details
+
+def run_exam_list(exam_list, papers):
+    # the joint timetable's exams that belong to one run
+    codes = set(papers['Paper Code'].astype(str).str.strip())
+    return [exam for exam in exam_list if exam[0].strip() in codes]
+
+TIMETABLE_COLUMNS = ['Date', 'Time Slot', 'Paper Code', 'Paper Title', 'Programs']
+
+def _paper_lookup(pmf_df, keys=('Paper Code',)):
+    lookup = pd.DataFrame({
+        'Paper Code': pmf_df['Paper Code'].astype(str).str.strip(),
+        'Paper Title': pmf_df['Paper Title'],
+        'Programs': pmf_df['Programme Name'],
+    })
+    return lookup.drop_duplicates(subset=list(keys))
+
+def _exam_frame(exam_dates):
+    schedule = CompactSchedule.from_exam_list(exam_dates)
+    order = schedule.sort_order()
+    days = schedule.day[order]
+    exams_df = pd.DataFrame({
+        'Date': [datetime.fromordinal(int(d)) for d in days],
+        'Time Slot': np.array(schedule.slots, dtype=object)[schedule.slot[order]],
+        'Paper Code': np.array(schedule.codes, dtype=object)[schedule.course[order]],
+    })
+    labels = schedule.day_labels('%d/%m/%Y')
+    return exams_df, np.array([labels[int(d)] for d in days], dtype=object)
+
+def _paper_columns(exam_codes, lookup):
+    # Paper Title / Programs for each exam from a de-duplicated lookup, "Unknown" when absent
+    positions = pd.Index(lookup['Paper Code']).get_indexer(exam_codes)
+    found = positions >= 0
+    titles = np.full(len(positions), "Unknown Title", dtype=object)
+    programmes = np.full(len(positions), "Unknown Programme", dtype=object)
+    titles[found] = lookup['Paper Title'].to_numpy(dtype=object)[positions[found]]
+    programmes[found] = lookup['Programs'].to_numpy(dtype=object)[positions[found]]
+    return titles, programmes
+
+def _timetable_frames(exams_df, date_labels, lookup):
+    titles, programmes = _paper_columns(exams_df['Paper Code'], lookup)
+    original_df = exams_df.assign(**{'Paper Title': titles, 'Programs': programmes})
+
+    # one header row per exam day followed by that day's entries
+    day_starts = np.r_[True, date_labels[1:] != date_labels[:-1]] if len(date_labels) else np.empty(0, dtype=bool)
+    rows = np.arange(len(date_labels)) + np.cumsum(day_starts)
+    merged_rows = np.full((len(date_labels) + int(day_starts.sum()), len(TIMETABLE_COLUMNS)), "", dtype=object)
+    merged_rows[rows, 1:] = original_df[TIMETABLE_COLUMNS[1:]].to_numpy(dtype=object)
+    merged_rows[rows[day_starts] - 1, 0] = date_labels[day_starts]
+    display_df = pd.DataFrame(merged_rows, columns=TIMETABLE_COLUMNS)
+    return display_df, original_df
+
+@instrument("build_timetable")
+def build_timetable(exam_dates, pmf_df, programme=None):
+    df_papers = pmf_df
+    if programme:
+        df_papers = df_papers[df_papers['Programme Name'] == programme]
+    if df_papers.empty:
+        return None, None
+    exams_df, date_labels = _exam_frame(exam_dates)
+    count(exams=len(exams_df), rows=len(df_papers))
+    return _timetable_frames(exams_df, date_labels, _paper_lookup(df_papers))
+
+@instrument("build_programme_timetables")
+def build_programme_timetables(exam_dates, pmf_df):
+    # every programme's "By Program" timetable from one pass over the exam list
+    exams_df, date_labels = _exam_frame(exam_dates)
+    lookup = _paper_lookup(pmf_df.dropna(subset=['Programme Name']), keys=('Programs', 'Paper Code'))
+    count(exams=len(exams_df), rows=len(pmf_df))
+    groups = lookup.groupby('Programs', sort=False)
+    timetables = {}
+    for programme, programme_lookup in groups:
+        progress(len(timetables), groups.ngroups)
+        timetables[programme] = _timetable_frames(exams_df, date_labels, programme_lookup)
+    return timetables
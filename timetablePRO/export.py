@@ -0,0 +1,253 @@
+import csv
+import io
+import itertools
+import re
+import zipfile
+from datetime import datetime, timedelta
+
+import numpy as np
+from scipy import sparse
+
+from engine import TIMETABLE_COLUMNS, build_programme_timetables, build_timetable
+from jobs import progress
+from profiling import count, instrument
+
+EXPORT_FORMATS = ["xlsx", "pdf", "ics"]
+PERSONAL_COLUMNS = ['Regd. No.'] + TIMETABLE_COLUMNS[:4]
+XLSX_MAX_ROWS = 1048576
+SLOT_TIMES = re.compile(r"(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})")
+
+
+def safe_filename(name):
+    return re.sub(r"[^\w-]+", "_", str(name)).strip("_") or "unnamed"
+
+def _sheet_title(name, used):
+    # Excel sheet names: at most 31 characters, no []:*?/\ and unique within the workbook
+    base = re.sub(r"[\[\]:*?/\\]", "_", str(name))[:31] or "Sheet"
+    title, n = base, 1
+    while title.lower() in used:
+        n += 1
+        title = f"{base[:31 - len(str(n)) - 1]}~{n}"
+    used.add(title.lower())
+    return title
+
+def _programme_rows(programme_df):
+    # a programme's own papers; the other programmes' exams only appear there as "Unknown Programme"
+    return programme_df[programme_df['Programs'] != "Unknown Programme"]
+
+
+# Personal Timetables
+def personal_timetables(index, timetable_df):
+    """Yield (registration number, row positions into timetable_df) per student, in date/slot order.
+
+    One sparse students x exams product replaces a per-student filter, so no per-student frame is built.
+    """
+    course_ids = np.array([index.course_lookup.get(code, -1) for code in timetable_df['Paper Code']], dtype=np.int64)
+    known = course_ids >= 0
+    placement = sparse.csr_matrix((np.ones(known.sum(), dtype=np.int32), (course_ids[known], np.flatnonzero(known))),
+                                  shape=(index.n_courses, len(timetable_df)))
+    personal = (index.incidence() @ placement).tocsr()
+    personal.sort_indices()
+    for student in np.flatnonzero(np.diff(personal.indptr)):
+        yield index.reg_nos[student], personal.indices[personal.indptr[student]:personal.indptr[student + 1]]
+
+
+# XLSX
+def write_xlsx(stream, sheets):
+    # sheets: (name, columns, row iterable) in order; write-only mode keeps one row in memory at a time
+    import openpyxl  # deferred: most runs never write an XLSX
+
+    workbook = openpyxl.Workbook(write_only=True)
+    used = set()
+    for name, columns, rows in sheets:
+        sheet, n_rows, part = None, XLSX_MAX_ROWS, 0
+        for row in rows:
+            if n_rows >= XLSX_MAX_ROWS:
+                # a sheet that outgrows Excel's row limit continues on "<name> 2", "<name> 3", ...
+                part += 1
+                sheet = workbook.create_sheet(_sheet_title(name if part == 1 else f"{name} {part}", used))
+                sheet.append(columns)
+                n_rows = 1
+            sheet.append(row)
+            n_rows += 1
+        if sheet is None:
+            workbook.create_sheet(_sheet_title(name, used)).append(columns)
+    workbook.save(stream)
+
+def _frame_rows(df):
+    for row in df.itertuples(index=False):
+        yield [value.to_pydatetime() if hasattr(value, "to_pydatetime") else value for value in row]
+
+
+# PDF
+PDF_PAGE = (842, 595)  # A4 landscape in points
+PDF_FONT_SIZE = 8
+PDF_MARGIN = 36
+
+def _pdf_escape(text):
+    return str(text).replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def pdf_table(title, columns, rows):
+    """A plain Courier table PDF, paginated, with no PDF library needed; column widths fit the page."""
+    rows = [[str(value) for value in row] for row in rows]
+    char_width = PDF_FONT_SIZE * 0.6
+    max_chars = int((PDF_PAGE[0] - 2 * PDF_MARGIN) / char_width)
+    widths = [max([len(str(c))] + [len(r[i]) for r in rows]) for i, c in enumerate(columns)]
+    # the widest column gives way first when the table is wider than the page
+    while sum(widths) + 2 * (len(widths) - 1) > max_chars and max(widths) > 8:
+        widths[widths.index(max(widths))] -= 1
+    line = lambda values: "  ".join(str(v)[:w].ljust(w) for v, w in zip(values, widths)).rstrip()
+    leading = PDF_FONT_SIZE * 1.4
+    per_page = int((PDF_PAGE[1] - 2 * PDF_MARGIN) / leading) - 3
+    header = [title, "", line(columns), "-" * min(sum(widths) + 2 * (len(widths) - 1), max_chars)]
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>"]
+    page_ids = []
+    for start in range(0, max(len(rows), 1), per_page):
+        lines = header + [line(r) for r in rows[start:start + per_page]]
+        text = "".join(f"({_pdf_escape(text)}) '\n" for text in lines)
+        content = (f"BT /F1 {PDF_FONT_SIZE} Tf {leading:.1f} TL {PDF_MARGIN} {PDF_PAGE[1] - PDF_MARGIN} Td\n{text}ET"
+                   .encode("cp1252", errors="replace"))
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PDF_PAGE[0]} {PDF_PAGE[1]}] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>".encode())
+        page_ids.append(len(objects))
+    objects[1] = (f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] "
+                  f"/Count {len(page_ids)} >>").encode()
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+# ICS
+def _ics_text(value):
+    return str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+def _ics_fold(line):
+    # content lines fold at 75 octets with a leading space on each continuation
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts, start = [], 0
+    while start < len(data):
+        end = min(start + (75 if not parts else 74), len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode("utf-8"))
+        start = end
+    return "\r\n ".join(parts) + "\r\n"
+
+def _ics_when(exam_date, slot):
+    match = SLOT_TIMES.search(str(slot))
+    if not match:
+        day = exam_date.strftime("%Y%m%d")
+        following = (exam_date + timedelta(days=1)).strftime("%Y%m%d")
+        return [f"DTSTART;VALUE=DATE:{day}", f"DTEND;VALUE=DATE:{following}"]
+    h1, m1, h2, m2 = map(int, match.groups())
+    return [f"DTSTART:{exam_date.strftime('%Y%m%d')}T{h1:02d}{m1:02d}00",
+            f"DTEND:{exam_date.strftime('%Y%m%d')}T{h2:02d}{m2:02d}00"]
+
+def ics_events(df):
+    # one rendered VEVENT per row, reused by every calendar that lists the exam
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    events = []
+    for exam_date, slot, code, title in zip(df['Date'], df['Time Slot'], df['Paper Code'], df['Paper Title']):
+        lines = ["BEGIN:VEVENT",
+                 f"UID:{exam_date.strftime('%Y%m%d')}-{safe_filename(slot)}-{safe_filename(code)}@timetablepro",
+                 f"DTSTAMP:{stamp}"]
+        lines += _ics_when(exam_date, slot)
+        lines += [f"SUMMARY:{_ics_text(f'{code} {title}')}", "END:VEVENT"]
+        events.append("".join(map(_ics_fold, lines)))
+    return events
+
+def write_ics(stream, name, events):
+    # events: rendered VEVENT blocks from ics_events; times are local floating times
+    stream.write("".join(map(_ics_fold, ("BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//TimeTable PRO//Exam Timetable//EN",
+                                         "CALSCALE:GREGORIAN", f"X-WR-CALNAME:{_ics_text(name)}"))))
+    stream.write("".join(events))
+    stream.write(_ics_fold("END:VCALENDAR"))
+
+def _csv_fields(values):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(values)
+    return buffer.getvalue()
+
+
+# Bundle
+@instrument("export_bundle")
+def export_bundle(stream, exam_list, pmf_df, index=None, formats=EXPORT_FORMATS, personal=True, name="timetable"):
+    """Write one zip with the combined and per-programme timetables in each of `formats`.
+
+    With the enrollment index the XLSX also gets the student count sheet and, when `personal` is set, the zip
+    gets personal_timetables.csv plus one ICS calendar per student under personal/. Zip members are written
+    straight into the archive as they are produced, and every exam is rendered once however many students sit it.
+    """
+    _, combined_df = build_timetable(exam_list, pmf_df)
+    if combined_df is None:
+        return False
+    # programme frames keep the combined frame's row labels, which index the pre-rendered rows below
+    programmes = {programme: _programme_rows(original_df)
+                  for programme, (_, original_df) in build_programme_timetables(exam_list, pmf_df).items()}
+    personal = personal and index is not None
+    count(exams=len(combined_df), programmes=len(programmes))
+
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        if "xlsx" in formats:
+            sheets = [("Combined", TIMETABLE_COLUMNS, _frame_rows(combined_df))]
+            sheets += [(programme, TIMETABLE_COLUMNS, _frame_rows(df)) for programme, df in programmes.items()]
+            if index is not None:
+                sheets.append(("Student Count", ['Paper Code', 'Student Count'],
+                               _frame_rows(index.student_counts_frame())))
+            with archive.open(f"{name}.xlsx", "w") as member:
+                write_xlsx(member, sheets)
+
+        if "pdf" in formats:
+            display = lambda df: ([d.strftime("%d/%m/%Y"), s, c, t] for d, s, c, t in
+                                  zip(df['Date'], df['Time Slot'], df['Paper Code'], df['Paper Title']))
+            archive.writestr(f"pdf/{name}.pdf", pdf_table("Combined Timetable", TIMETABLE_COLUMNS[:4],
+                                                          display(combined_df)))
+            for programme, df in programmes.items():
+                archive.writestr(f"pdf/{safe_filename(programme)}.pdf",
+                                 pdf_table(f"{programme} Timetable", TIMETABLE_COLUMNS[:4], display(df)))
+
+        if personal:
+            exam_fields = [_csv_fields([d.strftime("%d/%m/%Y"), s, c, t]) for d, s, c, t in
+                           zip(combined_df['Date'], combined_df['Time Slot'], combined_df['Paper Code'],
+                               combined_df['Paper Title'])]
+            with archive.open("personal_timetables.csv", "w") as member, \
+                    io.TextIOWrapper(member, encoding="utf-8", newline="") as text:
+                text.write(_csv_fields(PERSONAL_COLUMNS) + "\n")
+                n_students = 0
+                for reg, rows in personal_timetables(index, combined_df):
+                    prefix = _csv_fields([reg]) + ","
+                    text.write("".join(prefix + exam_fields[i] + "\n" for i in rows))
+                    n_students += 1
+                    if n_students % 256 == 0:
+                        progress(students=n_students)
+                count(students=n_students)
+
+        if "ics" in formats:
+            events = ics_events(combined_df)
+            calendars = [(f"ics/{name}.ics", "Exam Timetable", events)]
+            calendars += [(f"ics/{safe_filename(programme)}.ics", f"{programme} Exams", [events[i] for i in df.index])
+                          for programme, df in programmes.items()]
+            if personal:
+                calendars = itertools.chain(calendars, (
+                    (f"personal/{safe_filename(reg)}.ics", f"{reg} Exams", [events[i] for i in rows])
+                    for reg, rows in personal_timetables(index, combined_df)))
+            for n_calendars, (path, calendar_name, calendar_events) in enumerate(calendars):
+                if n_calendars % 256 == 0:
+                    progress(calendars=n_calendars)
+                with archive.open(path, "w") as member, io.TextIOWrapper(member, encoding="utf-8", newline="") as text:
+                    write_ics(text, calendar_name, calendar_events)
+    return True
@@ -0,0 +1,224 @@
+import io
+import os
+import re
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import pandas as pd
+
+from engine import build_enrollment_index_from_chunks, get_code_columns, hash_bytes, prepare_pmf
+from profiling import count, instrument
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+CACHE_DIR = os.environ.get("TIMETABLE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "timetablepro"))
+MEMORY_CACHE_SIZE = 8
+NRF_CHUNK_ROWS = 20000
+
+# Parsed tables are shared between reruns and sessions, so callers must treat them as read-only
+_memory_cache = OrderedDict()
+
+
+def read_upload(data, filename=""):
+    if filename.lower().endswith(".csv"):
+        return pd.read_csv(io.BytesIO(data))
+    return pd.read_excel(io.BytesIO(data))
+
+def _normalize_codes(series):
+    present = series.notna()
+    codes = pd.Series(None, index=series.index, dtype=object)
+    codes[present] = series[present].astype(str).str.strip().to_numpy(dtype=object)
+    codes[codes == ""] = None
+    return codes
+
+def normalize_pmf(pmf_df):
+    pmf_df['Paper Code'] = _normalize_codes(pmf_df['Paper Code'])
+    return prepare_pmf(pmf_df)
+
+def normalize_nrf(nominal_df):
+    for col in get_code_columns(nominal_df):
+        nominal_df[col] = _normalize_codes(nominal_df[col])
+    return nominal_df
+
+NORMALIZERS = {"pmf": normalize_pmf, "nrf": normalize_nrf}
+
+
+def _cache_paths(kind, digest):
+    base = os.path.join(CACHE_DIR, f"{kind}-{digest}")
+    return base + ".parquet", base + ".pkl"
+
+def _read_disk(kind, digest):
+    parquet_path, pickle_path = _cache_paths(kind, digest)
+    try:
+        if HAS_PARQUET and os.path.exists(parquet_path):
+            return pd.read_parquet(parquet_path)
+        if os.path.exists(pickle_path):
+            return pd.read_pickle(pickle_path)
+    except Exception:
+        pass
+    return None
+
+def _write_disk(kind, digest, df):
+    parquet_path, pickle_path = _cache_paths(kind, digest)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+    except OSError:
+        return
+    if HAS_PARQUET:
+        try:
+            df.to_parquet(parquet_path + ".tmp", index=False)
+            os.replace(parquet_path + ".tmp", parquet_path)
+            return
+        except Exception:
+            # mixed-type object columns cannot be written as Parquet
+            if os.path.exists(parquet_path + ".tmp"):
+                os.remove(parquet_path + ".tmp")
+    try:
+        df.to_pickle(pickle_path + ".tmp")
+        os.replace(pickle_path + ".tmp", pickle_path)
+    except OSError:
+        pass
+
+def _remember(key, df):
+    _memory_cache[key] = df
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+
+@instrument("load_table")
+def load_table(kind, data, filename=""):
+    digest = hash_bytes(data)
+    key = (kind, digest)
+    if key in _memory_cache:
+        _memory_cache.move_to_end(key)
+        count(bytes=len(data), rows=len(_memory_cache[key]), cache="memory")
+        return _memory_cache[key], digest
+    df = _read_disk(kind, digest)
+    cache = "disk"
+    if df is None:
+        df = NORMALIZERS[kind](read_upload(data, filename))
+        _write_disk(kind, digest, df)
+        cache = "miss"
+    _remember(key, df)
+    count(bytes=len(data), rows=len(df), cache=cache)
+    return df, digest
+
+def load_pmf(data, filename=""):
+    return load_table("pmf", data, filename)
+
+def load_nrf(data, filename=""):
+    return load_table("nrf", data, filename)
+
+def iter_nrf_chunks(data, filename="", chunk_rows=NRF_CHUNK_ROWS):
+    name = filename.lower()
+    if name.endswith(".csv"):
+        yield from pd.read_csv(io.BytesIO(data), chunksize=chunk_rows, dtype=object)
+        return
+    if name.endswith(".xls"):
+        # xlrd has no streaming reader, so slice the parsed sheet instead
+        df = pd.read_excel(io.BytesIO(data))
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+        return
+    import openpyxl  # deferred: most runs never stream an .xlsx
+
+    workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(h) if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+        buffer = []
+        start = 0
+        for row in rows:
+            if any(value is not None for value in row):
+                buffer.append(row[:len(header)])
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame(buffer, columns=header, index=pd.RangeIndex(start, start + len(buffer)))
+                start += len(buffer)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=header, index=pd.RangeIndex(start, start + len(buffer)))
+    finally:
+        workbook.close()
+
+@instrument("load_nrf_index")
+def load_nrf_index(data, filename="", chunk_rows=NRF_CHUNK_ROWS):
+    # streaming mode: only the enrollment index is kept, the wide NRF frame is never built
+    digest = hash_bytes(data)
+    key = ("nrf-index", digest)
+    if key not in _memory_cache:
+        _remember(key, build_enrollment_index_from_chunks(iter_nrf_chunks(data, filename, chunk_rows)))
+    _memory_cache.move_to_end(key)
+    return _memory_cache[key], digest
+
+# Holidays
+ICS_DATE = re.compile(r"(\d{4})(\d{2})(\d{2})")
+
+def _ics_lines(text):
+    # unfold continuation lines (a leading space or tab continues the previous line)
+    return re.sub(r"\r?\n[ \t]", "", text).splitlines()
+
+def _ics_date(line):
+    match = ICS_DATE.match(line.rsplit(":", 1)[-1].strip())
+    return date(*map(int, match.groups())) if match else None
+
+def ics_holidays(text):
+    """Days covered by the VEVENTs of an iCalendar file.
+
+    All-day events cover DTSTART up to the day before DTEND, timed events their start day. Recurrence rules
+    are not expanded, so every year's holidays must be listed as events of their own.
+    """
+    holidays = []
+    start = end = None
+    all_day = True
+    for line in _ics_lines(text):
+        name = line.split(":", 1)[0].split(";", 1)[0].upper()
+        if name == "BEGIN" and line.upper().endswith("VEVENT"):
+            start = end = None
+        elif name == "DTSTART":
+            start = _ics_date(line)
+            all_day = "VALUE=DATE" in line.upper() or len(line.rsplit(":", 1)[-1].strip()) == 8
+        elif name == "DTEND":
+            end = _ics_date(line)
+        elif name == "END" and line.upper().endswith("VEVENT") and start is not None:
+            days = (end - start).days if all_day and end is not None and end > start else 1
+            holidays.extend(start + timedelta(days=i) for i in range(days))
+    return holidays
+
+def table_holidays(df):
+    # the first column with "date" in its name, or else the first column
+    columns = [c for c in df.columns if "date" in str(c).lower()] or list(df.columns[:1])
+    if not columns:
+        return []
+    values = df[columns[0]]
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        # ISO dates as written, anything else day first (26/01/2025)
+        values = values.astype(str).str.strip()
+        iso = values.str.match(r"\d{4}-\d{1,2}-\d{1,2}")
+        values = pd.to_datetime(values.where(iso), format="mixed", errors="coerce").fillna(
+            pd.to_datetime(values.where(~iso), format="mixed", dayfirst=True, errors="coerce"))
+    return values.dropna().dt.date.tolist()
+
+@instrument("load_holidays")
+def load_holidays(data, filename=""):
+    """Sorted unique holiday dates from an uploaded ICS, CSV or Excel file."""
+    if filename.lower().endswith((".ics", ".ical")):
+        holidays = ics_holidays(data.decode("utf-8-sig", errors="replace"))
+    else:
+        holidays = table_holidays(read_upload(data, filename))
+    holidays = sorted(set(holidays))
+    count(bytes=len(data), holidays=len(holidays))
+    return holidays
+
+def clear_cache(disk=False):
+    _memory_cache.clear()
+    if disk and os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if name.startswith(("pmf-", "nrf-")):
+                os.remove(os.path.join(CACHE_DIR, name))
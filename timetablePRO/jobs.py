@@ -0,0 +1,158 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+from profiling import use
+
+# The job the current worker thread runs; None outside a job keeps every progress() call a single lookup
+_current = ContextVar("timetable_job", default=None)
+
+JOB_WORKERS = 2
+# finished jobs kept for pickup; older ones are dropped first
+MAX_FINISHED_JOBS = 64
+FINISHED = ("done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised by progress() inside a job whose cancellation was requested."""
+
+
+class Job:
+    """One background operation: status, progress counters, and its result or error once finished."""
+
+    def __init__(self, name, profiler=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        # the job's own Profiler, if it is profiled; filled from the worker thread, read once finished
+        self.profiler = profiler
+        self.status = "queued"
+        self.done = None
+        self.total = None
+        self.counters = {}
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.future = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def is_finished(self):
+        return self.status in FINISHED
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+        # a job still waiting for a worker never starts
+        if self.future is not None and self.future.cancel():
+            self._finish("cancelled")
+
+    def fraction(self):
+        if not self.total:
+            return None
+        return min(max(self.done / self.total, 0.0), 1.0)
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def update(self, done=None, total=None, **counters):
+        with self._lock:
+            if done is not None:
+                self.done = done
+            if total is not None:
+                self.total = total
+            self.counters.update(counters)
+
+    def snapshot(self):
+        with self._lock:
+            return {"id": self.id, "name": self.name, "status": self.status, "done": self.done, "total": self.total,
+                    "counters": dict(self.counters), "seconds": self.elapsed(), "error": self.error}
+
+    def _finish(self, status, result=None, error=None):
+        with self._lock:
+            self.status, self.result, self.error = status, result, error
+            self.finished = time.time()
+
+    def _run(self, func, args, kwargs):
+        token = _current.set(self)
+        self.status, self.started = "running", time.time()
+        try:
+            if self._cancel.is_set():
+                raise JobCancelled()
+            with use(self.profiler):
+                result = func(*args, **kwargs)
+        except JobCancelled:
+            self._finish("cancelled")
+        except Exception as e:
+            self._finish("failed", error=f"{type(e).__name__}: {e}\n{traceback.format_exc()}")
+        else:
+            self._finish("done", result)
+        finally:
+            _current.reset(token)
+
+
+class JobRegistry:
+    """Background jobs on a small thread pool, looked up by id across Streamlit reruns and sessions."""
+
+    def __init__(self, max_workers=JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="timetable-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, name, func, *args, profiler=None, **kwargs):
+        # `profiler` times the job alone; the submitter's active profiler never sees the job's spans
+        job = Job(name, profiler)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(job._run, func, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id) if job_id else None
+
+    def jobs(self, ids=None):
+        with self._lock:
+            return [job for job_id, job in self._jobs.items() if ids is None or job_id in ids]
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[job_id]
+
+    def shutdown(self, cancel=True):
+        if cancel:
+            for job in self.jobs():
+                job.cancel()
+        self._executor.shutdown(wait=True)
+
+
+def progress(done=None, total=None, **counters):
+    # progress hook for long loops; a no-op outside a job, and the point where a cancelled job stops
+    job = _current.get()
+    if job is None:
+        return
+    job.update(done, total, **counters)
+    if job.cancel_requested:
+        raise JobCancelled()
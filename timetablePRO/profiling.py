@@ -0,0 +1,152 @@
+import functools
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# The active profiler for the current run; None keeps every hook down to a single ContextVar lookup
+_active = ContextVar("timetable_profiler", default=None)
+
+# memory tracing is shared by the whole process: it runs while a Streamlit rerun or any activated profiler
+# (a CLI run, a background job) asks for it, and stops with the last of them unless it was on already
+_tracing_lock = threading.Lock()
+_tracers = set()
+_rerun_tracing = False
+_started_tracing = False
+
+
+class Profiler:
+    """Collects timed spans and counters for one run of the app or the CLI."""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.spans = []
+        self._stack = []
+
+    @contextmanager
+    def activate(self):
+        if self.trace_memory:
+            _update_tracing(add=self)
+        token = _active.set(self)
+        try:
+            yield self
+        finally:
+            _active.reset(token)
+            if self.trace_memory:
+                _update_tracing(remove=self)
+
+    @contextmanager
+    def span(self, name):
+        record = {"name": name, "depth": len(self._stack), "seconds": 0.0, "counters": {}}
+        if self.trace_memory:
+            start_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            record["_child_peak"] = 0
+        self.spans.append(record)
+        self._stack.append(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - started
+            self._stack.pop()
+            if self.trace_memory:
+                # nested spans reset the tracemalloc peak, so carry theirs up to the parent
+                peak = max(tracemalloc.get_traced_memory()[1], record.pop("_child_peak"))
+                record["peak_bytes"] = max(peak - start_bytes, 0)
+                if self._stack:
+                    self._stack[-1]["_child_peak"] = max(self._stack[-1]["_child_peak"], peak)
+
+    def count(self, **counters):
+        if not self._stack:
+            return
+        totals = self._stack[-1]["counters"]
+        for key, value in counters.items():
+            totals[key] = totals.get(key, 0) + value if isinstance(value, (int, float)) else value
+
+    def report(self):
+        return [{key: value for key, value in span.items() if not key.startswith("_")} for span in self.spans]
+
+    def summary(self):
+        # one row per span name: calls, total seconds and summed numeric counters
+        rows = {}
+        for span in self.spans:
+            row = rows.setdefault(span["name"], {"name": span["name"], "calls": 0, "seconds": 0.0})
+            row["calls"] += 1
+            row["seconds"] += span["seconds"]
+            if "peak_bytes" in span:
+                row["peak_bytes"] = max(row.get("peak_bytes", 0), span["peak_bytes"])
+            for key, value in span["counters"].items():
+                if isinstance(value, (int, float)):
+                    row[key] = row.get(key, 0) + value
+        return sorted(rows.values(), key=lambda r: -r["seconds"])
+
+    def to_json(self, indent=2):
+        return json.dumps({"spans": self.report(), "summary": self.summary()}, indent=indent, default=str)
+
+
+def _update_tracing(add=None, remove=None, rerun=None):
+    global _rerun_tracing, _started_tracing
+    with _tracing_lock:
+        if add is not None:
+            _tracers.add(add)
+        _tracers.discard(remove)
+        if rerun is not None:
+            _rerun_tracing = rerun
+        wanted = _rerun_tracing or bool(_tracers)
+        if wanted and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        elif not wanted and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+def active():
+    return _active.get()
+
+def set_active(profiler):
+    # for scripts that cannot wrap a whole run in Profiler.activate, e.g. a Streamlit rerun; tracing keeps
+    # running while an activated profiler, such as a background job's, still uses it
+    _update_tracing(rerun=profiler is not None and profiler.trace_memory)
+    _active.set(profiler)
+
+@contextmanager
+def use(profiler):
+    # the given profiler, or none at all, for the block, whatever the surrounding context had active
+    if profiler is not None:
+        with profiler.activate():
+            yield profiler
+        return
+    token = _active.set(None)
+    try:
+        yield None
+    finally:
+        _active.reset(token)
+
+def instrument(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _active.get()
+            if profiler is None:
+                return func(*args, **kwargs)
+            with profiler.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def span(name):
+    profiler = _active.get()
+    if profiler is None:
+        yield None
+        return
+    with profiler.span(name) as record:
+        yield record
+
+def count(**counters):
+    profiler = _active.get()
+    if profiler is not None:
+        profiler.count(**counters)
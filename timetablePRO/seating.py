@@ -0,0 +1,200 @@
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from engine import CompactSchedule
+from export import _csv_fields, pdf_table, safe_filename
+from jobs import progress
+from profiling import count, instrument
+
+HALL_COLUMNS = ['Hall', 'Capacity', 'Rows', 'Columns']
+SEAT_COLUMNS = ['Date', 'Time Slot', 'Hall', 'Seat', 'Row', 'Column', 'Paper Code', 'Regd. No.']
+SUMMARY_COLUMNS = ['Date', 'Time Slot', 'Hall', 'Papers', 'Students', 'Capacity']
+# seat rows of students no hall had room for
+UNSEATED = "Unseated"
+
+
+# Hall Inventory
+def prepare_halls(halls_df):
+    """Hall, Capacity, Rows, Columns from an inventory table; Capacity defaults to Rows x Columns.
+
+    Rows/Columns are the seating layout and stay empty for halls listed by capacity only. Halls keep their
+    inventory order, which breaks ties between equally sized halls.
+    """
+    if 'Hall' not in halls_df.columns:
+        raise ValueError("Hall inventory must contain a 'Hall' column.")
+    halls = pd.DataFrame({'Hall': halls_df['Hall'].astype(str).str.strip()})
+    for column in HALL_COLUMNS[1:]:
+        values = halls_df[column] if column in halls_df.columns else pd.Series(np.nan, index=halls_df.index)
+        halls[column] = pd.to_numeric(values, errors="coerce")
+    layout = halls['Rows'].notna() & halls['Columns'].notna()
+    halls.loc[halls['Capacity'].isna() & layout, 'Capacity'] = halls['Rows'] * halls['Columns']
+    if halls['Capacity'].isna().any():
+        missing = ", ".join(halls.loc[halls['Capacity'].isna(), 'Hall'])
+        raise ValueError(f"Halls need a Capacity or Rows and Columns: {missing}")
+    # a layout smaller than the stated capacity cannot seat it
+    halls.loc[layout, 'Capacity'] = np.minimum(halls['Capacity'], halls['Rows'] * halls['Columns'])[layout]
+    halls = halls[halls['Capacity'] > 0].drop_duplicates(subset=['Hall']).reset_index(drop=True)
+    halls['Capacity'] = halls['Capacity'].astype(np.int64)
+    return halls
+
+
+# Packing
+def pack_courses(sizes, capacities):
+    """(hall position, course position, students) placements, best-fit decreasing with splitting.
+
+    Largest courses go first, each into the fullest hall that still takes it whole; a course no hall takes
+    whole fills the emptiest hall and carries on, so it spans as few halls as possible. Students beyond the
+    total capacity are left out of the placements.
+    """
+    remaining = np.array(capacities, dtype=np.int64)
+    placements = []
+    for course in sorted(range(len(sizes)), key=lambda c: -sizes[c]):
+        need = int(sizes[course])
+        while need:
+            fits = np.flatnonzero(remaining >= need)
+            if len(fits):
+                hall = int(fits[np.argmin(remaining[fits])])
+            elif remaining.any():
+                hall = int(np.argmax(remaining))
+            else:
+                break
+            taken = min(need, int(remaining[hall]))
+            placements.append((hall, course, taken))
+            remaining[hall] -= taken
+            need -= taken
+    return placements
+
+def _seat_order(course_pos, interleave, columns):
+    # seat position per student of a hall, students given as contiguous course blocks
+    if not interleave or not len(course_pos) or course_pos[-1] == 0:
+        return np.arange(len(course_pos))
+    # round-robin over the hall's papers (A B C A B C ..., dropping papers as they run out), laid out
+    # boustrophedon so two papers alternate along rows and columns alike
+    rank = np.arange(len(course_pos)) - np.searchsorted(course_pos, course_pos)
+    order = np.lexsort((course_pos, rank))
+    seats = np.empty(len(course_pos), dtype=np.int64)
+    seats[order] = np.arange(len(course_pos))
+    if columns:
+        row, col = np.divmod(seats, columns)
+        seats = np.where(row % 2 == 1, row * columns + columns - 1 - col, seats)
+    return seats
+
+
+@instrument("allocate_seats")
+def allocate_seats(index, exam_list, halls_df, interleave=False):
+    """Seat every NRF student of every (date, slot) in the hall inventory.
+
+    Returns (seats, summary): one row per student and paper in SEAT_COLUMNS, halls' seats in order, with
+    each paper kept in one contiguous block per hall unless `interleave` alternates the hall's papers
+    seat by seat; and one SUMMARY_COLUMNS row per hall in use. Students the halls cannot hold appear with
+    Hall "Unseated" and no seat.
+    """
+    halls = prepare_halls(halls_df)
+    hall_names = halls['Hall'].to_numpy(dtype=object)
+    capacities = halls['Capacity'].to_numpy()
+    hall_columns = halls['Columns'].fillna(0).astype(np.int64).to_numpy()
+    has_layout = (halls['Rows'].notna() & halls['Columns'].notna()).to_numpy()
+
+    schedule = CompactSchedule.from_exam_list(exam_list).unique()
+    course_ids = schedule.index_course_ids(index)
+    known = course_ids >= 0
+    sizes = index.course_sizes()
+    # students of each course in registration-number order, so a hall's door list reads in order
+    reg_order = np.argsort(np.argsort(index.reg_nos.astype(str), kind="stable"))
+    labels = schedule.day_labels('%d/%m/%Y')
+
+    # per hall block: (date, slot, hall name, seat positions or None, columns, codes, student ids)
+    blocks_out = []
+    summary = []
+    order = schedule.sort_order()
+    days, slots = schedule.day[order], schedule.slot[order]
+    bounds = np.flatnonzero((np.diff(days) != 0) | (np.diff(slots) != 0)) + 1
+    n_sittings = len(bounds) + 1 if len(order) else 0
+    for sitting, (start, end) in enumerate(zip(np.r_[0, bounds], np.r_[bounds, len(order)]) if len(order) else ()):
+        progress(sitting, n_sittings)
+        items = order[start:end][known[order[start:end]]]
+        cids = np.unique(course_ids[items])
+        if not len(cids):
+            continue
+        date_label, slot_label = labels[int(days[start])], schedule.slots[int(slots[start])]
+        students = [index.course_students[index.course_indptr[c]:index.course_indptr[c + 1]] for c in cids]
+        students = [s[np.argsort(reg_order[s], kind="stable")] for s in students]
+        taken = np.zeros(len(cids), dtype=np.int64)
+        by_hall = {}
+        for hall, course, n in pack_courses(sizes[cids], capacities):
+            by_hall.setdefault(hall, []).append((course, students[course][taken[course]:taken[course] + n]))
+            taken[course] += n
+        for hall in sorted(by_hall):
+            placed = by_hall[hall]
+            course_pos = np.repeat(np.arange(len(placed)), [len(s) for _, s in placed])
+            columns = int(hall_columns[hall]) if has_layout[hall] else 0
+            seats = _seat_order(course_pos, interleave, columns)
+            student_ids = np.concatenate([s for _, s in placed])
+            codes = index.course_codes[cids[[c for c, _ in placed]]][course_pos]
+            in_seat_order = np.argsort(seats, kind="stable")
+            blocks_out.append((date_label, slot_label, hall_names[hall], seats[in_seat_order], columns,
+                               codes[in_seat_order], student_ids[in_seat_order]))
+            summary.append((date_label, slot_label, hall_names[hall], len(placed), len(student_ids),
+                            int(capacities[hall])))
+        short = taken < sizes[cids]
+        if short.any():
+            unseated = [students[c][taken[c]:] for c in np.flatnonzero(short)]
+            codes = np.repeat(index.course_codes[cids[short]], [len(s) for s in unseated])
+            blocks_out.append((date_label, slot_label, UNSEATED, None, 0, codes, np.concatenate(unseated)))
+            summary.append((date_label, slot_label, UNSEATED, int(short.sum()), len(codes), 0))
+
+    # one frame built from whole columns rather than one per hall
+    lengths = [len(block[6]) for block in blocks_out]
+    seat_columns = {'Seat': [], 'Row': [], 'Column': []}
+    for _, _, _, seats, columns, _, student_ids in blocks_out:
+        seated = seats is not None
+        seat_columns['Seat'].append(seats + 1 if seated else np.full(len(student_ids), np.nan))
+        seat_columns['Row'].append(seats // columns + 1 if seated and columns else np.full(len(student_ids), np.nan))
+        seat_columns['Column'].append(seats % columns + 1 if seated and columns else np.full(len(student_ids), np.nan))
+    seats_df = pd.DataFrame({
+        'Date': np.repeat(np.array([b[0] for b in blocks_out], dtype=object), lengths),
+        'Time Slot': np.repeat(np.array([b[1] for b in blocks_out], dtype=object), lengths),
+        'Hall': np.repeat(np.array([b[2] for b in blocks_out], dtype=object), lengths),
+        **{name: pd.array(np.concatenate(values) if values else [], dtype="Int64")
+           for name, values in seat_columns.items()},
+        'Paper Code': np.concatenate([b[5] for b in blocks_out]) if blocks_out else np.empty(0, dtype=object),
+        'Regd. No.': index.reg_nos[np.concatenate([b[6] for b in blocks_out])] if blocks_out else
+        np.empty(0, dtype=object),
+    }, columns=SEAT_COLUMNS)
+    summary_df = pd.DataFrame(summary, columns=SUMMARY_COLUMNS)
+    count(exams=len(schedule.course), halls=len(halls), seats=len(seats_df),
+          unseated=int((seats_df['Hall'] == UNSEATED).sum()))
+    return seats_df, summary_df
+
+
+# Export
+@instrument("export_seating")
+def export_seating(stream, seats_df, summary_df, pdf=True):
+    """Zip of seating.csv, seating_summary.csv and one seat list per hall and sitting (CSV, plus PDF)."""
+    # every seat row is rendered once; the hall lists are slices of the rendered rows
+    rows = seats_df.astype(object).where(seats_df.notna(), "").to_numpy().tolist()
+    lines = [_csv_fields(row) + "\n" for row in rows]
+    columns = SEAT_COLUMNS[3:]
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("seating.csv", "w") as member, io.TextIOWrapper(member, encoding="utf-8", newline="") as text:
+            text.write(_csv_fields(SEAT_COLUMNS) + "\n")
+            text.write("".join(lines))
+        archive.writestr("seating_summary.csv", summary_df.to_csv(index=False))
+        n_lists = 0
+        for (date_label, slot_label, hall), positions in seats_df.groupby(['Date', 'Time Slot', 'Hall'],
+                                                                           sort=False).indices.items():
+            name = safe_filename(f"{date_label}_{slot_label}_{hall}")
+            hall_rows = [rows[i][3:] for i in positions]
+            with archive.open(f"halls/{name}.csv", "w") as member, \
+                    io.TextIOWrapper(member, encoding="utf-8", newline="") as text:
+                text.write(_csv_fields(columns) + "\n")
+                text.write("".join(_csv_fields(row) + "\n" for row in hall_rows))
+            if pdf:
+                archive.writestr(f"pdf/{name}.pdf", pdf_table(f"{hall} - {date_label} {slot_label}", columns,
+                                                               hall_rows))
+            n_lists += 1
+            progress(hall_lists=n_lists)
+        count(seats=len(seats_df), lists=n_lists)
@@ -0,0 +1,237 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import pandas as pd
+
+from profiling import count, instrument
+
+STORE_PATH = os.environ.get("TIMETABLE_STORE",
+                            os.path.join(os.path.expanduser("~"), ".local", "share", "timetablepro", "projects.sqlite3"))
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tables (
+    digest TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    filename TEXT,
+    n_rows INTEGER,
+    created TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    academic_year TEXT NOT NULL,
+    degree TEXT NOT NULL,
+    semester TEXT NOT NULL,
+    pmf_digest TEXT,
+    nrf_digest TEXT,
+    updated TEXT NOT NULL,
+    UNIQUE (academic_year, degree, semester)
+);
+CREATE TABLE IF NOT EXISTS holidays (
+    term_id INTEGER NOT NULL REFERENCES terms(id) ON DELETE CASCADE,
+    day TEXT NOT NULL,
+    PRIMARY KEY (term_id, day)
+);
+CREATE TABLE IF NOT EXISTS groups (
+    term_id INTEGER NOT NULL REFERENCES terms(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    day TEXT NOT NULL,
+    courses TEXT NOT NULL,
+    PRIMARY KEY (term_id, position)
+);
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY,
+    term_id INTEGER NOT NULL REFERENCES terms(id) ON DELETE CASCADE,
+    label TEXT NOT NULL,
+    mode TEXT,
+    created TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS versions_by_term ON versions (term_id, created);
+CREATE TABLE IF NOT EXISTS exams (
+    version_id INTEGER NOT NULL REFERENCES versions(id) ON DELETE CASCADE,
+    paper_code TEXT NOT NULL,
+    day TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    PRIMARY KEY (version_id, paper_code, day, slot)
+) WITHOUT ROWID;
+"""
+
+
+def _day(value):
+    return (value.date() if isinstance(value, datetime) else value).isoformat()
+
+def index_digest(nrf_digest):
+    # the enrollment index is stored next to the NRF it was built from
+    return f"{nrf_digest}-index"
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class ProjectStore:
+    """Parsed uploads, holidays, combination groups and saved schedule versions per academic year/degree/semester."""
+
+    def __init__(self, path=STORE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        # Streamlit reruns the script on worker threads, so the connection is shared across them
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        with self._transaction():
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    @contextmanager
+    def _transaction(self):
+        # sessions share the connection, so writes are serialized and committed as one unit
+        with self._lock, self.connection:
+            yield self.connection
+
+    def close(self):
+        self.connection.close()
+
+    # Parsed tables
+    def has_table(self, digest):
+        return self.connection.execute("SELECT 1 FROM tables WHERE digest = ?", (digest,)).fetchone() is not None
+
+    def save_table(self, kind, digest, table, filename=""):
+        # DataFrames and enrollment indexes are pickled as parsed, so reopening skips Excel, normalization
+        # and the index build
+        if self.has_table(digest):
+            return
+        blob = pickle.dumps(table, protocol=pickle.HIGHEST_PROTOCOL)
+        n_rows = len(table) if isinstance(table, pd.DataFrame) else getattr(table, "n_students", None)
+        with self._transaction():
+            self.connection.execute("INSERT INTO tables VALUES (?, ?, ?, ?, ?, ?)",
+                                    (digest, kind, filename, n_rows, _now(), blob))
+        count(bytes=len(blob))
+
+    def load_table(self, digest):
+        row = self.connection.execute("SELECT data FROM tables WHERE digest = ?", (digest,)).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    # Terms
+    def term_id(self, academic_year, degree, semester, create=True):
+        key = (str(academic_year), str(degree), str(semester))
+        row = self.connection.execute(
+            "SELECT id FROM terms WHERE academic_year = ? AND degree = ? AND semester = ?", key).fetchone()
+        if row is not None or not create:
+            return None if row is None else row[0]
+        with self._transaction():
+            return self.connection.execute(
+                "INSERT INTO terms (academic_year, degree, semester, updated) VALUES (?, ?, ?, ?)",
+                key + (_now(),)).lastrowid
+
+    def terms(self):
+        return pd.read_sql_query(
+            "SELECT t.id, t.academic_year AS 'Academic Year', t.degree AS 'Degree', t.semester AS 'Semester', "
+            "t.updated AS 'Updated', COUNT(v.id) AS 'Versions' FROM terms t LEFT JOIN versions v ON v.term_id = t.id "
+            "GROUP BY t.id ORDER BY t.academic_year DESC, t.degree, t.semester", self.connection)
+
+    @instrument("save_term")
+    def save_term(self, term_id, pmf_digest=None, nrf_digest=None, holidays=None, groups=None):
+        # None leaves that part of the term as it is
+        with self._transaction():
+            if pmf_digest is not None:
+                self.connection.execute("UPDATE terms SET pmf_digest = ? WHERE id = ?", (pmf_digest, term_id))
+            if nrf_digest is not None:
+                self.connection.execute("UPDATE terms SET nrf_digest = ? WHERE id = ?", (nrf_digest, term_id))
+            if holidays is not None:
+                self.connection.execute("DELETE FROM holidays WHERE term_id = ?", (term_id,))
+                self.connection.executemany("INSERT OR IGNORE INTO holidays VALUES (?, ?)",
+                                            [(term_id, _day(d)) for d in holidays])
+            if groups is not None:
+                self.connection.execute("DELETE FROM groups WHERE term_id = ?", (term_id,))
+                self.connection.executemany("INSERT INTO groups VALUES (?, ?, ?, ?, ?)", [
+                    (term_id, position, g["group_name"], _day(g["date"]), json.dumps(list(g["courses"])))
+                    for position, g in enumerate(groups)])
+            self.connection.execute("UPDATE terms SET updated = ? WHERE id = ?", (_now(), term_id))
+
+    @instrument("open_term")
+    def open_term(self, term_id):
+        """Everything saved for a term: tables, holidays, groups (as the UI keeps them) and the latest version id."""
+        row = self.connection.execute("SELECT pmf_digest, nrf_digest FROM terms WHERE id = ?", (term_id,)).fetchone()
+        if row is None:
+            return None
+        holidays = [date.fromisoformat(d) for (d,) in self.connection.execute(
+            "SELECT day FROM holidays WHERE term_id = ? ORDER BY day", (term_id,))]
+        groups = [{"group_name": name, "courses": json.loads(courses),
+                   "date": datetime.combine(date.fromisoformat(day), datetime.min.time())}
+                  for name, day, courses in self.connection.execute(
+                      "SELECT name, day, courses FROM groups WHERE term_id = ? ORDER BY position", (term_id,))]
+        latest = self.connection.execute(
+            "SELECT id FROM versions WHERE term_id = ? ORDER BY created DESC, id DESC LIMIT 1", (term_id,)).fetchone()
+        return {
+            "pmf_digest": row[0],
+            "nrf_digest": row[1],
+            "pmf": self.load_table(row[0]) if row[0] else None,
+            "nrf": self.load_table(row[1]) if row[1] else None,
+            "index": self.load_table(index_digest(row[1])) if row[1] else None,
+            "holidays": holidays,
+            "groups": groups,
+            "latest_version": latest[0] if latest else None,
+        }
+
+    # Schedule versions
+    @instrument("save_version")
+    def save_version(self, term_id, exam_list, label="", mode=""):
+        created = _now()
+        with self._transaction():
+            version_id = self.connection.execute(
+                "INSERT INTO versions (term_id, label, mode, created) VALUES (?, ?, ?, ?)",
+                (term_id, label or created, mode, created)).lastrowid
+            self.connection.executemany("INSERT OR IGNORE INTO exams VALUES (?, ?, ?, ?)", [
+                (version_id, code.strip(), _day(dt_obj), slot) for code, dt_obj, slot in exam_list])
+            self.connection.execute("UPDATE terms SET updated = ? WHERE id = ?", (created, term_id))
+        count(exams=len(exam_list))
+        return version_id
+
+    def versions(self, term_id):
+        return pd.read_sql_query(
+            "SELECT v.id, v.label AS 'Label', v.mode AS 'Mode', v.created AS 'Created', COUNT(e.paper_code) AS 'Exams' "
+            "FROM versions v LEFT JOIN exams e ON e.version_id = v.id WHERE v.term_id = ? "
+            "GROUP BY v.id ORDER BY v.created DESC, v.id DESC", self.connection, params=(term_id,))
+
+    def load_version(self, version_id):
+        # the exam_date_list shape: (paper code, datetime, slot) in date/slot order
+        return [(code, datetime.fromisoformat(day), slot) for code, day, slot in self.connection.execute(
+            "SELECT paper_code, day, slot FROM exams WHERE version_id = ? ORDER BY day, slot, paper_code",
+            (version_id,))]
+
+    def delete_version(self, version_id):
+        with self._transaction():
+            self.connection.execute("DELETE FROM versions WHERE id = ?", (version_id,))
+
+    @instrument("diff_versions")
+    def diff_versions(self, before_id, after_id):
+        """Papers added, removed or moved between two saved versions, computed in SQL from the stored rows."""
+        diff = pd.read_sql_query("""
+            WITH a AS (SELECT paper_code, day, slot FROM exams WHERE version_id = :before),
+                 b AS (SELECT paper_code, day, slot FROM exams WHERE version_id = :after),
+                 gone AS (SELECT * FROM a EXCEPT SELECT * FROM b),
+                 new AS (SELECT * FROM b EXCEPT SELECT * FROM a)
+            SELECT gone.paper_code AS code, gone.day AS before_day, gone.slot AS before_slot,
+                   new.day AS after_day, new.slot AS after_slot
+            FROM gone LEFT JOIN new ON new.paper_code = gone.paper_code
+            UNION ALL
+            SELECT paper_code, NULL, NULL, day, slot FROM new
+            WHERE paper_code NOT IN (SELECT paper_code FROM gone)
+            ORDER BY code
+        """, self.connection, params={"before": before_id, "after": after_id})
+        change = pd.Series("Moved", index=diff.index, dtype=object)
+        change[diff['after_day'].isna()] = "Removed"
+        change[diff['before_day'].isna()] = "Added"
+        count(exams=len(diff))
+        return diff.assign(change=change).rename(columns={
+            "code": "Paper Code", "before_day": "Before Date", "before_slot": "Before Slot",
+            "after_day": "After Date", "after_slot": "After Slot", "change": "Change"})
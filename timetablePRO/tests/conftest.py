@@ -0,0 +1,37 @@
+import os
+import sys
+from datetime import date
+
+import pytest
+
+# the app's modules import each other as top-level modules from timetablePRO/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import synthetic_nrf, synthetic_pmf  # noqa: E402
+from engine import build_enrollment_index, filter_pmf_by_degree, select_semester_papers  # noqa: E402
+
+START_DATE = date(2025, 5, 1)
+END_DATE = date(2025, 12, 31)
+WEEKENDS = {6}
+SLOTS = ["09:00 - 10:30", "13:00 - 14:30"]
+
+
+@pytest.fixture(scope="session")
+def pmf_df():
+    return synthetic_pmf(programmes=6, papers_per_semester=6, seed=1)
+
+@pytest.fixture(scope="session")
+def nrf_df(pmf_df):
+    return synthetic_nrf(pmf_df, students=800, code_columns=6, seed=1)
+
+@pytest.fixture(scope="session")
+def index(nrf_df):
+    return build_enrollment_index(nrf_df)
+
+@pytest.fixture(scope="session")
+def semester_run(pmf_df, index):
+    # the busiest UG semester: (semester, papers, course codes)
+    degree_df = filter_pmf_by_degree(pmf_df, "UG")
+    semester = degree_df['Derived Semester'].value_counts().idxmax()
+    papers = select_semester_papers(degree_df, semester, index)
+    return semester, papers, papers['Paper Code'].unique().tolist()
@@ -0,0 +1,60 @@
+import json
+
+import pandas as pd
+import pytest
+
+import benchmark
+from engine import MANDATORY_GROUP, SPECIAL_SOLO, get_code_columns
+
+TINY = {"programmes": 3, "papers_per_semester": 3, "students": 150, "code_columns": 4, "window_days": 60}
+
+
+@pytest.fixture(scope="module")
+def pmf():
+    return benchmark.synthetic_pmf(programmes=5, papers_per_semester=4, seed=11)
+
+
+def test_generator_is_seeded(pmf):
+    pd.testing.assert_frame_equal(pmf, benchmark.synthetic_pmf(programmes=5, papers_per_semester=4, seed=11))
+    nrf = benchmark.synthetic_nrf(pmf, students=300, code_columns=5, seed=11)
+    pd.testing.assert_frame_equal(nrf, benchmark.synthetic_nrf(pmf, students=300, code_columns=5, seed=11))
+    assert not nrf.equals(benchmark.synthetic_nrf(pmf, students=300, code_columns=5, seed=12))
+
+def test_generated_tables_look_like_uploads(pmf):
+    assert {'Paper Code', 'Paper Title', 'Programme Name', 'CC', 'Is IDM', 'Is DSC'} <= set(pmf.columns)
+    assert MANDATORY_GROUP | SPECIAL_SOLO <= set(pmf['Paper Code'])
+    # shared IDM papers are listed under more than one programme
+    listings = pmf.groupby('Paper Code')['Programme Name'].nunique()
+    assert (listings[listings > 1].index.isin(pmf.loc[pmf['Is IDM'], 'Paper Code'])).all()
+    assert (listings > 1).any()
+
+    nrf = benchmark.synthetic_nrf(pmf, students=400, code_columns=5, seed=3)
+    assert get_code_columns(nrf) == [f"Paper {c} Code" for c in range(1, 6)]
+    assert nrf['Regd. No.'].is_unique and len(nrf) == 400
+    codes = nrf[get_code_columns(nrf)]
+    assert set(codes.stack()) <= set(pmf['Paper Code'])
+    # UG semester II students sit exactly one of the mandatory language papers
+    languages = codes.isin(MANDATORY_GROUP).sum(axis=1)
+    ug_second = nrf['Programme Name'].str.startswith("U-") & (nrf['Semester'] == "II")
+    assert (languages[ug_second] == 1).all() and (languages[~ug_second] == 0).all()
+
+def test_report_and_comparison(tmp_path, monkeypatch, capsys):
+    monkeypatch.setitem(benchmark.SCALES, "small", TINY)
+    first, second = tmp_path / "first.json", tmp_path / "second.json"
+    assert benchmark.main(["--scale", "small", "--repeat", "1", "--output", str(first), "--label", "base",
+                           "--dump-data", str(tmp_path)]) == 0
+    report = json.loads(first.read_text())
+    assert report["label"] == "base" and report["scales"] == {"small": TINY}
+    cases = [r["case"] for r in report["results"]]
+    assert len(cases) == len(set(cases)) and {"build_enrollment_index", "find_clashes", "allocate_seats"} <= set(cases)
+    assert all(len(r["seconds"]["runs"]) == 1 for r in report["results"])
+    assert len(pd.read_csv(tmp_path / "small_nrf.csv")) == TINY["students"]
+
+    # a baseline a thousand times faster flags every case
+    for result in report["results"]:
+        result["seconds"]["min"] /= 1000
+    first.write_text(json.dumps(report))
+    capsys.readouterr()
+    benchmark.main(["--scale", "small", "--repeat", "1", "--output", str(second), "--compare", str(first)])
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == len(cases) and all(line.endswith("REGRESSION") for line in lines)
@@ -0,0 +1,54 @@
+import math
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+import engine
+from conftest import END_DATE, START_DATE, WEEKENDS
+from engine import EnrollmentIndex, best_of_n_schedules, evaluate_schedule, flatten_schedule_to_list, schedule_cost
+
+
+def test_best_of_n_returns_the_cheapest_seed(index, semester_run):
+    semester, _, courses = semester_run
+    schedule, seed, runs = best_of_n_schedules(courses, index, START_DATE, END_DATE, [], WEEKENDS, semester,
+                                               n_starts=4, max_workers=2)
+    assert sorted(r["seed"] for r in runs) == [0, 1, 2, 3]
+    best = min(runs, key=lambda r: (r["cost"], r["seed"]))
+    assert seed == best["seed"] and not math.isinf(best["cost"])
+    # the schedule rebuilt from the winning seed is the one the worker scored
+    assert schedule_cost(evaluate_schedule(index, flatten_schedule_to_list(schedule))) == best["cost"]
+
+def test_best_of_n_is_reproducible(index, semester_run):
+    semester, _, courses = semester_run
+    first = best_of_n_schedules(courses, index, START_DATE, END_DATE, [], WEEKENDS, semester, n_starts=3,
+                                max_workers=2)
+    second = best_of_n_schedules(courses, index, START_DATE, END_DATE, [], WEEKENDS, semester, n_starts=3,
+                                 max_workers=1)
+    assert first[1:] == second[1:]
+
+def test_workers_score_on_the_shared_index_arrays(index, semester_run, monkeypatch):
+    semester, _, courses = semester_run
+    exam_list = flatten_schedule_to_list(best_of_n_schedules(courses, index, START_DATE, END_DATE, [], WEEKENDS,
+                                                             semester, n_starts=1, max_workers=1)[0])
+    worker_blocks = []
+    monkeypatch.setattr(engine, "_worker_blocks", worker_blocks)
+    blocks, shared = engine._share_index(index)
+    try:
+        # what a pool worker runs, here in the test process
+        engine._init_worker(*shared)
+        worker_index = engine._worker_index
+        assert worker_index.reg_nos is None and worker_index.n_students == index.n_students
+        for name, block in zip(EnrollmentIndex.ARRAYS, worker_blocks):
+            assert np.array_equal(getattr(worker_index, name), getattr(index, name))
+            assert np.shares_memory(getattr(worker_index, name), np.frombuffer(block.buf, dtype=np.uint8))
+        assert evaluate_schedule(worker_index, exam_list) == evaluate_schedule(index, exam_list)
+    finally:
+        monkeypatch.setattr(engine, "_worker_index", None)
+        worker_index = None
+        for block in worker_blocks:
+            block.close()
+        engine._release_blocks(blocks)
+    for block_name, _, _ in shared[1].values():
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=block_name)
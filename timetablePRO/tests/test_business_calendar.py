@@ -0,0 +1,95 @@
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from business_calendar import BusinessCalendar, get_calendar
+from ingest import load_holidays
+
+WEEKEND_SETS = [set(), {6}, {5, 6}, {4}]
+
+
+def walk_is_valid(day, holidays, weekends):
+    return day.weekday() not in weekends and day not in holidays
+
+def walk_next_valid(day, end, holidays, weekends):
+    # the day-by-day loop the calendar replaced
+    while day <= end:
+        if walk_is_valid(day, holidays, weekends):
+            return day
+        day += timedelta(days=1)
+    return None
+
+def walk_gap_days(start, end, holidays, weekends, gap_days):
+    days, day = [], start
+    while day <= end:
+        if walk_is_valid(day, holidays, weekends):
+            days.append(day)
+            day += timedelta(days=gap_days)
+        else:
+            day += timedelta(days=1)
+    return days
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_queries_match_a_day_by_day_walk(seed):
+    rng = random.Random(seed)
+    weekends = WEEKEND_SETS[seed % len(WEEKEND_SETS)]
+    # clustered holidays around a year end, including whole holiday weeks
+    holidays = {date(2024, 12, 20) + timedelta(days=rng.randrange(30)) for _ in range(12)}
+    holidays |= {date(2025, 4, 14) + timedelta(days=d) for d in range(7)}
+    calendar = BusinessCalendar(holidays, weekends)
+    for _ in range(40):
+        start = date(2024, 12, 1) + timedelta(days=rng.randrange(200))
+        end = start + timedelta(days=rng.randrange(-3, 90))
+        assert calendar.valid_days(start, end) == [
+            start + timedelta(days=d) for d in range((end - start).days + 1)
+            if walk_is_valid(start + timedelta(days=d), holidays, weekends)]
+        assert calendar.next_valid(start, end) == walk_next_valid(start, end, holidays, weekends)
+        gap = rng.choice([1, 2, 3, 7])
+        assert calendar.gap_days(start, end, gap) == walk_gap_days(start, end, holidays, weekends, gap)
+
+def test_datetimes_count_by_their_day():
+    calendar = BusinessCalendar([datetime(2025, 1, 1, 10, 30)], {6})
+    assert not calendar.is_valid(date(2025, 1, 1)) and not calendar.is_valid(datetime(2025, 1, 5, 9))
+    assert calendar.next_valid(datetime(2024, 12, 31, 23, 59)) == date(2024, 12, 31)
+    assert calendar.next_valid(datetime(2025, 1, 1, 8)) == date(2025, 1, 2)
+    assert calendar.gap_days(datetime(2025, 1, 3, 18), date(2025, 1, 10)) == [
+        date(2025, 1, 3), date(2025, 1, 6), date(2025, 1, 8), date(2025, 1, 10)]
+
+def test_span_grows_for_later_queries():
+    calendar = BusinessCalendar([date(2031, 3, 3)], {5, 6})
+    assert calendar.valid_days(date(2025, 1, 6), date(2025, 1, 12))[-1] == date(2025, 1, 10)
+    # years past the precomputed span extend it rather than answering from it
+    assert calendar.next_valid(date(2031, 3, 1)) == date(2031, 3, 4)
+    assert calendar.ordinals(date(2040, 1, 2), date(2040, 1, 2)) == [date(2040, 1, 2).toordinal()]
+    assert calendar.valid_days(date(2025, 1, 10), date(2025, 1, 9)) == []
+
+def test_next_valid_without_an_end_looks_past_long_closures():
+    closed = [date(2025, 1, 1) + timedelta(days=d) for d in range(500)]
+    calendar = BusinessCalendar(closed, set())
+    assert calendar.next_valid(date(2025, 1, 1)) == date(2025, 1, 1) + timedelta(days=500)
+    assert calendar.next_valid(date(2025, 1, 1), date(2026, 1, 1)) is None
+    assert BusinessCalendar([], set(range(7))).next_valid(date(2025, 1, 1), date(2025, 2, 1)) is None
+
+def test_free_day_and_shared_calendars():
+    calendar = BusinessCalendar([date(2025, 5, 6)], {6})
+    assert calendar.free_day(date(2025, 5, 5), date(2025, 5, 9), taken=["2025-05-05", date(2025, 5, 7)]) == \
+        date(2025, 5, 8)
+    assert calendar.free_day(date(2025, 5, 5), date(2025, 5, 5), taken=[datetime(2025, 5, 5)]) is None
+    # the same holidays in another order or type share one calendar
+    assert get_calendar([date(2025, 5, 6), datetime(2025, 5, 1)], [6]) is get_calendar(
+        [date(2025, 5, 1), date(2025, 5, 6), None], {6})
+    assert get_calendar([date(2025, 5, 6)], {6}) is not get_calendar([date(2025, 5, 6)], {5, 6})
+
+
+def test_holiday_files():
+    ics = (b"BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nSUMMARY:Spring break, a long\r\n  description\r\n"
+           b"DTSTART;VALUE=DATE:20250414\r\nDTEND;VALUE=DATE:20250417\r\nEND:VEVENT\r\n"
+           b"BEGIN:VEVENT\r\nDTSTART:20250501T100000\r\nDTEND:20250501T120000\r\nEND:VEVENT\r\n"
+           b"BEGIN:VEVENT\r\nDTSTART;VALUE=DATE:20250415\r\nEND:VEVENT\r\nEND:VCALENDAR\r\n")
+    assert load_holidays(ics, "holidays.ics") == [date(2025, 4, 14), date(2025, 4, 15), date(2025, 4, 16),
+                                                  date(2025, 5, 1)]
+    # ISO dates as written, other dates day first
+    csv = b"Holiday,Holiday Date\nRepublic Day,26/01/2025\nHoli,2025-03-14\nLabour Day,01/05/2025\nBad,someday\n"
+    assert load_holidays(csv, "holidays.csv") == [date(2025, 1, 26), date(2025, 3, 14), date(2025, 5, 1)]
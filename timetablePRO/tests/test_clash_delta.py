@@ -0,0 +1,38 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import SLOTS
+from engine import clash_delta, find_clashes
+
+
+def clash_keys(clashes):
+    return {(c["date"], c["slot"], frozenset((c["course_a"], c["course_b"]))): c["shared_students"] for c in clashes}
+
+def random_exam_list(courses, rng, n_days=6):
+    # few days and slots, so the timetable starts with plenty of clashes
+    return [(code, datetime(2025, 5, 5) + timedelta(days=rng.randrange(n_days)), rng.choice(SLOTS))
+            for code in courses]
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_clash_delta_matches_full_recompute(index, semester_run, seed):
+    _, _, courses = semester_run
+    rng = random.Random(seed)
+    before = random_exam_list(courses, rng)
+    after = list(before)
+    for i in rng.sample(range(len(after)), rng.randint(1, 6)):
+        code, _, _ = after[i]
+        after[i] = (code, datetime(2025, 5, 5) + timedelta(days=rng.randrange(8)), rng.choice(SLOTS))
+
+    added, removed, moved = clash_delta(index, before, after)
+    old, new = clash_keys(find_clashes(index, before)), clash_keys(find_clashes(index, after))
+    assert clash_keys(added) == {key: shared for key, shared in new.items() if key not in old}
+    assert clash_keys(removed) == {key: shared for key, shared in old.items() if key not in new}
+    assert moved == sorted({code for (code, *place), (_, *place_after) in zip(before, after) if place != place_after})
+
+def test_clash_delta_without_changes(index, semester_run):
+    _, _, courses = semester_run
+    before = random_exam_list(courses, random.Random(0))
+    assert clash_delta(index, before, list(before)) == ([], [], [])
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+import cli
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_skips_optional_backends():
+    # a plain scheduling run loads neither the XLSX library, the solvers nor the store and seating modules
+    code = ("import sys, cli; print(','.join(m for m in ('openpyxl', 'ortools', 'scipy.optimize', 'seating', 'store')"
+            " if m in sys.modules))")
+    loaded = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, capture_output=True, text=True, check=True)
+    assert loaded.stdout.strip() == ""
+
+def test_run_writes_timetables(tmp_path, pmf_df, nrf_df):
+    pmf_path, nrf_path = tmp_path / "pmf.csv", tmp_path / "nrf.csv"
+    pmf_df.to_csv(pmf_path, index=False)
+    nrf_df.to_csv(nrf_path, index=False)
+    out = tmp_path / "out"
+    status = cli.main(["--pmf", str(pmf_path), "--nrf", str(nrf_path), "--start", "2025-05-01", "--end", "2025-07-31",
+                       "--degree", "UG", "--semester", "IV", "--mode", "coloring", "--export", "--export-format",
+                       "ics", "--save-version", "2025-26", "--store", str(tmp_path / "store.sqlite3"),
+                       "--output-dir", str(out)])
+    assert status == 0
+    assert {"UG_IV_timetable.csv", "UG_IV_conflicts.csv", "UG_IV_export.zip"} <= set(os.listdir(out))
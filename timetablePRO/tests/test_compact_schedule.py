@@ -0,0 +1,57 @@
+import random
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from engine import CompactSchedule, build_enrollment_index, flatten_schedule_to_list
+
+MORNING, AFTERNOON = "09:00 - 12:00", "14:00 - 17:00"
+
+
+def legacy_sorted(exam_list):
+    # the order the tuple-based code used: by date, then by slot name, keeping list order within a sitting
+    return sorted(((code.strip(), exam_date, slot) for code, exam_date, slot in exam_list),
+                  key=lambda exam: (exam[1], exam[2]))
+
+
+def test_round_trip_matches_sorted_tuples():
+    rng = random.Random(3)
+    codes = [f"C{i:02d}" for i in range(25)]
+    exam_list = [(f" {code} " if i % 4 == 0 else code, datetime(2025, 6, 1 + rng.randrange(20)),
+                  rng.choice([AFTERNOON, MORNING])) for i, code in enumerate(codes)]
+    schedule = CompactSchedule.from_exam_list(exam_list)
+    assert len(schedule) == len(exam_list)
+    # interned in first-seen order, with codes stripped
+    assert schedule.codes == codes and schedule.slots == list(dict.fromkeys(slot for _, _, slot in exam_list))
+    assert schedule.course.dtype == np.int32 and schedule.day.dtype == np.int64
+    assert schedule.to_exam_list() == legacy_sorted(exam_list)
+    assert CompactSchedule.from_exam_list(schedule) is schedule
+
+def test_schedule_dict_and_exam_list_agree():
+    schedule_dict = {"2025-06-03": {AFTERNOON: ["ENG-1"], MORNING: ["HIS-1", "MAT-1"]},
+                     "2025-06-02": {MORNING: ["PHY-1"]}}
+    assert flatten_schedule_to_list(schedule_dict) == [
+        ("PHY-1", datetime(2025, 6, 2), MORNING), ("HIS-1", datetime(2025, 6, 3), MORNING),
+        ("MAT-1", datetime(2025, 6, 3), MORNING), ("ENG-1", datetime(2025, 6, 3), AFTERNOON)]
+    rebuilt = CompactSchedule.from_exam_list(flatten_schedule_to_list(schedule_dict))
+    assert rebuilt.to_exam_list() == CompactSchedule.from_schedule_dict(schedule_dict).to_exam_list()
+
+def test_unique_keeps_first_entries_in_order():
+    monday = datetime(2025, 6, 2)
+    exam_list = [("B", monday, MORNING), ("A", monday, MORNING), ("B ", monday, MORNING), ("B", monday, AFTERNOON),
+                 ("A", monday, MORNING)]
+    schedule = CompactSchedule.from_exam_list(exam_list).unique()
+    assert [schedule.codes[c] for c in schedule.course] == ["B", "A", "B"]
+    assert [schedule.slots[s] for s in schedule.slot] == [MORNING, MORNING, AFTERNOON]
+
+def test_assignment_and_index_ids():
+    monday = datetime(2025, 6, 2)
+    schedule = CompactSchedule.from_exam_list([("ENG-1", monday, MORNING), ("NEW-1", monday, MORNING)])
+    moved = schedule.with_assignment(schedule.day + np.array([0, 2]), np.array([schedule.slot_id(AFTERNOON)] * 2))
+    assert moved.to_exam_list() == [("ENG-1", monday, AFTERNOON), ("NEW-1", datetime(2025, 6, 4), AFTERNOON)]
+    assert schedule.to_exam_list() == [("ENG-1", monday, MORNING), ("NEW-1", monday, MORNING)]
+    index = build_enrollment_index(pd.DataFrame({'Regd. No.': ["R1"], 'Paper 1 Code': ["ENG-1"]}))
+    # papers nobody is enrolled in have no index id
+    assert schedule.index_course_ids(index).tolist() == [0, -1]
+    assert CompactSchedule().to_exam_list() == [] and len(CompactSchedule().unique()) == 0
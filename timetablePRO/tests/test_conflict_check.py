@@ -0,0 +1,77 @@
+import random
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from conftest import SLOTS
+from engine import build_enrollment_index, check_full_schedule_conflict, find_clashes, get_code_columns
+
+MESSAGE = re.compile(r"Student (\S+) has multiple exams on (\S+) in slot '([^']*)': (.*)")
+
+
+def parse(conflicts):
+    keys = []
+    for message in conflicts:
+        reg_no, day, slot, courses = MESSAGE.fullmatch(message).groups()
+        keys.append((reg_no, day, slot, frozenset(courses.split(", "))))
+    return keys
+
+def brute_force_conflicts(nrf, exam_list):
+    # every student's own papers against the timetable, straight from the nominal roll rows
+    sittings = defaultdict(set)
+    for code, exam_date, slot in exam_list:
+        sittings[code.strip()].add((exam_date.strftime("%Y-%m-%d"), slot))
+    papers = defaultdict(set)
+    for _, row in nrf.iterrows():
+        papers[row['Regd. No.']] |= {str(code).strip() for code in row[get_code_columns(nrf)] if pd.notna(code)}
+    keys = []
+    for reg_no, codes in papers.items():
+        by_sitting = defaultdict(set)
+        for code in codes:
+            for sitting in sittings.get(code, ()):
+                by_sitting[sitting].add(code)
+        keys += [(reg_no, *sitting, frozenset(courses)) for sitting, courses in by_sitting.items() if len(courses) > 1]
+    return keys
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_conflicts_match_a_per_student_scan(nrf_df, index, seed):
+    rng = random.Random(seed)
+    # all papers over a few days and two slots, so most students sit several at once
+    exam_list = [(code, datetime(2025, 5, 5) + timedelta(days=rng.randrange(5)), rng.choice(SLOTS))
+                 for code in index.course_codes]
+    keys = parse(check_full_schedule_conflict(index, exam_list))
+    assert len(keys) == len(set(keys))
+    assert sorted(keys, key=str) == sorted(brute_force_conflicts(nrf_df, exam_list), key=str)
+    assert keys
+
+def test_duplicates_padding_and_unknown_codes():
+    nrf = pd.DataFrame({'Regd. No.': ["R1", "R2", "R3"], 'Paper 1 Code': ["ENG-1", "ENG-1", "HIS-1"],
+                        'Paper 2 Code': ["HIS-1", "MAT-1", "MAT-1"]})
+    index = build_enrollment_index(nrf)
+    morning = datetime(2025, 5, 6)
+    # a repeated entry, a padded code and a paper nobody takes share R1's clashing sitting
+    exam_list = [("ENG-1", morning, SLOTS[0]), (" HIS-1 ", morning, SLOTS[0]), ("ENG-1", morning, SLOTS[0]),
+                 ("XYZ-9", morning, SLOTS[0]), ("MAT-1", morning, SLOTS[1]),
+                 ("HIS-1", morning + timedelta(days=1), SLOTS[1])]
+    keys = parse(check_full_schedule_conflict(index, exam_list))
+    assert keys == [("R1", "2025-05-06", SLOTS[0], frozenset({"ENG-1", "HIS-1"}))]
+    assert sorted(keys) == sorted(brute_force_conflicts(nrf, exam_list))
+    assert check_full_schedule_conflict(index, exam_list[4:]) == []
+
+def test_clash_pairs_add_up_to_the_students(index):
+    rng = random.Random(7)
+    exam_list = [(code, datetime(2025, 5, 5) + timedelta(days=rng.randrange(3)), rng.choice(SLOTS))
+                 for code in index.course_codes]
+    pairs = defaultdict(int)
+    for reg_no, day, slot, courses in parse(check_full_schedule_conflict(index, exam_list)):
+        for a in courses:
+            for b in courses:
+                if a < b:
+                    pairs[(day, slot, a, b)] += 1
+    clashes = find_clashes(index, exam_list)
+    assert {(c["date"], c["slot"], *sorted((c["course_a"], c["course_b"]))): c["shared_students"]
+            for c in clashes} == pairs
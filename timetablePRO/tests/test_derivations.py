@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from engine import (build_enrollment_index, derived_semesters, filter_pmf_by_degree, prepare_pmf,
+                    select_semester_papers, term_runs)
+
+# The app memoizes these derivations on the upload hashes, degree, semester and rule-table hash, passing the
+# frames unhashed: that is only sound while they read nothing else and never modify what they are given.
+
+PMF = prepare_pmf(pd.DataFrame({
+    'Paper Code': ["UENG-101", "UENG-201", "UHIS-202", "UMAT-301", "PENG-101", "UAWR-101", "BPAM-201", "UIDM-101"],
+    'Paper Title': ["English", "English II", "History II", "Maths III", "MA English", "Award", "BPAM II", "IDM"],
+    'Programme Name': ["BA", "BA", "BA", "BSc", "MA", "BA", "BPAM", "BA"],
+    'CC': ["DSC", "DSC", "DSC", "DSC", "DSC", "VAC", "DSC", "IDM"],
+}))
+NRF = pd.DataFrame({'Regd. No.': ["R1", "R2", "R3"], 'Semester': ["I", "I", "II"],
+                    'Paper 1 Code': ["UENG-101", "UENG-101", "UENG-201"],
+                    'Paper 2 Code': ["UHIS-202", "UIDM-101", None]})
+# a rule table that reads the semester from the paper's last digit instead
+LAST_DIGIT = (("last-digit", r"([1-8])$", None),)
+
+
+@pytest.fixture
+def index():
+    return build_enrollment_index(NRF)
+
+
+def test_derivations_leave_their_inputs_alone(index):
+    pmf = PMF.copy()
+    semester_courses = {semester: courses.copy() for semester, courses in index.semester_courses.items()}
+    for degree_type in ("UG", "PG", "Professional"):
+        df = filter_pmf_by_degree(pmf, degree_type)
+        for semester in derived_semesters(df):
+            select_semester_papers(df, semester, index)
+    term_runs(pmf, index, rules=LAST_DIGIT)
+    pd.testing.assert_frame_equal(pmf, PMF)
+    assert {s: c.tolist() for s, c in index.semester_courses.items()} == {
+        s: c.tolist() for s, c in semester_courses.items()}
+
+def test_semester_papers_depend_only_on_their_keys(index):
+    ug = filter_pmf_by_degree(PMF, "UG")
+    assert derived_semesters(ug) == ["I", "II", "IV"]
+    assert 'UAWR-101' not in ug['Paper Code'].tolist()
+    first = select_semester_papers(ug, "I", index)
+    # a fresh PMF frame with the same content gives the same papers, so the hash can stand in for the frame
+    again = select_semester_papers(filter_pmf_by_degree(PMF.copy(), "UG"), "I", index)
+    pd.testing.assert_frame_equal(first, again)
+    # NRF enrolments add UHIS-202 to semester I; without an NRF only the derived semester counts
+    assert first['Paper Code'].tolist() == ["UENG-101", "UIDM-101", "UHIS-202"]
+    assert select_semester_papers(ug, "I")['Paper Code'].tolist() == ["UENG-101", "UIDM-101"]
+
+def test_rule_table_changes_the_derivation():
+    # the rule-table hash is part of every memo key because the same PMF derives differently under other rules
+    default = filter_pmf_by_degree(PMF, "UG")
+    last_digit = filter_pmf_by_degree(PMF, "UG", LAST_DIGIT)
+    assert default.set_index('Paper Code').loc["UMAT-301", 'Derived Semester'] == "IV"
+    assert last_digit.set_index('Paper Code').loc["UMAT-301", 'Derived Semester'] == "I"
+
+def test_joint_runs_match_the_per_semester_selections(index):
+    runs = term_runs(PMF, index, degrees=("UG", "PG"))
+    expected = []
+    for degree_type in ("UG", "PG"):
+        df = filter_pmf_by_degree(PMF, degree_type)
+        expected += [(degree_type, semester, select_semester_papers(df, semester, index))
+                     for semester in derived_semesters(df)]
+    assert [(d, s) for d, s, _ in runs] == [(d, s) for d, s, papers in expected if len(papers)]
+    for (_, _, papers), (_, _, expected_papers) in zip(runs, (e for e in expected if len(e[2]))):
+        pd.testing.assert_frame_equal(papers, expected_papers)
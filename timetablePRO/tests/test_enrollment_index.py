@@ -0,0 +1,62 @@
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from engine import build_enrollment_index
+
+# a nominal roll with the untidy bits real ones have: repeated and padded codes, blanks, a missing registration
+# number and a student listed on two rows
+NRF = pd.DataFrame({
+    'Sl. No.': [1, 2, 3, 4, 5],
+    'Regd. No.': ["R1", "R2", None, "R1", "R4"],
+    'Programme Name': ["BA", "BA", "BSc", "BA", "BSc"],
+    'Semester': ["II", "II", "IV", "II", "IV"],
+    'Paper 1 Code': ["ENG-101", " HIS-101 ", "PHY-201", "MAT-101", "PHY-201"],
+    'Paper 2 Code': ["HIS-101", "ENG-101", "MAT-101", None, ""],
+    'Paper 3 Code': ["ENG-101", None, "CHE-201", "HIS-101", "CHE-201"],
+})
+
+
+def brute_force_enrolments(nrf):
+    # registration number -> set of codes, read cell by cell
+    enrolments = defaultdict(set)
+    for row_id, row in nrf.iterrows():
+        reg_no = row['Regd. No.'] if pd.notna(row['Regd. No.']) else f"Student_{row_id}"
+        for column in ('Paper 1 Code', 'Paper 2 Code', 'Paper 3 Code'):
+            if pd.notna(row[column]) and str(row[column]).strip():
+                enrolments[reg_no].add(str(row[column]).strip())
+    return enrolments
+
+
+def test_index_matches_the_nominal_roll():
+    index = build_enrollment_index(NRF)
+    enrolments = brute_force_enrolments(NRF)
+    assert sorted(index.reg_nos) == sorted(enrolments)
+    assert list(index.course_codes) == sorted({code for codes in enrolments.values() for code in codes})
+    for student, reg_no in enumerate(index.reg_nos):
+        assert set(index.course_codes_of(student)) == enrolments[reg_no]
+    for code in index.course_codes:
+        expected = {reg_no for reg_no, codes in enrolments.items() if code in codes}
+        assert set(index.reg_nos[index.students_of(code)]) == expected
+        assert index.student_count(code) == len(expected)
+    # codes are looked up stripped, unknown ones have no students
+    assert index.student_count(" ENG-101 ") == 2 and index.student_count("BIO-101") == 0
+
+
+def test_co_enrollment_counts_shared_students():
+    index = build_enrollment_index(NRF)
+    co_enrollment = index.co_enrollment().toarray()
+    for a, code_a in enumerate(index.course_codes):
+        for b, code_b in enumerate(index.course_codes):
+            assert co_enrollment[a, b] == len(index.shared_students(code_a, code_b))
+    assert np.array_equal(np.diag(co_enrollment), index.course_sizes())
+    assert index.shared_students("ENG-101", "HIS-101").tolist() == sorted(index.students_of("ENG-101").tolist())
+
+
+def test_student_counts_frame():
+    counts = build_enrollment_index(NRF).student_counts_frame()
+    assert counts.to_dict('records') == [
+        {'Paper Code': "CHE-201", 'Student Count': 2}, {'Paper Code': "ENG-101", 'Student Count': 2},
+        {'Paper Code': "HIS-101", 'Student Count': 2}, {'Paper Code': "MAT-101", 'Student Count': 2},
+        {'Paper Code': "PHY-201", 'Student Count': 2}]
@@ -0,0 +1,90 @@
+import itertools
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+from engine import HAS_CPSAT, build_enrollment_index, flatten_schedule_to_list, solve_schedule_exact
+
+# A-B, B-C, C-D and A-E share students; A, B and C have two students each
+NRF = pd.DataFrame({'Regd. No.': ["R1", "R2", "R3", "R4"], 'Paper 1 Code': ["A", "B", "C", "A"],
+                    'Paper 2 Code': ["B", "C", "D", "E"]})
+SLOTS = ["09:00 - 10:30", "13:00 - 14:30"]
+# Monday to Saturday with a Wednesday holiday: five exam days
+START, END, HOLIDAYS, WEEKENDS = date(2025, 5, 5), date(2025, 5, 10), [date(2025, 5, 7)], {6}
+DAYS = [date(2025, 5, d) for d in (5, 6, 8, 9, 10)]
+SEATS = 3
+
+
+def brute_force_best(index, courses, gap_days=2):
+    # the model's objective, minimised over every assignment of papers to (day, slot) bins
+    sizes = {c: index.student_count(c) for c in courses}
+    clashing = [(a, b) for a, b in itertools.combinations(courses, 2) if len(index.shared_students(a, b))]
+    best = None
+    for bins in itertools.product(range(len(DAYS) * len(SLOTS)), repeat=len(courses)):
+        placed = dict(zip(courses, bins))
+        if any(placed[a] == placed[b] for a, b in clashing):
+            continue
+        seats = [sum(sizes[c] for c in courses if placed[c] == b) for b in range(len(DAYS) * len(SLOTS))]
+        if max(seats) > SEATS:
+            continue
+        used = sorted({b // len(SLOTS) for b in bins})
+        if any((DAYS[j] - DAYS[i]).days < gap_days for i, j in zip(used, used[1:])):
+            continue
+        cost = sum(b // len(SLOTS) for b in bins) + len(DAYS) * len(used)
+        best = cost if best is None else min(best, cost)
+    return best
+
+def check_schedule(index, exam_list):
+    sittings = {}
+    for code, exam_date, slot in exam_list:
+        assert exam_date.date() in DAYS and slot in SLOTS
+        sittings.setdefault((exam_date, slot), []).append(code)
+    for codes in sittings.values():
+        assert sum(index.student_count(c) for c in codes) <= SEATS
+        assert not any(len(index.shared_students(a, b)) for a, b in itertools.combinations(codes, 2))
+    used = sorted({exam_date for exam_date, _ in sittings})
+    assert all((b - a).days >= 2 for a, b in zip(used, used[1:]))
+
+
+@pytest.mark.parametrize("backend", [
+    "highs", pytest.param("cp-sat", marks=pytest.mark.skipif(not HAS_CPSAT, reason="OR-Tools is not installed"))])
+def test_exact_schedule_is_optimal(backend):
+    index = build_enrollment_index(NRF)
+    courses = ["A", "B", "C", "D", "E"]
+    schedule, details = solve_schedule_exact(courses, index, START, END, HOLIDAYS, WEEKENDS, "I", slots=SLOTS,
+                                             seat_capacity=SEATS, backend=backend)
+    assert details["status"] == "optimal"
+    exam_list = flatten_schedule_to_list(schedule)
+    assert sorted(code for code, _, _ in exam_list) == courses
+    check_schedule(index, exam_list)
+    assert details["objective"] == brute_force_best(index, courses)
+
+def test_group_dates_and_warm_starts():
+    index = build_enrollment_index(NRF)
+    groups = [{"courses": ["E"], "date": datetime(2025, 5, 10)}]
+    warm = [("A", datetime(2025, 5, 5), SLOTS[0]), ("D", datetime(2025, 5, 5), SLOTS[0]),
+            ("B", datetime(2025, 5, 5), SLOTS[1]), ("C", datetime(2025, 5, 8), SLOTS[0]),
+            ("E", datetime(2025, 5, 10), SLOTS[0])]
+    schedule, details = solve_schedule_exact(list("ABCDE"), index, START, END, HOLIDAYS, WEEKENDS, "I",
+                                             groups=groups, slots=SLOTS, seat_capacity=SEATS, warm_start=warm,
+                                             backend="highs")
+    assert details["warm_start"] == "feasible" and details["status"] == "optimal"
+    exam_list = flatten_schedule_to_list(schedule)
+    check_schedule(index, exam_list)
+    assert ("E", datetime(2025, 5, 10), SLOTS[0]) in exam_list
+    # a warm start that breaks the clash rule is not used to bound the solve
+    clashing = [("B", datetime(2025, 5, 5), SLOTS[0]) if exam[0] == "B" else exam for exam in warm]
+    _, details = solve_schedule_exact(list("ABCDE"), index, START, END, HOLIDAYS, WEEKENDS, "I", groups=groups,
+                                      slots=SLOTS, seat_capacity=SEATS, warm_start=clashing, backend="highs")
+    assert details["warm_start"] == "infeasible" and details["status"] == "optimal"
+
+def test_too_small_a_window_is_infeasible():
+    index = build_enrollment_index(NRF)
+    # one day, one slot: A and B can never sit apart
+    schedule, details = solve_schedule_exact(["A", "B"], index, START, START, [], WEEKENDS, "I", slots=SLOTS[:1],
+                                             backend="highs")
+    assert schedule is None and details["status"] == "infeasible"
+    schedule, details = solve_schedule_exact(["A"], index, date(2025, 5, 11), date(2025, 5, 11), [], WEEKENDS, "I",
+                                             backend="highs")
+    assert schedule is None and details["status"] == "no-days"
@@ -0,0 +1,105 @@
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import export
+from engine import build_enrollment_index
+from ingest import ics_holidays
+
+MORNING, AFTERNOON = "09:00 - 10:30", "13:00 - 14:30"
+PMF = pd.DataFrame({'Paper Code': ["ENG-101", "HIS-101", "PHY-101", "CHE-101"],
+                    'Paper Title': ["English, Part (I)", "History", "Physics", "Chemistry"],
+                    'Programme Name': ["B.A. (Hons)", "B.A. (Hons)", "B.Sc", "B.Sc"]})
+NRF = pd.DataFrame({'Regd. No.': ["R/1", "R2", "R3"], 'Paper 1 Code': ["ENG-101", "PHY-101", "ENG-101"],
+                    'Paper 2 Code': ["HIS-101", "CHE-101", "PHY-101"]})
+EXAMS = [("PHY-101", datetime(2025, 5, 6), MORNING), ("ENG-101", datetime(2025, 5, 5), MORNING),
+         ("HIS-101", datetime(2025, 5, 7), AFTERNOON), ("CHE-101", datetime(2025, 5, 8), "Reserve day")]
+
+
+@pytest.fixture(scope="module")
+def bundle():
+    stream = io.BytesIO()
+    assert export.export_bundle(stream, EXAMS, PMF, build_enrollment_index(NRF), name="term")
+    return zipfile.ZipFile(io.BytesIO(stream.getvalue()))
+
+
+def test_bundle_members(bundle):
+    assert sorted(bundle.namelist()) == sorted([
+        "term.xlsx", "pdf/term.pdf", "pdf/B_A_Hons.pdf", "pdf/B_Sc.pdf", "personal_timetables.csv",
+        "ics/term.ics", "ics/B_A_Hons.ics", "ics/B_Sc.ics", "personal/R_1.ics", "personal/R2.ics", "personal/R3.ics"])
+
+def test_xlsx_sheets(bundle):
+    workbook = openpyxl.load_workbook(io.BytesIO(bundle.read("term.xlsx")))
+    assert workbook.sheetnames == ["Combined", "B.A. (Hons)", "B.Sc", "Student Count"]
+    combined = [list(row) for row in workbook["Combined"].iter_rows(values_only=True)]
+    assert combined[0] == export.TIMETABLE_COLUMNS
+    assert [(row[0], row[1], row[2]) for row in combined[1:]] == [
+        (datetime(2025, 5, 5), MORNING, "ENG-101"), (datetime(2025, 5, 6), MORNING, "PHY-101"),
+        (datetime(2025, 5, 7), AFTERNOON, "HIS-101"), (datetime(2025, 5, 8), "Reserve day", "CHE-101")]
+    assert [row[2] for row in workbook["B.Sc"].iter_rows(min_row=2, values_only=True)] == ["PHY-101", "CHE-101"]
+    assert list(workbook["Student Count"].iter_rows(min_row=2, values_only=True)) == [
+        ("CHE-101", 1), ("ENG-101", 2), ("HIS-101", 1), ("PHY-101", 2)]
+
+def test_personal_timetables_list_each_students_exams(bundle):
+    rows = list(csv.reader(io.StringIO(bundle.read("personal_timetables.csv").decode("utf-8"))))
+    assert rows[0] == export.PERSONAL_COLUMNS
+    expected = {(reg_no, code) for reg_no, *codes in NRF.itertuples(index=False) for code in codes}
+    assert {(row[0], row[3]) for row in rows[1:]} == expected and len(rows) - 1 == len(expected)
+    # quoted fields survive the hand-rolled CSV writer
+    assert ["R/1", "05/05/2025", MORNING, "ENG-101", "English, Part (I)"] in rows
+
+def test_calendars(bundle):
+    combined = bundle.read("ics/term.ics").decode("utf-8")
+    assert combined.startswith("BEGIN:VCALENDAR\r\n") and combined.endswith("END:VCALENDAR\r\n")
+    assert all(len(line.encode("utf-8")) <= 75 for line in combined.split("\r\n"))
+    assert ics_holidays(combined) == [date(2025, 5, 5), date(2025, 5, 6), date(2025, 5, 7), date(2025, 5, 8)]
+    assert "DTSTART:20250505T090000" in combined and "DTEND:20250505T103000" in combined
+    # a slot without times becomes an all-day event
+    assert "DTSTART;VALUE=DATE:20250508" in combined and "DTEND;VALUE=DATE:20250509" in combined
+    assert "SUMMARY:ENG-101 English\\, Part (I)" in combined
+    personal = bundle.read("personal/R3.ics").decode("utf-8")
+    assert re.findall(r"SUMMARY:(\S+)", personal) == ["ENG-101", "PHY-101"]
+    assert combined.count("BEGIN:VEVENT") == 4 and bundle.read("ics/B_Sc.ics").decode().count("BEGIN:VEVENT") == 2
+
+def test_pdf_structure(bundle):
+    pdf = bundle.read("pdf/B_A_Hons.pdf")
+    assert pdf.startswith(b"%PDF-1.4") and pdf.rstrip().endswith(b"%%EOF")
+    # every xref offset points at its object
+    xref = int(re.search(rb"startxref\n(\d+)", pdf).group(1))
+    offsets = [int(entry[:10]) for entry in pdf[xref:].split(b"\n")[3:] if entry.endswith(b" n ")]
+    for number, offset in enumerate(offsets, start=1):
+        assert pdf[offset:].startswith(b"%d 0 obj" % number)
+    assert b"(B.A. \\(Hons\\) Timetable) '" in pdf
+    per_page = int((export.PDF_PAGE[1] - 2 * export.PDF_MARGIN) / (export.PDF_FONT_SIZE * 1.4)) - 3
+    long = export.pdf_table("Long", ["A"], [[n] for n in range(200)])
+    assert long.count(b"/Type /Page ") == -(-200 // per_page) > 1
+
+
+def test_fold_keeps_multibyte_characters_whole():
+    line = "SUMMARY:" + "É" * 60
+    folded = export._ics_fold(line)
+    parts = folded.split("\r\n")[:-1]
+    assert all(len(part.encode("utf-8")) <= 75 for part in parts)
+    assert "".join(part[1:] if i else part for i, part in enumerate(parts)) == line
+
+def test_sheet_titles_and_row_limit(monkeypatch):
+    used = set()
+    name = "B.Com [Hons]: Accounting and Finance"
+    titles = [export._sheet_title(title, used) for title in (name, name, name.lower())]
+    # 31 characters at most, unique regardless of case
+    assert titles == ["B.Com _Hons__ Accounting and Fi", "B.Com _Hons__ Accounting and ~2",
+                      "b.com _hons__ accounting and ~3"]
+    monkeypatch.setattr(export, "XLSX_MAX_ROWS", 3)
+    stream = io.BytesIO()
+    export.write_xlsx(stream, [("Big", ["n"], ([n] for n in range(5))), ("Empty", ["n"], iter(()))])
+    workbook = openpyxl.load_workbook(stream)
+    # two data rows per sheet once the header takes its row
+    assert workbook.sheetnames == ["Big", "Big 2", "Big 3", "Empty"]
+    assert [[row[0] for row in workbook[name].iter_rows(min_row=2, values_only=True)]
+            for name in workbook.sheetnames] == [[0, 1], [2, 3], [4], []]
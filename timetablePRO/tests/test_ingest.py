@@ -0,0 +1,86 @@
+import os
+
+import pandas as pd
+import pytest
+
+import ingest
+
+PMF_CSV = b"""Paper Code,Paper Title,Programme Name,CC
+ ENG-101 ,English I,BA English,DSC
+HIS-201,History II,BA History,IDM
+,Blank Code,BA History,VAC
+"""
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "CACHE_DIR", str(tmp_path))
+    ingest.clear_cache()
+    yield tmp_path
+    ingest.clear_cache()
+
+def codes(df):
+    return [code if pd.notna(code) else None for code in df['Paper Code']]
+
+def assert_same_table(df, expected):
+    # a Parquet round trip may read text columns back as pandas' string dtype
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+def forbid_parsing(monkeypatch):
+    def read_upload(data, filename=""):
+        raise AssertionError(f"{filename} parsed again")
+    monkeypatch.setattr(ingest, "read_upload", read_upload)
+
+
+def test_same_bytes_are_parsed_once(cache_dir, monkeypatch):
+    first, digest = ingest.load_pmf(PMF_CSV, "pmf.csv")
+    assert codes(first) == ["ENG-101", "HIS-201", None]
+    assert len(os.listdir(cache_dir)) == 1
+    forbid_parsing(monkeypatch)
+    again, same_digest = ingest.load_pmf(PMF_CSV, "renamed.csv")
+    assert again is first and same_digest == digest
+    # a new session has only the disk cache
+    ingest.clear_cache()
+    from_disk, _ = ingest.load_pmf(PMF_CSV, "pmf.csv")
+    assert_same_table(from_disk, first)
+
+def test_changed_bytes_are_parsed_again(cache_dir):
+    first, digest = ingest.load_pmf(PMF_CSV, "pmf.csv")
+    edited = PMF_CSV.replace(b"History II", b"History III")
+    second, edited_digest = ingest.load_pmf(edited, "pmf.csv")
+    assert edited_digest != digest
+    assert second['Paper Title'].tolist() == ["English I", "History III", "Blank Code"]
+    assert first['Paper Title'].tolist() == ["English I", "History II", "Blank Code"]
+    assert len(os.listdir(cache_dir)) == 2
+    # the edit is picked up from disk too, and the original upload still maps to its own table
+    ingest.clear_cache()
+    assert ingest.load_pmf(edited, "pmf.csv")[0]['Paper Title'].tolist()[1] == "History III"
+    assert ingest.load_pmf(PMF_CSV, "pmf.csv")[0]['Paper Title'].tolist()[1] == "History II"
+
+def test_kinds_are_cached_apart(cache_dir):
+    pmf, digest = ingest.load_table("pmf", PMF_CSV, "table.csv")
+    nrf, nrf_digest = ingest.load_table("nrf", PMF_CSV, "table.csv")
+    # the NRF normalizer strips code columns but does not classify papers
+    assert digest == nrf_digest and nrf is not pmf
+    assert pmf['Is IDM'].tolist() == [False, True, False] and 'Is IDM' not in nrf.columns
+
+def test_unreadable_disk_entry_is_rebuilt(cache_dir):
+    ingest.load_pmf(PMF_CSV, "pmf.csv")
+    for name in os.listdir(cache_dir):
+        (cache_dir / name).write_bytes(b"not a table")
+    ingest.clear_cache()
+    df, _ = ingest.load_pmf(PMF_CSV, "pmf.csv")
+    assert codes(df) == ["ENG-101", "HIS-201", None]
+    ingest.clear_cache(disk=True)
+    assert os.listdir(cache_dir) == []
+
+def test_memory_cache_keeps_the_latest_tables(cache_dir, monkeypatch):
+    monkeypatch.setattr(ingest, "MEMORY_CACHE_SIZE", 2)
+    uploads = [PMF_CSV + f"NEW-{i},New,BA New,DSC\n".encode() for i in range(3)]
+    tables = [ingest.load_pmf(data, "pmf.csv")[0] for data in uploads]
+    assert len(ingest._memory_cache) == 2
+    assert ingest.load_pmf(uploads[2], "pmf.csv")[0] is tables[2]
+    # the evicted upload comes back from disk as an equal but new frame
+    evicted = ingest.load_pmf(uploads[0], "pmf.csv")[0]
+    assert evicted is not tables[0]
+    assert_same_table(evicted, tables[0])
@@ -0,0 +1,104 @@
+import threading
+import time
+import tracemalloc
+from contextvars import copy_context
+
+import pytest
+
+from conftest import END_DATE, START_DATE, WEEKENDS
+from engine import best_of_n_schedules, build_enrollment_index
+from jobs import JobRegistry, progress
+from profiling import Profiler, count, set_active, span
+
+
+@pytest.fixture
+def registry():
+    job_registry = JobRegistry(max_workers=1)
+    yield job_registry
+    job_registry.shutdown()
+
+
+def wait_for(job, timeout=60.0):
+    deadline = time.time() + timeout
+    while not job.is_finished:
+        assert time.time() < deadline, f"job {job.name} still {job.status}"
+        time.sleep(0.01)
+    return job
+
+
+def test_cancel_stops_a_running_job(registry):
+    started, steps = threading.Event(), []
+
+    def loop():
+        started.set()
+        while True:
+            steps.append(len(steps))
+            progress(len(steps), None)
+            time.sleep(0.001)
+
+    job = registry.submit("loop", loop)
+    assert started.wait(10)
+    registry.cancel(job.id)
+    assert wait_for(job).status == "cancelled"
+    stopped_at = len(steps)
+    time.sleep(0.05)
+    assert len(steps) == stopped_at and job.result is None and job.error is None
+
+def test_cancelled_queued_job_never_runs(registry):
+    release, ran = threading.Event(), []
+    blocker = registry.submit("blocker", release.wait, 10)
+    queued = registry.submit("queued", ran.append, True)
+    queued.cancel()
+    assert queued.status == "cancelled"
+    release.set()
+    assert wait_for(blocker).status == "done"
+    assert not ran and queued.started is None
+
+def test_failed_job_records_its_error(registry):
+    def fail():
+        progress(1, 2, rows=10)
+        raise ValueError("bad sheet")
+
+    job = wait_for(registry.submit("fail", fail))
+    assert job.status == "failed" and job.error.startswith("ValueError: bad sheet")
+    assert job.snapshot()["counters"] == {"rows": 10}
+
+def test_job_records_into_its_own_profiler(registry):
+    started, release = threading.Event(), threading.Event()
+
+    def step():
+        with span("step"):
+            started.set()
+            release.wait(10)
+            count(rows=3)
+
+    submitter, job_profiler = Profiler(), Profiler(trace_memory=True)
+    with submitter.activate():
+        job = registry.submit("profiled", step, profiler=job_profiler)
+        assert started.wait(10)
+    # a later rerun without memory tracing leaves the job's tracing running
+    copy_context().run(set_active, None)
+    assert tracemalloc.is_tracing()
+    release.set()
+    assert wait_for(job).status == "done"
+    assert not tracemalloc.is_tracing()
+    assert submitter.spans == []
+    assert [(s["name"], s["counters"]) for s in job.profiler.report()] == [("step", {"rows": 3})]
+    assert "peak_bytes" in job.profiler.report()[0]
+
+def test_concurrent_best_of_n_jobs_keep_their_index(nrf_df, index, semester_run):
+    semester, _, courses = semester_run
+    # a third of the students: different co-enrolment, so a shared worker index would change the result
+    other = build_enrollment_index(nrf_df.iloc[:len(nrf_df) // 3])
+    args = (START_DATE, END_DATE, [], WEEKENDS, semester)
+    serial = [best_of_n_schedules(courses, idx, *args, n_starts=3, max_workers=2)[1:] for idx in (index, other)]
+    assert serial[0] != serial[1]
+    registry = JobRegistry(max_workers=2)
+    try:
+        jobs = [registry.submit(f"best-of-n {i}", best_of_n_schedules, courses, idx, *args, n_starts=3,
+                                max_workers=2) for i, idx in enumerate((index, other, index, other))]
+        results = [wait_for(job, timeout=120).result for job in jobs]
+    finally:
+        registry.shutdown()
+    assert [job.status for job in jobs] == ["done"] * 4
+    assert [result[1:] for result in results] == serial * 2
@@ -0,0 +1,67 @@
+from collections import Counter, defaultdict
+
+import pandas as pd
+import pytest
+
+from conftest import END_DATE, SLOTS, START_DATE, WEEKENDS
+from engine import (find_clashes, flatten_schedule_to_list, optimize_schedule, papers_per_day_bounds, run_exam_list,
+                    schedule_term_jointly, term_runs)
+
+
+@pytest.fixture(scope="module")
+def runs(pmf_df, index):
+    return term_runs(pmf_df, index)
+
+@pytest.fixture(scope="module")
+def joint(runs, index):
+    schedule, details = schedule_term_jointly(runs, index, START_DATE, END_DATE, [], WEEKENDS, slots=SLOTS)
+    return flatten_schedule_to_list(schedule), details
+
+
+def over_cap(runs, exam_list):
+    # papers above its own semester's limit in any sitting, per run
+    return {(degree, semester): max(Counter((exam_date, slot) for _, exam_date, slot in run_exam_list(exam_list, papers))
+                                    .values()) - papers_per_day_bounds(semester)[1]
+            for degree, semester, papers in runs}
+
+def exam_days_by_programme(runs, exam_list):
+    term_papers = pd.concat([papers for _, _, papers in runs]).dropna(subset=['Programme Name'])
+    programmes = term_papers.groupby('Paper Code')['Programme Name'].apply(set)
+    days = defaultdict(set)
+    for code, exam_date, _ in exam_list:
+        for programme in programmes.get(code, ()):
+            days[programme].add(exam_date.toordinal())
+    return [sorted(used) for used in days.values()]
+
+
+def test_joint_schedule_keeps_every_run_within_its_cap(runs, joint):
+    exam_list, details = joint
+    assert len({semester for _, semester, _ in runs}) > 1
+    assert sorted(code for code, _, _ in exam_list) == sorted(
+        {code for _, _, papers in runs for code in papers['Paper Code'].astype(str).str.strip()})
+    assert max(over_cap(runs, exam_list).values()) <= 0
+
+def test_joint_schedule_has_no_cross_run_clash(index, runs, joint):
+    exam_list, details = joint
+    # only a combination group's papers sit together on purpose
+    grouped = [set(group["courses"]) for group in details["groups"]]
+    assert all(any({c["course_a"], c["course_b"]} <= courses for courses in grouped)
+               for c in find_clashes(index, exam_list))
+
+def test_joint_schedule_spaces_days_per_programme(runs, joint):
+    exam_list, _ = joint
+    programme_days = exam_days_by_programme(runs, exam_list)
+    assert min(b - a for used in programme_days for a, b in zip(used, used[1:])) >= 2
+    # programmes without a shared paper may sit on neighbouring days
+    term_days = sorted({exam_date.toordinal() for _, exam_date, _ in exam_list})
+    assert min(b - a for a, b in zip(term_days, term_days[1:])) == 1
+
+def test_optimize_keeps_joint_run_caps(index, runs, joint):
+    exam_list, details = joint
+    term_papers = pd.concat([papers for _, _, papers in runs])
+    optimized, report = optimize_schedule(exam_list, index, [], WEEKENDS, time_limit=0.5, slots=SLOTS, runs=runs,
+                                          pmf_df=term_papers,
+                                          fixed_courses={c for group in details["groups"] for c in group["courses"]})
+    assert report["accepted"]
+    assert max(over_cap(runs, optimized).values()) <= 0
+    assert min(b - a for used in exam_days_by_programme(runs, optimized) for a, b in zip(used, used[1:])) >= 2
@@ -0,0 +1,79 @@
+from collections import defaultdict
+from datetime import datetime
+
+import pytest
+
+from conftest import END_DATE, SLOTS, START_DATE, WEEKENDS
+from engine import evaluate_schedule, flatten_schedule_to_list, optimize_schedule, schedule_exams, schedule_cost
+
+SEAT_CAP = 120
+
+
+def sitting_loads(index, exam_list):
+    seats, papers = defaultdict(int), defaultdict(int)
+    for code, exam_date, slot in exam_list:
+        seats[(exam_date, slot)] += index.student_count(code)
+        papers[(exam_date, slot)] += 1
+    return seats, papers
+
+def programme_gaps(pmf_df, exam_list):
+    # calendar days between consecutive exam days of each programme
+    programmes = pmf_df.dropna(subset=['Programme Name']).groupby('Paper Code')['Programme Name'].apply(set)
+    days = defaultdict(set)
+    for code, exam_date, _ in exam_list:
+        for programme in programmes.get(code, ()):
+            days[programme].add(exam_date.toordinal())
+    return [b - a for used in days.values() for a, b in zip(sorted(used), sorted(used)[1:])]
+
+
+@pytest.fixture(scope="module")
+def capped_schedule(index, semester_run):
+    semester, _, courses = semester_run
+    schedule, _ = schedule_exams(courses, START_DATE, END_DATE, [], WEEKENDS, semester, mode="coloring",
+                                 index=index, seat_capacity=SEAT_CAP, slots=SLOTS)
+    return flatten_schedule_to_list(schedule)
+
+
+def test_optimize_keeps_seat_and_paper_limits(index, pmf_df, capped_schedule):
+    seats, papers = sitting_loads(index, capped_schedule)
+    assert max(seats.values()) <= SEAT_CAP
+    max_papers = max(papers.values())
+    optimized, report = optimize_schedule(capped_schedule, index, [], WEEKENDS, time_limit=0.5, slots=SLOTS,
+                                          seat_capacity=SEAT_CAP, max_papers_per_slot=max_papers, pmf_df=pmf_df)
+    seats, papers = sitting_loads(index, optimized)
+    assert max(seats.values()) <= SEAT_CAP
+    assert max(papers.values()) <= max_papers
+    assert sorted(code for code, _, _ in optimized) == sorted(code for code, _, _ in capped_schedule)
+    assert {slot for _, _, slot in optimized} <= set(SLOTS)
+    assert report["final_cost"] <= report["initial_cost"]
+
+def test_optimize_keeps_programme_gap(index, pmf_df, capped_schedule):
+    assert min(programme_gaps(pmf_df, capped_schedule)) >= 2
+    optimized, _ = optimize_schedule(capped_schedule, index, [], WEEKENDS, time_limit=0.5, slots=SLOTS,
+                                     seat_capacity=SEAT_CAP, pmf_df=pmf_df, gap_days=2)
+    assert min(programme_gaps(pmf_df, optimized)) >= 2
+
+def test_optimize_keeps_min_papers_per_slot(index, capped_schedule):
+    _, papers = sitting_loads(index, capped_schedule)
+    min_papers = min(papers.values()) - 2
+    optimized, report = optimize_schedule(capped_schedule, index, [], WEEKENDS, time_limit=0.5, slots=SLOTS,
+                                          min_papers_per_slot=min_papers)
+    assert report["accepted"]
+    _, papers = sitting_loads(index, optimized)
+    assert min(papers.values()) >= min_papers
+
+def test_optimize_keeps_solo_day_solo(index, capped_schedule):
+    # a free weekday inside the schedule's window, so it is a place the annealer could fill
+    used = {exam_date for _, exam_date, _ in capped_schedule}
+    solo_date = next(datetime(2025, 5, day) for day in range(2, 31)
+                     if datetime(2025, 5, day) not in used and datetime(2025, 5, day).weekday() not in WEEKENDS)
+    assert min(used) < solo_date < max(used)
+    exam_list = capped_schedule + [("UELS-201", solo_date, SLOTS[0])]
+    optimized, report = optimize_schedule(exam_list, index, [], WEEKENDS, time_limit=0.5, slots=SLOTS)
+    assert report["accepted"]
+    assert [code for code, exam_date, _ in optimized if exam_date == solo_date] == ["UELS-201"]
+
+def test_optimize_report_matches_recomputed_cost(index, capped_schedule):
+    optimized, report = optimize_schedule(capped_schedule, index, [], WEEKENDS, time_limit=0.3, slots=SLOTS)
+    assert report["final_cost"] == pytest.approx(schedule_cost(evaluate_schedule(index, optimized)))
+    assert report["trajectory"][-1]["best"] == pytest.approx(report["final_cost"])
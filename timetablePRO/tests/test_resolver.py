@@ -0,0 +1,52 @@
+import random
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from conftest import SLOTS, WEEKENDS
+from engine import build_enrollment_index, evaluate_schedule, resolve_conflicts
+
+MOVED = re.compile(r"Moved (\S+) from .*; (\d+) clashes removed, (\d+) added\)")
+HOLIDAYS = [datetime(2025, 5, 8), datetime(2025, 5, 9)]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_each_move_changes_the_clash_count_by_its_delta(index, semester_run, seed):
+    _, _, courses = semester_run
+    rng = random.Random(seed)
+    exam_list = [(code, datetime(2025, 5, 5) + timedelta(days=rng.randrange(3)), rng.choice(SLOTS))
+                 for code in courses]
+    before = evaluate_schedule(index, exam_list)["clashes"]
+    resolved, log = resolve_conflicts(exam_list, index, HOLIDAYS, WEEKENDS, slots=SLOTS)
+
+    # the occupancy state is only updated by deltas, so the sum of the logged deltas must equal a full recount
+    moves = [MOVED.match(entry).groups() for entry in log if entry.startswith("Moved")]
+    assert moves and all(int(added) < int(removed) for _, removed, added in moves)
+    after = evaluate_schedule(index, resolved)["clashes"]
+    assert after == before - sum(int(removed) - int(added) for _, removed, added in moves)
+    assert sorted(code for code, _, _ in resolved) == sorted(courses)
+    placed = {code: (exam_date, slot) for code, exam_date, slot in exam_list}
+    for code, exam_date, slot in resolved:
+        if (exam_date, slot) != placed[code]:
+            assert exam_date not in HOLIDAYS and exam_date.weekday() not in WEEKENDS and slot in SLOTS
+    assert Counter(code for code, _, _ in moves) == Counter(
+        code for code, exam_date, slot in resolved if (exam_date, slot) != placed[code])
+
+def test_idm_paper_moves_first_and_full_sittings_stay():
+    nrf = pd.DataFrame({'Regd. No.': [f"R{i}" for i in range(6)],
+                        'Paper 1 Code': ["IDM-1"] * 4 + ["DSC-1"] * 2,
+                        'Paper 2 Code': ["DSC-1", "DSC-1", None, None, None, None]})
+    index = build_enrollment_index(nrf)
+    monday = datetime(2025, 5, 5)
+    exam_list = [("IDM-1", monday, SLOTS[0]), ("DSC-1", monday, SLOTS[0]), ("OTH-1", monday, SLOTS[1])]
+    # DSC-1 sorts first among the equally sized papers, but an IDM paper is the one to move
+    resolved, log = resolve_conflicts(exam_list, index, [], WEEKENDS, idm_courses={"IDM-1"}, slots=SLOTS)
+    assert [entry.split()[1] for entry in log] == ["IDM-1"]
+    assert ("DSC-1", monday, SLOTS[0]) in resolved and ("IDM-1", monday, SLOTS[0]) not in resolved
+    # both papers have four students, so with three seats a sitting there is nowhere to move either
+    resolved, log = resolve_conflicts(exam_list, index, [], WEEKENDS, slots=SLOTS, seat_capacity=3)
+    assert sorted(resolved) == sorted(exam_list)
+    assert log == [f"Could not resolve conflict for DSC-1 on 2025-05-05 in slot {SLOTS[0]}"]
@@ -0,0 +1,70 @@
+import math
+from collections import defaultdict
+from datetime import datetime
+
+import pytest
+
+from conftest import END_DATE, SLOTS, START_DATE, WEEKENDS
+from engine import (auto_schedule_exams_by_coloring, find_clashes, flatten_schedule_to_list, gap_exam_days,
+                    resolve_conflicts, schedule_exams)
+from profiling import Profiler
+
+SEAT_CAP = 120
+
+
+def max_sitting_seats(index, exam_list):
+    seats = defaultdict(int)
+    for code, exam_date, slot in exam_list:
+        seats[(exam_date, slot)] += index.student_count(code)
+    return max(seats.values())
+
+
+@pytest.mark.parametrize("seat_capacity", [None, SEAT_CAP])
+def test_coloring_is_clash_free_within_seats(index, semester_run, seat_capacity):
+    semester, _, courses = semester_run
+    schedule, _ = schedule_exams(courses, START_DATE, END_DATE, [], WEEKENDS, semester, mode="coloring",
+                                 index=index, seat_capacity=seat_capacity, slots=SLOTS)
+    exam_list = flatten_schedule_to_list(schedule)
+    assert sorted(code for code, _, _ in exam_list) == sorted(courses)
+    assert find_clashes(index, exam_list) == []
+    assert {exam_date.weekday() for _, exam_date, _ in exam_list}.isdisjoint(WEEKENDS)
+    if seat_capacity:
+        assert max_sitting_seats(index, exam_list) <= seat_capacity
+
+@pytest.mark.parametrize("seat_capacity", [None, SEAT_CAP // 2])
+def test_coloring_bisects_to_the_fewest_days(index, semester_run, seat_capacity):
+    semester, _, courses = semester_run
+    exam_days = gap_exam_days(START_DATE, END_DATE, [], WEEKENDS)
+    with Profiler().activate() as profiler:
+        schedule = auto_schedule_exams_by_coloring(courses, index, START_DATE, END_DATE, [], WEEKENDS, semester,
+                                                   slots=SLOTS, seat_capacity=seat_capacity)
+    assert profiler.summary()[0]["colorings"] <= math.ceil(math.log2(len(exam_days))) + 1
+    # one exam day fewer does not fit
+    n_days = len(schedule)
+    assert sorted(schedule) == [day.strftime("%Y-%m-%d") for day in exam_days[:n_days]]
+    assert auto_schedule_exams_by_coloring(courses, index, START_DATE, exam_days[n_days - 2], [], WEEKENDS,
+                                           semester, slots=SLOTS, seat_capacity=seat_capacity) is None
+
+@pytest.mark.parametrize("mode", ["gap", "dense", "multi-slot"])
+def test_heuristic_modes_respect_seats(index, semester_run, mode):
+    semester, papers, courses = semester_run
+    schedule, _ = schedule_exams(courses, START_DATE, END_DATE, [], WEEKENDS, semester, mode=mode, index=index,
+                                 pmf_df=papers, seat_capacity=SEAT_CAP, slots=SLOTS)
+    assert max_sitting_seats(index, flatten_schedule_to_list(schedule)) <= SEAT_CAP
+
+def test_resolver_clears_clashes_within_seats(index, semester_run):
+    _, _, courses = semester_run
+    # every paper crammed onto three days: many clashes to resolve
+    exam_list = [(code, datetime(2025, 5, 5 + i % 3), SLOTS[0]) for i, code in enumerate(courses)]
+    assert find_clashes(index, exam_list)
+    resolved, log = resolve_conflicts(exam_list, index, [], WEEKENDS, slots=SLOTS, seat_capacity=SEAT_CAP * 4)
+    assert log
+    assert find_clashes(index, resolved) == []
+    assert sorted(code for code, _, _ in resolved) == sorted(courses)
+    # moved papers only land where the seats allow
+    moved = set(resolved) - set(exam_list)
+    seats = defaultdict(int)
+    for code, exam_date, slot in resolved:
+        seats[(exam_date, slot)] += index.student_count(code)
+    assert all(seats[(exam_date, slot)] <= SEAT_CAP * 4 for _, exam_date, slot in moved)
+    assert {exam_date.weekday() for _, exam_date, _ in moved}.isdisjoint(WEEKENDS)
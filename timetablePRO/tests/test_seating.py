@@ -0,0 +1,61 @@
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+from conftest import END_DATE, SLOTS, START_DATE, WEEKENDS
+from engine import flatten_schedule_to_list, schedule_exams
+from seating import SEAT_COLUMNS, SUMMARY_COLUMNS, UNSEATED, allocate_seats
+
+# two laid-out halls, one listed by capacity only and one whose layout is smaller than its stated capacity
+HALLS = pd.DataFrame({'Hall': ["A-101", "A-102", "Library", "B-001"], 'Capacity': [None, 60, 45, 80],
+                      'Rows': [8, 6, None, 5], 'Columns': [10, 12, None, 10]})
+HALL_CAPACITY = {"A-101": 80, "A-102": 60, "Library": 45, "B-001": 50}
+
+
+@pytest.fixture
+def exam_list(index, semester_run):
+    semester, _, courses = semester_run
+    schedule, _ = schedule_exams(courses, START_DATE, END_DATE, [], WEEKENDS, semester, mode="coloring",
+                                 index=index, seat_capacity=sum(HALL_CAPACITY.values()), slots=SLOTS)
+    return flatten_schedule_to_list(schedule)
+
+
+def check_seating(index, exam_list, seats_df, summary_df):
+    assert seats_df.columns.tolist() == SEAT_COLUMNS and summary_df.columns.tolist() == SUMMARY_COLUMNS
+    seated = seats_df[seats_df['Hall'] != UNSEATED]
+    for (_, _, hall), block in seated.groupby(['Date', 'Time Slot', 'Hall']):
+        assert len(block) <= HALL_CAPACITY[hall]
+        assert block['Seat'].is_unique and block['Seat'].between(1, HALL_CAPACITY[hall]).all()
+    assert seats_df.loc[seats_df['Hall'] == UNSEATED, 'Seat'].isna().all()
+    # every enrolled student of every paper sits its exam exactly once, seated or listed as unseated
+    for code, exam_date, slot in exam_list:
+        rows = seats_df[(seats_df['Date'] == exam_date.strftime('%d/%m/%Y')) & (seats_df['Time Slot'] == slot)
+                        & (seats_df['Paper Code'] == code)]
+        assert Counter(rows['Regd. No.']) == Counter(index.reg_nos[index.students_of(code)])
+    counts = seats_df.groupby(['Date', 'Time Slot', 'Hall']).size()
+    assert sorted(counts.items()) == sorted(
+        ((date, slot, hall), students) for date, slot, hall, students in
+        summary_df[['Date', 'Time Slot', 'Hall', 'Students']].itertuples(index=False))
+
+
+@pytest.mark.parametrize("interleave", [False, True])
+def test_seating_within_hall_capacity(index, exam_list, interleave):
+    seats_df, summary_df = allocate_seats(index, exam_list, HALLS, interleave=interleave)
+    assert (seats_df['Hall'] != UNSEATED).all()
+    check_seating(index, exam_list, seats_df, summary_df)
+    laid_out = seats_df[seats_df['Hall'].isin(["A-101", "A-102", "B-001"])]
+    assert ((laid_out['Row'] - 1) * HALLS.set_index('Hall').loc[laid_out['Hall'], 'Columns'].to_numpy()
+            + laid_out['Column'] == laid_out['Seat']).all()
+
+@pytest.mark.parametrize("interleave", [False, True])
+def test_students_beyond_capacity_are_unseated(index, exam_list, interleave):
+    small = HALLS.iloc[2:]
+    seats_df, summary_df = allocate_seats(index, exam_list, small, interleave=interleave)
+    assert (seats_df['Hall'] == UNSEATED).any()
+    assert set(seats_df['Hall']) <= {"Library", "B-001", UNSEATED}
+    check_seating(index, exam_list, seats_df, summary_df)
+
+def test_hall_inventory_needs_a_capacity():
+    with pytest.raises(ValueError):
+        allocate_seats(None, [], pd.DataFrame({'Hall': ["A-101"], 'Rows': [8]}))
@@ -0,0 +1,83 @@
+import random
+import re
+
+import pandas as pd
+import pytest
+
+from engine import SEMESTER_RULES, classify_semesters, extract_semester, semester_rules_from_frame
+
+SEM_MAPPING = {'1': "I", '2': "II", '3': "III", '4': "IV", '5': "V", '6': "VI", '7': "VII", '8': "VIII"}
+
+
+def legacy_extract_semester(paper_code):
+    # the original per-code implementation the rule table replaced
+    code = str(paper_code).strip().upper()
+    if code.startswith("BPAM"):
+        match = re.search(r'BPAM-?(\d+)', code)
+        if match:
+            num_part = match.group(1)
+            if len(num_part) >= 3:
+                prefix = num_part[:3]
+                if prefix.startswith("20"): return "II"
+                elif prefix.startswith("40"): return "IV"
+                elif prefix.startswith("60"): return "VI"
+                elif prefix.startswith("80"): return "VIII"
+            elif len(num_part) >= 2:
+                prefix = num_part[:2]
+                if prefix == "20": return "II"
+                elif prefix == "40": return "IV"
+                elif prefix == "60": return "VI"
+                elif prefix == "80": return "VIII"
+        return "I"
+    else:
+        numeric_parts = re.findall(r'\d+', code)
+        for part in numeric_parts:
+            if '30' in part: return "IV"
+            elif '20' in part: return "II"
+        matches = re.findall(r'\d{3}', code)
+        if matches:
+            digits = matches[-1]
+            for ch in digits:
+                if ch in SEM_MAPPING: return SEM_MAPPING[ch]
+        for ch in code:
+            if ch in SEM_MAPPING: return SEM_MAPPING[ch]
+    return None
+
+def semester_or_none(value):
+    # unmatched codes come back as a missing value from the vectorized classifier
+    return value if isinstance(value, str) else None
+
+def random_codes(n, seed=0):
+    rng = random.Random(seed)
+    prefixes = ["U", "P", "M", "BPAM", "BPAM-", "UAAD-", "PHIS", "u", " U"]
+    alphabet = "0123456789" * 3 + "ABX-/ "
+    return [rng.choice(prefixes) + "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 9)))
+            for _ in range(n)]
+
+
+@pytest.mark.parametrize("code", ["UAAD-101", "UAAD-201", "PHIS-302", "BPAM-201", "BPAM-41", "BPAM-101", "BPAM",
+                                  "UELS-201", "U-120-3", "M0904", "X", "", "UAAE-2030", "U1-30", "P-090-405"])
+def test_known_codes_match_legacy(code):
+    assert semester_or_none(extract_semester(code)) == legacy_extract_semester(code)
+
+def test_random_codes_match_legacy():
+    codes = random_codes(5000)
+    derived = classify_semesters(codes)['Derived Semester']
+    expected = [legacy_extract_semester(code) for code in codes]
+    mismatches = [(code, got, want) for code, got, want in zip(codes, derived, expected)
+                  if semester_or_none(got) != want]
+    assert not mismatches[:10]
+
+def test_scalar_path_matches_bulk():
+    codes = random_codes(2000, seed=1)
+    derived = classify_semesters(codes)['Derived Semester']
+    assert [extract_semester(code) for code in codes] == [semester_or_none(got) for got in derived]
+
+def test_rules_from_frame_round_trip():
+    rules_df = pd.DataFrame([{"name": name, "pattern": pattern,
+                              "semester": semester if isinstance(semester, str) else ""}
+                             for name, pattern, semester in SEMESTER_RULES if not isinstance(semester, dict)])
+    rules = semester_rules_from_frame(rules_df)
+    codes = ["BPAM-601", "UAAD-104", "PHIS-7X"]
+    assert classify_semesters(codes, rules)['Derived Semester'].tolist() == ["VI", "I", "VII"]
+    assert [extract_semester(code, rules) for code in codes] == ["VI", "I", "VII"]
@@ -0,0 +1,61 @@
+from datetime import date, datetime
+
+import pytest
+
+from store import ProjectStore, index_digest
+
+EXAMS = [("UAAD-101", datetime(2025, 5, 5), "09:00 - 10:30"),
+         ("UAAD-102", datetime(2025, 5, 5), "13:00 - 14:30"),
+         ("UAAD-103", datetime(2025, 5, 7), "09:00 - 10:30")]
+
+
+@pytest.fixture
+def store(tmp_path):
+    project_store = ProjectStore(str(tmp_path / "projects.sqlite3"))
+    yield project_store
+    project_store.close()
+
+
+def test_version_round_trip(store):
+    term_id = store.term_id("2025-26", "UG", "I")
+    version_id = store.save_version(term_id, EXAMS, label="first", mode="coloring")
+    assert store.load_version(version_id) == sorted(EXAMS, key=lambda e: (e[1], e[2], e[0]))
+    versions = store.versions(term_id)
+    assert versions['Label'].tolist() == ["first"] and versions['Exams'].tolist() == [len(EXAMS)]
+
+def test_term_round_trip(store, pmf_df, nrf_df, index):
+    term_id = store.term_id("2025-26", "UG", "II")
+    assert store.term_id("2025-26", "UG", "II", create=False) == term_id
+    store.save_table("pmf", "pmf-digest", pmf_df, "pmf.xlsx")
+    store.save_table("nrf", "nrf-digest", nrf_df, "nrf.xlsx")
+    store.save_table("index", index_digest("nrf-digest"), index)
+    groups = [{"group_name": "Languages", "courses": ["UTEL-201", "UHIN-201"], "date": datetime(2025, 5, 6)}]
+    holidays = [date(2025, 5, 12), datetime(2025, 5, 1)]
+    store.save_term(term_id, pmf_digest="pmf-digest", nrf_digest="nrf-digest", holidays=holidays, groups=groups)
+    version_id = store.save_version(term_id, EXAMS)
+
+    term = store.open_term(term_id)
+    assert term["pmf"].equals(pmf_df) and term["nrf"].equals(nrf_df)
+    assert term["index"].course_codes.tolist() == index.course_codes.tolist()
+    assert (term["index"].course_sizes() == index.course_sizes()).all()
+    assert term["holidays"] == [date(2025, 5, 1), date(2025, 5, 12)]
+    assert term["groups"] == groups
+    assert term["latest_version"] == version_id
+
+def test_reopened_store_keeps_versions(tmp_path):
+    path = str(tmp_path / "projects.sqlite3")
+    first = ProjectStore(path)
+    version_id = first.save_version(first.term_id("2025-26", "PG", "I"), EXAMS)
+    first.close()
+    second = ProjectStore(path)
+    assert second.load_version(version_id) == sorted(EXAMS, key=lambda e: (e[1], e[2], e[0]))
+    second.close()
+
+def test_diff_versions(store):
+    term_id = store.term_id("2025-26", "UG", "I")
+    before = store.save_version(term_id, EXAMS)
+    after = store.save_version(term_id, [EXAMS[0], ("UAAD-102", datetime(2025, 5, 9), "09:00 - 10:30"),
+                                         ("UAAD-104", datetime(2025, 5, 9), "13:00 - 14:30")])
+    diff = store.diff_versions(before, after)
+    assert dict(zip(diff['Paper Code'], diff['Change'])) == {"UAAD-102": "Moved", "UAAD-103": "Removed",
+                                                            "UAAD-104": "Added"}
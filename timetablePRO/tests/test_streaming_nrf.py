@@ -0,0 +1,59 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import synthetic_nrf, synthetic_pmf
+from engine import EnrollmentIndex, build_enrollment_index, build_enrollment_index_from_chunks
+from ingest import iter_nrf_chunks, load_nrf_index
+
+
+@pytest.fixture(scope="module")
+def roll():
+    # a small roll whose first student comes back on the last row, in a later chunk, with another programme
+    nrf = synthetic_nrf(synthetic_pmf(programmes=3, papers_per_semester=4, seed=5), students=61, code_columns=4,
+                        seed=5)
+    repeat = nrf.iloc[[0]].assign(**{'Programme Name': "U-MOVED"})
+    repeat.iloc[0, repeat.columns.get_loc('Paper 1 Code')] = None
+    return pd.concat([nrf, repeat], ignore_index=True)
+
+def encode(nrf, filename):
+    buffer = io.BytesIO()
+    if filename.endswith(".csv"):
+        nrf.to_csv(buffer, index=False)
+    else:
+        nrf.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+def assert_same_index(streamed, full):
+    assert streamed.reg_nos.tolist() == full.reg_nos.tolist()
+    assert streamed.course_codes.tolist() == full.course_codes.tolist()
+    for name in EnrollmentIndex.ARRAYS:
+        assert np.array_equal(getattr(streamed, name), getattr(full, name)), name
+    assert streamed.semester_courses.keys() == full.semester_courses.keys()
+    for semester, courses in full.semester_courses.items():
+        assert np.array_equal(streamed.semester_courses[semester], courses)
+    assert streamed.student_groups.keys() == full.student_groups.keys()
+    for column, values in full.student_groups.items():
+        assert streamed.student_groups[column].tolist() == values.tolist()
+
+
+@pytest.mark.parametrize("filename", ["roll.csv", "roll.xlsx"])
+@pytest.mark.parametrize("chunk_rows", [7, 1000])
+def test_streamed_index_matches_the_whole_frame(roll, filename, chunk_rows):
+    data = encode(roll, filename)
+    chunks = list(iter_nrf_chunks(data, filename, chunk_rows))
+    assert [c.index[0] for c in chunks] == list(range(0, len(roll), chunk_rows))
+    streamed = build_enrollment_index_from_chunks(chunks)
+    assert_same_index(streamed, build_enrollment_index(roll))
+    first = streamed.reg_nos.tolist().index(roll['Regd. No.'][0])
+    # the later row's programme wins, and its papers are added to the first row's
+    assert streamed.student_groups['Programme Name'][first] == "U-MOVED"
+    assert set(streamed.course_codes_of(first)) == set(roll.iloc[0, 4:].dropna())
+
+def test_blank_sheet_rows_are_skipped(roll):
+    blank = pd.DataFrame([[None] * len(roll.columns)], columns=roll.columns)
+    data = encode(pd.concat([roll.iloc[:10], blank, roll.iloc[10:]], ignore_index=True), "roll.xlsx")
+    streamed, _ = load_nrf_index(data, "roll.xlsx", chunk_rows=7)
+    assert_same_index(streamed, build_enrollment_index(roll))
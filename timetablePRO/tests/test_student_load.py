@@ -0,0 +1,83 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import synthetic_nrf, synthetic_pmf
+from engine import (LOAD_METRIC_COLUMNS, build_enrollment_index, get_code_columns, student_load_metrics,
+                    student_load_summary, worst_student_loads)
+
+SLOTS = ["09:00 - 10:30", "13:00 - 14:30", "16:00 - 17:30"]
+
+
+def brute_force_loads(nrf, exam_list):
+    # each student's metrics from their own row of papers and the de-duplicated exam list
+    sittings = {}
+    for code, exam_date, slot in dict.fromkeys((c.strip(), d, s) for c, d, s in exam_list):
+        sittings.setdefault(code, []).append(exam_date.toordinal())
+    loads = {}
+    for _, row in nrf.iterrows():
+        codes = {str(c).strip() for c in row[get_code_columns(nrf)] if pd.notna(c)}
+        per_day = Counter(day for code in codes for day in sittings.get(code, ()))
+        if not per_day:
+            continue
+        days = sorted(per_day)
+        gaps = [b - a for a, b in zip(days, days[1:])]
+        streak = longest = 1
+        for gap in gaps:
+            streak = streak + 1 if gap == 1 else 1
+            longest = max(longest, streak)
+        loads[row['Regd. No.']] = [sum(per_day.values()), len(days), max(per_day.values()),
+                                   sum(n > 1 for n in per_day.values()), gaps.count(1),
+                                   min(gaps) if gaps else np.nan, longest]
+    return loads
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_metrics_match_a_per_student_recount(seed):
+    pmf = synthetic_pmf(programmes=4, papers_per_semester=5, seed=seed)
+    nrf = synthetic_nrf(pmf, students=250, code_columns=5, seed=seed)
+    index = build_enrollment_index(nrf)
+    rng = random.Random(seed)
+    # a dense window with some repeated entries, so students get multi-exam days, streaks and gaps
+    exam_list = [(code, datetime(2025, 5, 1) + timedelta(days=rng.randrange(12)), rng.choice(SLOTS))
+                 for code in index.course_codes[rng.sample(range(index.n_courses), index.n_courses * 2 // 3)]]
+    exam_list += exam_list[:5] + [("NOBODY-1", datetime(2025, 5, 3), SLOTS[0])]
+    metrics = student_load_metrics(index, exam_list)
+    expected = brute_force_loads(nrf, exam_list)
+    assert sorted(metrics['Regd. No.']) == sorted(expected)
+    actual = {reg_no: values for reg_no, values in
+              zip(metrics['Regd. No.'], metrics[LOAD_METRIC_COLUMNS].to_numpy(dtype=float).tolist())}
+    for reg_no, values in expected.items():
+        np.testing.assert_array_equal(actual[reg_no], np.array(values, dtype=float), err_msg=reg_no)
+    # groups come from the NRF's own columns
+    programmes = dict(zip(nrf['Regd. No.'], nrf['Programme Name']))
+    assert all(programmes[r] == p for r, p in zip(metrics['Regd. No.'], metrics['Programme Name']))
+
+
+def test_programme_falls_back_to_the_pmf_and_summaries_count_students():
+    nrf = pd.DataFrame({'Regd. No.': ["R1", "R2", "R3"], 'Paper 1 Code': ["ENG-1", "ENG-1", "PHY-1"],
+                        'Paper 2 Code': ["HIS-1", "PHY-1", "MAT-1"], 'Paper 3 Code': ["PHY-1", None, None]})
+    pmf = pd.DataFrame({'Paper Code': ["ENG-1", "HIS-1", "PHY-1", "MAT-1"],
+                        'Programme Name': ["BA", "BA", "BSc", "BSc"]})
+    index = build_enrollment_index(nrf)
+    friday, monday = datetime(2025, 5, 2), datetime(2025, 5, 5)
+    exam_list = [("ENG-1", friday, SLOTS[0]), ("HIS-1", friday, SLOTS[1]), ("PHY-1", monday, SLOTS[0]),
+                 ("MAT-1", monday + timedelta(days=1), SLOTS[0])]
+    metrics = student_load_metrics(index, exam_list, pmf_df=pmf).set_index('Regd. No.')
+    assert metrics['Programme Name'].to_dict() == {"R1": "BA", "R2": "BA", "R3": "BSc"}
+    assert metrics['Semester'].unique().tolist() == ["Unknown"]
+    # Friday to Monday is a three-day gap, Monday to Tuesday back to back
+    assert metrics.loc["R1", ['Exams', 'Max Exams Per Day', 'Multi-Exam Days', 'Min Gap Days']].tolist() == [3, 2, 1, 3]
+    assert metrics.loc["R3", ['Back-to-Back Days', 'Longest Streak']].tolist() == [1, 2]
+
+    summary = student_load_summary(metrics.reset_index()).set_index('Programme Name')
+    assert summary['Students'].to_dict() == {"BA": 2, "BSc": 1}
+    assert summary.loc["BA", 'Students With Multi-Exam Days'] == 1
+    assert summary.loc["BSc", 'Back-to-Back Share'] == 1.0
+    worst = worst_student_loads(metrics.reset_index(), n=1)
+    assert worst['Regd. No.'].tolist() == ["R1", "R3"]
+    assert student_load_metrics(index, [("NOBODY-1", friday, SLOTS[0])]).empty
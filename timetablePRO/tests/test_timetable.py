@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from engine import build_programme_timetables, build_timetable
+
+COLUMNS = ['Date', 'Time Slot', 'Paper Code', 'Paper Title', 'Programs']
+MORNING, AFTERNOON = "09:00 - 10:30", "13:00 - 14:30"
+
+# a paper shared by two programmes, a code listed twice for one programme, a padded code and a row without a
+# programme
+PMF = pd.DataFrame({
+    'Paper Code': ["ENG-101", "ENG-101", "HIS-201", " MAT-101", "HIS-201", "GEN-001"],
+    'Paper Title': ["English", "English (BSc)", "History", "Maths", "History again", "General"],
+    'Programme Name': ["BA", "BSc", "BA", "BSc", "BA", None],
+})
+EXAMS = [("MAT-101", datetime(2025, 5, 6), AFTERNOON), ("HIS-201", datetime(2025, 5, 5), MORNING),
+         ("ENG-101", datetime(2025, 5, 6), MORNING), ("XYZ-999", datetime(2025, 5, 6), AFTERNOON),
+         ("GEN-001", datetime(2025, 5, 5), MORNING)]
+
+
+def scan_timetable(exam_dates, pmf_df, programme=None):
+    # the per-exam PMF scan build_timetable replaced
+    if programme:
+        pmf_df = pmf_df[pmf_df['Programme Name'] == programme]
+    entries = []
+    for course, exam_date, slot in exam_dates:
+        match = pmf_df[pmf_df['Paper Code'].astype(str).str.strip() == course.strip()]
+        if match.empty:
+            entries.append((exam_date, slot, course, "Unknown Title", "Unknown Programme"))
+        else:
+            entries.append((exam_date, slot, course, match.iloc[0]['Paper Title'], match.iloc[0]['Programme Name']))
+    entries.sort(key=lambda entry: (entry[0], entry[1]))
+    rows, last_label = [], None
+    for exam_date, *rest in entries:
+        if exam_date.strftime('%d/%m/%Y') != last_label:
+            last_label = exam_date.strftime('%d/%m/%Y')
+            rows.append([last_label, "", "", "", ""])
+        rows.append([""] + rest)
+    return pd.DataFrame(rows, columns=COLUMNS), pd.DataFrame(entries, columns=COLUMNS)
+
+def assert_same_frames(frames, expected):
+    for df, expected_df in zip(frames, expected):
+        pd.testing.assert_frame_equal(df.reset_index(drop=True), expected_df, check_dtype=False)
+
+
+@pytest.mark.parametrize("programme", [None, "BA", "BSc"])
+def test_timetable_matches_a_per_exam_scan(programme):
+    assert_same_frames(build_timetable(EXAMS, PMF, programme), scan_timetable(EXAMS, PMF, programme))
+
+def test_timetable_rows():
+    display_df, original_df = build_timetable(EXAMS, PMF)
+    assert display_df['Date'].tolist() == ["05/05/2025", "", "", "06/05/2025", "", "", ""]
+    assert original_df[['Paper Code', 'Paper Title']].values.tolist() == [
+        ["HIS-201", "History"], ["GEN-001", "General"], ["ENG-101", "English"], ["MAT-101", "Maths"],
+        ["XYZ-999", "Unknown Title"]]
+    assert build_timetable(EXAMS, PMF, "MA") == (None, None)
+
+def test_programme_timetables_match_one_at_a_time():
+    timetables = build_programme_timetables(EXAMS, PMF)
+    assert list(timetables) == ["BA", "BSc"]
+    for programme, frames in timetables.items():
+        assert_same_frames(frames, scan_timetable(EXAMS, PMF, programme))
+    # a paper shared by both programmes is titled from each programme's own row
+    assert timetables["BSc"][1].set_index('Paper Code').loc["ENG-101", 'Paper Title'] == "English (BSc)"
@@ -2,12 +2,23 @@ import streamlit as st
 st.set_page_config(page_title="TimeTable PRO", layout="wide")
 from st_on_hover_tabs import on_hover_tabs
 import pandas as pd
-import re
 from datetime import datetime, timedelta
-from collections import defaultdict, Counter
-import random
 import io
 from copy import deepcopy
+from engine import (DEFAULT_SLOT, MANDATORY_GROUP, SLOT_PRESETS, SPECIAL_SOLO, build_enrollment_index, find_clashes, clashes_to_frame,
+                    papers_per_day_bounds, resolve_conflicts, optimize_schedule, flatten_schedule_to_list,
+                    idm_courses_from_pmf, filter_pmf_by_degree, derived_semesters,
+                    select_semester_papers, schedule_exams, build_timetable, build_programme_timetables,
+                    LOAD_METRIC_COLUMNS, student_load_metrics, student_load_summary, metric_distribution,
+                    worst_student_loads, DEGREE_TYPES, term_runs, schedule_term_jointly, run_exam_list,
+                    clash_delta, SEMESTER_RULES, compile_semester_rules, hash_bytes, semester_rules_from_frame)
+from export import EXPORT_FORMATS, export_bundle
+from business_calendar import WEEKDAY_NAMES
+from ingest import load_holidays, load_pmf, load_nrf, load_nrf_index, read_upload
+from jobs import JobRegistry
+from profiling import Profiler, set_active
+from seating import UNSEATED, allocate_seats, export_seating
+from store import ProjectStore, index_digest
 
 
 
@@ -40,286 +51,186 @@ if 'selected_semester' not in st.session_state:
     st.session_state.selected_semester = None
 if 'holiday_dates' not in st.session_state:
     st.session_state.holiday_dates = []
+if 'weekends' not in st.session_state:
+    # weekday numbers, 0 = Monday
+    st.session_state.weekends = [6]
+if 'enrollment_index' not in st.session_state:
+    st.session_state.enrollment_index = None
+if 'nrf_hash' not in st.session_state:
+    st.session_state.nrf_hash = None
+if 'pmf_hash' not in st.session_state:
+    st.session_state.pmf_hash = None
+if 'last_profile' not in st.session_state:
+    st.session_state.last_profile = None
+if 'student_load' not in st.session_state:
+    st.session_state.student_load = None
+if 'student_load_baseline' not in st.session_state:
+    st.session_state.student_load_baseline = None
+if 'jobs' not in st.session_state:
+    # kind -> id of this session's latest background job of that kind
+    st.session_state.jobs = {}
+if 'announced_jobs' not in st.session_state:
+    st.session_state.announced_jobs = set()
+if 'exam_slots' not in st.session_state:
+    st.session_state.exam_slots = [{"Time Slot": DEFAULT_SLOT, "Seats": 0}]
+
+# Profiling is switched from the sidebar panel at the bottom of the page; the toggle's state from
+# the previous interaction decides whether this run is instrumented
+def new_profiler():
+    return Profiler(trace_memory=st.session_state.get("profile_memory", False)) if st.session_state.get("profile_runs", False) else None
+
+profiler = new_profiler()
+set_active(profiler)
+# profiles of background jobs that finished during this rerun, shown in place of the rerun's own
+job_profiles = []
 
 # Utility Functions
-SEM_MAPPING = {
-    '1': "I", '2': "II", '3': "III", '4': "IV",
-    '5': "V", '6': "VI", '7': "VII", '8': "VIII"
-}
-
-def extract_semester(paper_code):
-    code = str(paper_code).strip().upper()
-    if code.startswith("BPAM"):
-        match = re.search(r'BPAM-?(\d+)', code)
-        if match:
-            num_part = match.group(1)
-            if len(num_part) >= 3:
-                prefix = num_part[:3]
-                if prefix.startswith("20"): return "II"
-                elif prefix.startswith("40"): return "IV"
-                elif prefix.startswith("60"): return "VI"
-                elif prefix.startswith("80"): return "VIII"
-            elif len(num_part) >= 2:
-                prefix = num_part[:2]
-                if prefix == "20": return "II"
-                elif prefix == "40": return "IV"
-                elif prefix == "60": return "VI"
-                elif prefix == "80": return "VIII"
-        return "I"
-    else:
-        numeric_parts = re.findall(r'\d+', code)
-        for part in numeric_parts:
-            if '30' in part: return "IV"
-            elif '20' in part: return "II"
-        matches = re.findall(r'\d{3}', code)
-        if matches:
-            digits = matches[-1]
-            for ch in digits:
-                if ch in SEM_MAPPING: return SEM_MAPPING[ch]
-        for ch in code:
-            if ch in SEM_MAPPING: return SEM_MAPPING[ch]
-    return None
+# PMF/NRF derivations are memoized on the upload fingerprints so widget reruns skip the pandas work
+MEMO_ENTRIES = 32
 
-def download_csv(df, filename):
-    csv = df.to_csv(index=False).encode('utf-8')
-    st.download_button("Download CSV", data=csv, file_name=filename, mime="text/csv")
+# rules_hash identifies an uploaded semester rule table, None the built-in SEMESTER_RULES
+@st.cache_data(max_entries=MEMO_ENTRIES, show_spinner=False)
+def degree_papers(pmf_hash, rules_hash, degree_type, _pmf_df, _rules):
+    df = filter_pmf_by_degree(_pmf_df, degree_type, _rules)
+    return df, derived_semesters(df)
 
-def flatten_schedule_to_list(schedule_dict):
-    results = []
-    for date_str, slot_dict in schedule_dict.items():
-        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-        for slot, courses in slot_dict.items():
-            for c in courses:
-                results.append((c, date_obj, slot))
-    results.sort(key=lambda x: (x[1], x[2]))
-    return results
-
-def find_valid_date_for_UELS(start_date, end_date, holidays, weekends, existing_schedule):
-    current_date = start_date
-    while current_date <= end_date:
-        date_str = current_date.strftime("%Y-%m-%d")
-        if (current_date.weekday() not in weekends and 
-            current_date not in holidays and 
-            date_str not in existing_schedule):
-            return current_date
-        current_date += timedelta(days=1)
-    return start_date
-
-def auto_schedule_exams_by_program_gap(courses, pmf_df, start_date, end_date, holidays, weekends, semester):
-    courses = list(dict.fromkeys(courses))
-    fixed_slot = "09:00 - 10:30"
-    valid_days = [d for d in (start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1))
-                  if d.weekday() not in weekends and d not in holidays]
-    if not valid_days:
-        return None
-    if semester == "II":
-        min_papers, max_papers = 4, 7
-    elif semester == "IV":
-        min_papers, max_papers = 5, 20
-    else:
-        min_papers, max_papers = 3, 8
-    schedule = defaultdict(lambda: defaultdict(list))
-    last_scheduled_date = None
-    while courses:
-        if last_scheduled_date is None:
-            min_date = start_date
-        else:
-            min_date = last_scheduled_date + timedelta(days=2)
-        possible_days = [day for day in valid_days if min_date <= day <= end_date]
-        if not possible_days:
-            return None
-        chosen_day = min(possible_days)
-        num_papers_today = min(random.randint(min_papers, max_papers), len(courses))
-        papers_to_schedule = courses[:num_papers_today]
-        schedule[chosen_day.strftime("%Y-%m-%d")][fixed_slot] = papers_to_schedule
-        courses = courses[num_papers_today:]
-        last_scheduled_date = chosen_day
-    return schedule
-
-def auto_schedule_exams_by_program_dense(courses, start_date, end_date, holidays, weekends):
-    fixed_slot = "09:00 - 10:30"
-    valid_days = [d for d in (start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1))
-                  if d.weekday() not in weekends and d not in holidays]
-    if not valid_days:
+@st.cache_data(max_entries=MEMO_ENTRIES, show_spinner=False)
+def semester_papers(pmf_hash, rules_hash, nrf_hash, degree_type, semester, _pmf_df, _rules, _index):
+    df, _ = degree_papers(pmf_hash, rules_hash, degree_type, _pmf_df, _rules)
+    return select_semester_papers(df, semester, _index)
+
+@st.cache_data(max_entries=MEMO_ENTRIES, show_spinner=False)
+def joint_term_runs(pmf_hash, rules_hash, nrf_hash, degrees, _pmf_df, _rules, _index):
+    return term_runs(_pmf_df, _index, degrees, rules=_rules)
+
+def semester_rule_table(uploaded):
+    # (rules, rules_hash) for an uploaded rule table, falling back to the built-in rules when it cannot be used
+    if uploaded is None:
+        return SEMESTER_RULES, None
+    data = uploaded.getvalue()
+    try:
+        rules = semester_rules_from_frame(read_upload(data, uploaded.name))
+        compile_semester_rules(rules)
+    except Exception as e:
+        st.error(f"Error reading semester rules, using the built-in rules: {e}")
+        return SEMESTER_RULES, None
+    st.caption(f"{len(rules)} rules from {uploaded.name}, tried in order; the first match decides.")
+    return rules, hash_bytes(data)
+
+def exam_slot_config():
+    # (slot labels in sitting order, {slot: seats}); 0 seats means unlimited
+    slots = [row["Time Slot"] for row in st.session_state.exam_slots]
+    return slots, {row["Time Slot"]: int(row["Seats"]) for row in st.session_state.exam_slots if row["Seats"]}
+
+def slot_options(exam_dates=()):
+    # configured slots first, then any other slot already used by the timetable
+    slots, _ = exam_slot_config()
+    return list(dict.fromkeys(slots + [slot for _, _, slot in exam_dates]))
+
+@st.cache_resource(show_spinner=False)
+def get_project_store():
+    return ProjectStore()
+
+@st.cache_resource(show_spinner=False)
+def get_job_registry():
+    return JobRegistry()
+
+def start_job(kind, name, func, *args, **kwargs):
+    # long operations run on the job registry's threads, so widget reruns neither block on nor discard them;
+    # a new job of the same kind replaces the session's previous one
+    registry = get_job_registry()
+    previous = registry.get(st.session_state.jobs.get(kind))
+    if previous is not None and not previous.is_finished:
+        previous.cancel()
+    # a job gets a profiler of its own: the rerun's has moved on by the time the job records its spans
+    st.session_state.jobs[kind] = registry.submit(name, func, *args, profiler=new_profiler(), **kwargs).id
+    st.info(f"{name} started in the background. Progress is shown in the sidebar.")
+
+def finished_job(kind):
+    # the result of the session's finished job of this kind, handed out once; None while it runs, and
+    # after reporting a failure or cancellation
+    registry = get_job_registry()
+    job = registry.get(st.session_state.jobs.get(kind))
+    if job is None or not job.is_finished:
         return None
-    schedule = defaultdict(lambda: defaultdict(list))
-    last_scheduled_date = None
-    while courses:
-        if last_scheduled_date is None:
-            min_date = start_date
-        else:
-            min_date = last_scheduled_date + timedelta(days=2)
-        possible_days = [day for day in valid_days if min_date <= day <= end_date]
-        if not possible_days:
-            return None
-        chosen_day = min(possible_days)
-        num_papers_today = min(5, len(courses))
-        papers_to_schedule = courses[:num_papers_today]
-        schedule[chosen_day.strftime("%Y-%m-%d")][fixed_slot] = papers_to_schedule
-        courses = courses[num_papers_today:]
-        last_scheduled_date = chosen_day
-    return schedule
-
-def auto_schedule_exams_multi_slot(courses, start_date, end_date, holidays, weekends):
-    time_slots = ["09:00 - 10:30"]
-    valid_days = [d for d in (start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1))
-                  if d.weekday() not in weekends and d not in holidays]
-    if not valid_days:
+    del st.session_state.jobs[kind]
+    registry.forget(job.id)
+    if job.profiler is not None and job.profiler.spans:
+        job_profiles.append(job.profiler)
+    if job.status == "failed":
+        st.error(f"{job.name} failed: {job.error.splitlines()[0]}")
+        with st.expander("Error details"):
+            st.code(job.error)
         return None
-    schedule = defaultdict(lambda: defaultdict(list))
-    course_index = 0
-    total_slots = len(valid_days) * len(time_slots)
-    if len(courses) > total_slots:
+    if job.status == "cancelled":
+        st.warning(f"{job.name} was cancelled.")
         return None
-    for day in valid_days:
-        date_str = day.strftime("%Y-%m-%d")
-        for slot in time_slots:
-            if course_index < len(courses):
-                schedule[date_str][slot].append(courses[course_index])
-                course_index += 1
+    return job.result
+
+# background job bodies: plain functions of their inputs, never touching st.session_state
+def schedule_job(mode, n_starts, *args, **kwargs):
+    schedule, details = schedule_exams(*args, mode=mode, n_starts=n_starts, **kwargs)
+    return mode, n_starts, schedule, details
+
+def joint_schedule_job(runs, index, *args, **kwargs):
+    schedule, details = schedule_term_jointly(runs, index, *args, **kwargs)
+    exam_list = flatten_schedule_to_list(schedule) if schedule is not None else None
+    n_clashes = len(find_clashes(index, exam_list)) if exam_list is not None else 0
+    return runs, exam_list, details, n_clashes
+
+def export_job(*args, **kwargs):
+    bundle = io.BytesIO()
+    exported = export_bundle(bundle, *args, **kwargs)
+    return exported, bundle.getvalue()
+
+def seating_job(index, exam_list, halls_df, interleave):
+    seats_df, seating_summary = allocate_seats(index, exam_list, halls_df, interleave=interleave)
+    seating_zip = io.BytesIO()
+    export_seating(seating_zip, seats_df, seating_summary)
+    return len(seats_df), seating_summary, seating_zip.getvalue()
+
+def replace_exam_dates(exam_list):
+    # the generated timetable and its editor were built from the previous dates; the editor's live clash
+    # check and Save Edited Dates compare against them, so they go until the timetable is regenerated
+    st.session_state.exam_date_list = list(exam_list)
+    st.session_state.timetable_exam_dates = list(exam_list)
+    st.session_state.generated_timetable = None
+    st.session_state.original_timetable = None
+
+def get_enrollment_index():
+    if st.session_state.enrollment_index is None and st.session_state.nominal_role_df is not None:
+        st.session_state.enrollment_index = build_enrollment_index(st.session_state.nominal_role_df)
+    return st.session_state.enrollment_index
+
+def edited_exam_list(edited_df, valid_slots):
+    # (exam list, row errors) from the timetable editor's rows
+    errors = []
+    updated_exams = []
+    for idx, row in edited_df.iterrows():
+        try:
+            if isinstance(row['Date'], str):
+                dt_obj = datetime.strptime(row['Date'], '%d/%m/%Y')
             else:
-                break
-        if course_index >= len(courses):
-            break
-    return schedule
-
-def check_full_schedule_conflict(nominal_df, exam_list):
-    conflicts = []
-    schedule_map = defaultdict(lambda: defaultdict(list))
-    for course, dt_obj, slot in exam_list:
-        date_str = dt_obj.strftime("%Y-%m-%d")
-        schedule_map[date_str][slot].append(course.strip())
-    
-    student_papers = defaultdict(list)
-    code_columns = [col for col in nominal_df.columns if "Code" in col and not col.startswith(("Programme", "Sl"))]
-    reg_no_col = "Regd. No." if "Regd. No." in nominal_df.columns else None
-    
-    for idx, row in nominal_df.iterrows():
-        reg_no = row.get(reg_no_col, f"Student_{idx}")
-        student_courses = set()
-        for col in code_columns:
-            if pd.notna(row[col]):
-                code = str(row[col]).strip()
-                if code:
-                    student_courses.add(code)
-        student_papers[reg_no] = list(student_courses)
-    
-    for reg_no, enrolled_courses in student_papers.items():
-        student_schedule = defaultdict(list)
-        for date_str, slot_dict in schedule_map.items():
-            for slot, courses in slot_dict.items():
-                scheduled_courses = [course for course in courses if course in enrolled_courses]
-                if scheduled_courses:
-                    student_schedule[(date_str, slot)].extend(scheduled_courses)
-        
-        for (date_str, slot), courses in student_schedule.items():
-            if len(courses) > 1:
-                conflicts.append(
-                    f"Student {reg_no} has multiple exams on {date_str} in slot '{slot}': {', '.join(courses)}"
-                )
-    
-    return conflicts
-
-def resolve_conflicts(exam_list, nominal_df, holidays, weekends):
-    unique_exam_list = []
-    seen = set()
-    for course, dt, slot in exam_list:
-        key = (course.strip(), dt.date(), slot)
-        if key not in seen:
-            seen.add(key)
-            unique_exam_list.append((course, dt, slot))
-    exam_list = unique_exam_list
-    conflicts = check_full_schedule_conflict(nominal_df, exam_list)
-    resolution_log = []
-    if not conflicts:
-        return exam_list, resolution_log
-    valid_days = []
-    current_date = min(dt for _, dt, _ in exam_list).date() if exam_list else datetime.today().date()
-    end_date = (max(dt for _, dt, _ in exam_list).date() + timedelta(days=14)) if exam_list else current_date + timedelta(days=14)
-    while current_date <= end_date:
-        if current_date.weekday() not in weekends and current_date not in holidays:
-            valid_days.append(current_date)
-        current_date += timedelta(days=1)
-    student_courses = defaultdict(set)
-    course_students = defaultdict(set)
-    code_columns = [col for col in nominal_df.columns if "Code" in col and not col.startswith(("Programme", "Sl"))]
-    reg_no_col = "Regd. No." if "Regd. No." in nominal_df.columns else None
-    for idx, row in nominal_df.iterrows():
-        reg_no = row.get(reg_no_col, f"Student_{idx}")
-        for col in code_columns:
-            if pd.notna(row[col]):
-                code = str(row[col]).strip()
-                if code:
-                    student_courses[reg_no].add(code)
-                    course_students[code].add(reg_no)
-    schedule_map = defaultdict(lambda: defaultdict(list))
-    for course, dt, slot in exam_list:
-        date_str = dt.strftime("%Y-%m-%d")
-        schedule_map[date_str][slot].append(course)
-    pmf_df = st.session_state.paper_master_df
-    idm_courses = set(pmf_df[pmf_df['Is IDM']]['Paper Code'].astype(str).str.strip()) if pmf_df is not None else set()
-    for conflict in conflicts:
-        if "Student" not in conflict:
-            continue
-        reg_no = conflict.split(" ")[1]
-        date_str = conflict.split("on")[1].split("in")[0].strip()
-        slot = conflict.split("slot '")[1].split("':")[0]
-        conflicting_courses = conflict.split(": ")[1].split(", ")
-        course_enrollment_counts = {course: len(course_students.get(course, set())) for course in conflicting_courses}
-        idm_in_conflict = [c for c in conflicting_courses if c in idm_courses]
-        course_to_move = min(
-            conflicting_courses,
-            key=lambda c: (0 if c in idm_in_conflict else 1, course_enrollment_counts[c])
-        )
-        affected_students = course_students.get(course_to_move, set())
-        original_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        for new_date in valid_days:
-            if new_date == original_date:
-                continue
-            new_date_str = new_date.strftime("%Y-%m-%d")
-            safe_move = True
-            for student in affected_students:
-                other_courses = student_courses[student] - {course_to_move}
-                scheduled_courses = schedule_map.get(new_date_str, {}).get(slot, [])
-                if any(c in scheduled_courses for c in other_courses):
-                    safe_move = False
-                    break
-            if safe_move:
-                if course_to_move in schedule_map.get(date_str, {}).get(slot, []):
-                    schedule_map[date_str][slot].remove(course_to_move)
-                    if not schedule_map[date_str][slot]:
-                        del schedule_map[date_str][slot]
-                    if not schedule_map[date_str]:
-                        del schedule_map[date_str]
-                    schedule_map[new_date_str][slot].append(course_to_move)
-                    resolution_log.append(
-                        f"Moved {course_to_move} for student {reg_no} from {date_str} to {new_date_str} in slot {slot}"
-                    )
-                else:
-                    resolution_log.append(
-                        f"Course {course_to_move} not found in schedule for {date_str} slot {slot}. Skipping removal."
-                    )
-                break
-        else:
-            resolution_log.append(f"Could not resolve conflict for {course_to_move} on {date_str} in slot {slot}")
-    resolved_exam_list = []
-    for date_str, slots in schedule_map.items():
-        dt = datetime.strptime(date_str, "%Y-%m-%d")
-        for slot, courses in slots.items():
-            for course in courses:
-                resolved_exam_list.append((course, dt, slot))
-    resolved_exam_list.sort(key=lambda x: (x[1], x[2]))
-    return resolved_exam_list, resolution_log
-
-def assign_combination_groups_to_schedule(schedule, groups):
-    fixed_slot = "09:00 - 10:30"
-    for group in groups:
-        date_str = group["date"].strftime("%Y-%m-%d")
-        if date_str not in schedule:
-            schedule[date_str] = {fixed_slot: []}
-        for c in group["courses"]:
-            schedule[date_str][fixed_slot].append(c)
-    return schedule
+                dt_obj = row['Date']
+            
+            if row['Time Slot'] not in valid_slots:
+                raise ValueError(f"Invalid time slot: {row['Time Slot']}")
+            if pd.isna(row['Paper Code']) or pd.isna(dt_obj):
+                raise ValueError("Paper Code and Exam Date are required")
+            
+            updated_exams.append((
+                str(row['Paper Code']),
+                dt_obj,
+                row['Time Slot']
+            ))
+            
+        except Exception as e:
+            errors.append(f"Row {idx+1} ({row['Paper Code']}): {str(e)}")
+    return updated_exams, errors
+
+def download_csv(df, filename):
+    csv = df.to_csv(index=False).encode('utf-8')
+    st.download_button("Download CSV", data=csv, file_name=filename, mime="text/csv")
 
 # Main Header & File Uploads
 st.markdown(
@@ -366,21 +277,33 @@ with col_upload1:
     uploaded_pmf = st.file_uploader("Load Paper Master File (PMF)", type=["xlsx", "xls"], key="pmf_global")
     if uploaded_pmf is not None:
         try:
-            pmf_df = pd.read_excel(uploaded_pmf)
-            if 'CC' not in pmf_df.columns:
-                st.error("PMF must contain a 'CC' column to classify IDM/DSC courses.")
-            else:
-                pmf_df['Is IDM'] = pmf_df['CC'].str.contains('IDM', case=False, na=False)
-                pmf_df['Is DSC'] = pmf_df['CC'].str.contains('DSC', case=False, na=False)
+            pmf_df, pmf_hash = load_pmf(uploaded_pmf.getvalue(), uploaded_pmf.name)
+            if st.session_state.pmf_hash != pmf_hash:
                 st.session_state.paper_master_df = pmf_df
-                st.success("PMF loaded successfully.")
+                st.session_state.pmf_hash = pmf_hash
+            st.success("PMF loaded successfully.")
+        except ValueError as e:
+            st.error(str(e))
         except Exception as e:
             st.error(f"Error loading PMF: {e}")
 with col_upload2:
-    uploaded_nrf = st.file_uploader("Load Nominal Role File (NRF)", type=["xlsx", "xls"], key="nrf_global")
+    uploaded_nrf = st.file_uploader("Load Nominal Role File (NRF)", type=["xlsx", "xls", "csv"], key="nrf_global")
+    stream_nrf = st.checkbox("Stream NRF (keep only the enrollment index, for very large rolls)", key="stream_nrf")
     if uploaded_nrf is not None:
         try:
-            st.session_state.nominal_role_df = pd.read_excel(uploaded_nrf)
+            if stream_nrf:
+                index, nrf_hash = load_nrf_index(uploaded_nrf.getvalue(), uploaded_nrf.name)
+                nrf_hash = f"{nrf_hash}-stream"
+                if st.session_state.nrf_hash != nrf_hash:
+                    st.session_state.nominal_role_df = None
+                    st.session_state.enrollment_index = index
+                    st.session_state.nrf_hash = nrf_hash
+            else:
+                nominal_df, nrf_hash = load_nrf(uploaded_nrf.getvalue(), uploaded_nrf.name)
+                if st.session_state.nrf_hash != nrf_hash:
+                    st.session_state.nominal_role_df = nominal_df
+                    st.session_state.enrollment_index = build_enrollment_index(nominal_df)
+                    st.session_state.nrf_hash = nrf_hash
             st.success("NRF loaded successfully.")
         except Exception as e:
             st.error(f"Error loading NRF: {e}")
@@ -393,71 +316,145 @@ with st.sidebar:
         default_choice=0
     )
 
+# Saved Projects
+# Runs before the modules so opening a term can still set their widgets for this run
+with st.sidebar:
+    with st.expander("Saved Projects"):
+        project_store = get_project_store()
+        term_key = (st.session_state.get("academic_year"), st.session_state.selected_degree,
+                    st.session_state.selected_semester)
+        if all(term_key):
+            st.caption(f"Current term: {' / '.join(term_key)}")
+            if st.button("Save Term", key="save_term"):
+                if st.session_state.paper_master_df is None:
+                    st.error("Please upload the Paper Master File (PMF) first.")
+                else:
+                    term_id = project_store.term_id(*term_key)
+                    project_store.save_table("pmf", st.session_state.pmf_hash, st.session_state.paper_master_df)
+                    if st.session_state.nominal_role_df is not None:
+                        project_store.save_table("nrf", st.session_state.nrf_hash, st.session_state.nominal_role_df)
+                    if get_enrollment_index() is not None:
+                        project_store.save_table("nrf-index", index_digest(st.session_state.nrf_hash), get_enrollment_index())
+                    project_store.save_term(term_id, st.session_state.pmf_hash, st.session_state.nrf_hash,
+                                            st.session_state.holiday_dates, st.session_state.combination_groups)
+                    st.success("Term saved.")
+            version_label = st.text_input("Version Label", key="version_label")
+            if st.button("Save Schedule Version", key="save_version"):
+                exam_list = st.session_state.timetable_exam_dates or st.session_state.exam_date_list
+                if not exam_list:
+                    st.error("No scheduled exams to save.")
+                else:
+                    project_store.save_version(project_store.term_id(*term_key), exam_list, version_label)
+                    st.success("Schedule version saved.")
+        else:
+            st.caption("Pick an academic year, degree and semester in Exam Date Entry to save this term.")
+
+        saved_terms = project_store.terms()
+        if not saved_terms.empty:
+            term_keys = {term_id: key for term_id, *key in
+                         saved_terms[['id', 'Academic Year', 'Degree', 'Semester']].itertuples(index=False)}
+            chosen_term = st.selectbox("Saved Terms", list(term_keys), format_func=lambda t: " / ".join(term_keys[t]),
+                                       key="chosen_term")
+            if st.button("Open Term", key="open_term"):
+                term = project_store.open_term(chosen_term)
+                year, degree, semester = term_keys[chosen_term]
+                if term["pmf"] is not None:
+                    st.session_state.paper_master_df = term["pmf"]
+                    st.session_state.pmf_hash = term["pmf_digest"]
+                st.session_state.nominal_role_df = term["nrf"]
+                st.session_state.enrollment_index = term["index"]
+                st.session_state.nrf_hash = term["nrf_digest"]
+                st.session_state.holiday_dates = term["holidays"]
+                st.session_state.combination_groups = term["groups"]
+                st.session_state.academic_year = year
+                st.session_state.degree_type = st.session_state.selected_degree = degree
+                st.session_state.mapped_semester = st.session_state.selected_semester = semester
+                if term["latest_version"] is not None:
+                    replace_exam_dates(project_store.load_version(term["latest_version"]))
+                st.success("Term opened.")
+
+            term_versions = project_store.versions(chosen_term)
+            if not term_versions.empty:
+                version_labels = {row.id: f"{row.Label} ({row.Exams} exams)" for row in term_versions.itertuples()}
+                chosen_version = st.selectbox("Versions", list(version_labels), format_func=version_labels.get,
+                                              key="chosen_version")
+                if st.button("Load Version", key="load_version"):
+                    replace_exam_dates(project_store.load_version(chosen_version))
+                    st.success("Version loaded. Regenerate the timetable to see it.")
+                if len(version_labels) > 1:
+                    compare_with = st.selectbox("Compare With", [v for v in version_labels if v != chosen_version],
+                                                format_func=version_labels.get, key="compare_version")
+                    version_diff = project_store.diff_versions(compare_with, chosen_version)
+                    st.caption(", ".join(f"{n} {change.lower()}" for change, n in version_diff["Change"].value_counts().items())
+                               or "No differences.")
+                    st.dataframe(version_diff)
+
+# Background Jobs
+@st.fragment(run_every=1.0)
+def job_panel():
+    session_jobs = get_job_registry().jobs(set(st.session_state.jobs.values()))
+    if not session_jobs:
+        return
+    st.markdown("#### Background Jobs")
+    for job in session_jobs:
+        info = job.snapshot()
+        st.write(f"**{info['name']}**: {info['status']} ({info['seconds']:.0f} s)")
+        if job.fraction() is not None:
+            st.progress(job.fraction())
+        if info['counters']:
+            st.caption(", ".join(f"{key.replace('_', ' ')} {value:.0f}" if isinstance(value, float) else f"{key.replace('_', ' ')} {value}"
+                                 for key, value in info['counters'].items()))
+        if not job.is_finished and st.button("Cancel", key=f"cancel_job_{job.id}", disabled=job.cancel_requested):
+            job.cancel()
+    # a job that just finished reruns the whole page once so its module can pick the result up
+    newly_finished = {job.id for job in session_jobs if job.is_finished} - st.session_state.announced_jobs
+    if newly_finished:
+        st.session_state.announced_jobs |= newly_finished
+        st.rerun()
+
+with st.sidebar:
+    job_panel()
+
 # Module 1: Exam Date Entry
 if nav_tab == "Exam Date Entry":
     st.header("Exam Date Entry Module")
     if st.session_state.paper_master_df is None:
         st.error("Please upload the Paper Master File (PMF) first.")
     else:
-        # Define special course groups
-        MANDATORY_GROUP = {"UTEL-201", "UHIN-201", "USAN-201", "UENG-201"}
-        SPECIAL_SOLO = {"UELS-201"}
-        
         col1, col2, col3 = st.columns(3)
         with col1:
-            academic_year = st.selectbox("Select Academic Year", [f"{year}/{year+1}" for year in range(datetime.now().year-5, datetime.now().year+5)])
+            academic_year = st.selectbox("Select Academic Year", [f"{year}/{year+1}" for year in range(datetime.now().year-5, datetime.now().year+5)], key="academic_year")
         with col2:
-            degree_type = st.selectbox("Select Degree Type", ['UG', 'PG', 'Professional'])
+            degree_type = st.selectbox("Select Degree Type", ['UG', 'PG', 'Professional'], key="degree_type")
             st.session_state.selected_degree = degree_type
         with col3:
             paper_type = st.selectbox("Select Paper Type", ['All', 'Theory', 'Practical'])
         
-        df = st.session_state.paper_master_df.copy()
-        if degree_type == 'UG':
-            df = df[(df['Paper Code'].astype(str).str.startswith('U')) |
-                    (df['Paper Code'].astype(str).str.upper().str.startswith('BPAM'))]
-        elif degree_type == 'PG':
-            df = df[df['Paper Code'].astype(str).str.startswith('P')]
-        elif degree_type == 'Professional':
-            df = df[df['Paper Code'].astype(str).str.startswith('M')]
-        df = df[~df['Paper Code'].astype(str).str.startswith('UAWR')]
-        df['Derived Semester'] = df['Paper Code'].apply(extract_semester)
-        
-        semesters = sorted(set(df['Derived Semester'].dropna()), key=lambda s: list(SEM_MAPPING.values()).index(s) if s in SEM_MAPPING.values() else 99)
-        selected_semester = st.selectbox("Select Mapped Semester", options=semesters)
+        with st.expander("Semester Rules"):
+            rules_file = st.file_uploader("Rule Table (CSV or Excel with name, pattern and semester columns)",
+                                          type=["csv", "xlsx", "xls"], key="semester_rules_file")
+            semester_rules, rules_hash = semester_rule_table(rules_file)
+        degree_df, semesters = degree_papers(st.session_state.pmf_hash, rules_hash, degree_type,
+                                             st.session_state.paper_master_df, semester_rules)
+        selected_semester = st.selectbox("Select Mapped Semester", options=semesters, key="mapped_semester")
         st.session_state.selected_semester = selected_semester
+        with st.expander("Semester Derivation Audit"):
+            st.dataframe(degree_df['Semester Rule'].fillna("unmatched").value_counts().rename("Papers"))
+            st.dataframe(degree_df[['Paper Code', 'Derived Semester', 'Semester Rule']])
         
-        # Base filtering by derived semester
-        base_df = df[df['Derived Semester'] == selected_semester].copy()
-        
-        # Augment with NRF data if available
-        if st.session_state.nominal_role_df is not None:
-            nrf = st.session_state.nominal_role_df
-            nrf_semester_col = 'Semester' if 'Semester' in nrf.columns else None
-            enrolled_codes = set()
-            code_columns = [col for col in nrf.columns if "Code" in col and not col.startswith(("Programme", "Sl"))]
-            if nrf_semester_col:
-                nrf_filtered = nrf[nrf[nrf_semester_col] == selected_semester]
-                for col in code_columns:
-                    enrolled_codes.update(nrf_filtered[col].dropna().astype(str).str.strip())
-            else:
-                for col in code_columns:
-                    enrolled_codes.update(nrf[col].dropna().astype(str).str.strip())
-            # Include additional codes from NRF that students in this semester are enrolled in
-            additional_df = df[df['Paper Code'].astype(str).str.strip().isin(enrolled_codes) & 
-                             ~df['Paper Code'].isin(base_df['Paper Code'])]
-            df = pd.concat([base_df, additional_df]).drop_duplicates(subset=['Paper Code'])
-        else:
-            df = base_df
+        index = get_enrollment_index()
+        df = semester_papers(st.session_state.pmf_hash, rules_hash, st.session_state.nrf_hash if index is not None else None,
+                             degree_type, selected_semester, st.session_state.paper_master_df, semester_rules, index)
+        if index is None:
             st.warning("NRF not loaded. Using derived semester only, but cross-semester courses will still appear if derived correctly.")
         
-        st.session_state.filtered_pmf = df.copy()
+        st.session_state.filtered_pmf = df
         available_courses = df['Paper Code'].unique().tolist()
         auto_select = st.checkbox("Auto-Select All Courses", value=True)
         selected_courses = st.multiselect("Selected Courses", options=available_courses, default=available_courses if auto_select else [])
         st.write("Selected Courses:", selected_courses)
         
-        # Auto-create mandatory group and UELS group only for Semester II
+        # Auto-create the mandatory group only for Semester II; UELS-201 gets its own day from the scheduler
         if selected_semester == "II":
             # Mandatory group creation
             mandatory_selected = MANDATORY_GROUP.intersection(selected_courses)
@@ -469,16 +466,6 @@ if nav_tab == "Exam Date Entry":
                         "courses": list(mandatory_selected),
                         "date": datetime.combine(datetime.now().date(), datetime.min.time())
                     })
-            
-            # UELS-201 solo group creation
-            if "UELS-201" in selected_courses:
-                existing_groups = [grp["courses"] for grp in st.session_state.combination_groups]
-                if ["UELS-201"] not in existing_groups:
-                    st.session_state.combination_groups.append({
-                        "group_name": "UELS-201 Solo",
-                        "courses": ["UELS-201"],
-                        "date": datetime.combine(datetime.now().date(), datetime.min.time())
-                    })
         
         st.markdown("#### Combine Elective Courses")
         st.info("Select elective courses to be conducted on the same day (same slot).")
@@ -526,6 +513,22 @@ if nav_tab == "Exam Date Entry":
             if holiday_date not in st.session_state.holiday_dates:
                 st.session_state.holiday_dates.append(holiday_date)
                 st.success(f"Holiday {holiday_date} added.")
+        holiday_file = st.file_uploader("Import Holidays (CSV, Excel or ICS)", type=["csv", "xlsx", "xls", "ics"],
+                                        key="holiday_file")
+        if holiday_file is not None and st.button("Import Holidays", key="import_holidays"):
+            try:
+                imported = load_holidays(holiday_file.getvalue(), holiday_file.name)
+            except Exception as e:
+                st.error(f"Error reading holidays: {e}")
+            else:
+                new_holidays = [d for d in imported if d not in st.session_state.holiday_dates]
+                st.session_state.holiday_dates = sorted(st.session_state.holiday_dates + new_holidays)
+                st.success(f"Imported {len(new_holidays)} new holidays from {holiday_file.name}"
+                           + (f" ({imported[0]} to {imported[-1]})." if imported else "."))
+        weekend_names = st.multiselect("Weekend Days", WEEKDAY_NAMES,
+                                       default=[WEEKDAY_NAMES[d] for d in st.session_state.weekends],
+                                       key="weekend_days")
+        st.session_state.weekends = [WEEKDAY_NAMES.index(name) for name in weekend_names]
         if st.session_state.holiday_dates:
             st.markdown("### Current Holiday Dates")
             holiday_df = pd.DataFrame(st.session_state.holiday_dates, columns=["Holiday Date"])
@@ -535,8 +538,34 @@ if nav_tab == "Exam Date Entry":
                 st.session_state.holiday_dates = new_holidays
                 st.success("Holiday dates updated.")
         
+        st.markdown("#### Exam Slots")
+        st.caption(f"One row per sitting in a day, in order; Seats 0 means unlimited. Common slots: {', '.join(SLOT_PRESETS)}")
+        slots_df = pd.DataFrame(st.session_state.exam_slots, columns=["Time Slot", "Seats"])
+        edited_slots = st.data_editor(
+            slots_df,
+            num_rows="dynamic",
+            column_config={
+                "Time Slot": st.column_config.TextColumn("Time Slot", required=True),
+                "Seats": st.column_config.NumberColumn("Seats", min_value=0, step=50, default=0)
+            },
+            key="edit_exam_slots"
+        )
+        if st.button("Save Exam Slots", key="save_exam_slots"):
+            edited_slots = edited_slots.dropna(subset=["Time Slot"])
+            edited_slots["Time Slot"] = edited_slots["Time Slot"].str.strip()
+            edited_slots = edited_slots[edited_slots["Time Slot"] != ""].drop_duplicates(subset=["Time Slot"])
+            if edited_slots.empty:
+                st.error("Keep at least one exam slot.")
+            else:
+                st.session_state.exam_slots = [{"Time Slot": row["Time Slot"], "Seats": int(row["Seats"] or 0)}
+                                               for _, row in edited_slots.fillna({"Seats": 0}).iterrows()]
+                st.success("Exam slots updated.")
+        exam_slots, slot_seats = exam_slot_config()
+        if slot_seats and get_enrollment_index() is None:
+            st.warning("Slot seat limits are checked against NRF student counts. Upload the NRF to enforce them.")
+
         holidays = st.session_state.holiday_dates
-        weekends = {6}
+        weekends = set(st.session_state.weekends)
         grouped_courses = set(course for grp in st.session_state.combination_groups for course in grp["courses"])
         remaining_courses = [course for course in selected_courses if course not in grouped_courses]
         
@@ -545,8 +574,20 @@ if nav_tab == "Exam Date Entry":
         sched_end = st.date_input("Scheduling End Date", value=(datetime.now() + timedelta(days=15)).date(), key="sched_end")
         gap_scheduling = st.checkbox("Use Gap Scheduling (2-3 day gaps, randomized paper count)", value=True)
         dense_scheduling = st.checkbox("Use Dense Scheduling (pack exams closely)", value=False)
+        multi_start = st.checkbox("Best of N Gap Schedules (parallel seeded runs scored on NRF clashes and spread)", value=False)
+        n_starts = st.number_input("Number of Seeded Runs", min_value=2, max_value=512, value=32, key="n_starts") if multi_start else 0
+        conflict_free_scheduling = st.checkbox("Use Conflict-Free Scheduling (graph coloring on NRF enrollments, 2-day gaps)", value=False)
+        exact_scheduling = st.checkbox("Use Exact Solver (seat capacity, clashes, groups and gaps as hard constraints)", value=False)
+        if exact_scheduling:
+            exact_time_limit = st.number_input("Solver Time Limit (seconds)", min_value=1, max_value=3600, value=30, key="exact_time_limit")
+        else:
+            exact_time_limit = 30
         if gap_scheduling and dense_scheduling:
             st.warning("Both Gap and Dense Scheduling selected. Gap Scheduling will be applied.")
+        if conflict_free_scheduling and get_enrollment_index() is None:
+            st.warning("Conflict-Free Scheduling needs the Nominal Role File. Upload the NRF to enable it.")
+        if exact_scheduling and get_enrollment_index() is None:
+            st.warning("The Exact Solver needs the Nominal Role File. Upload the NRF to enable it.")
         
         if st.button("Schedule Exams", key="schedule_btn"):
             mandatory_in_selected = MANDATORY_GROUP.intersection(selected_courses)
@@ -561,32 +602,83 @@ if nav_tab == "Exam Date Entry":
                 if not remaining_courses and not st.session_state.combination_groups:
                     st.error("No courses selected to schedule.")
                 else:
-                    if selected_semester == "VI":
-                        schedule = auto_schedule_exams_multi_slot(remaining_courses, sched_start, sched_end, holidays, weekends)
+                    nrf_loaded = get_enrollment_index() is not None
+                    if exact_scheduling and nrf_loaded:
+                        mode = "exact"
+                    elif conflict_free_scheduling and nrf_loaded:
+                        mode = "coloring"
+                    elif selected_semester == "VI":
+                        mode = "multi-slot"
                     elif gap_scheduling or not dense_scheduling:
-                        schedule = auto_schedule_exams_by_program_gap(remaining_courses.copy(), df, sched_start, sched_end, holidays, weekends, selected_semester)
+                        mode = "best-of-n" if multi_start and nrf_loaded else "gap"
                     else:
-                        schedule = auto_schedule_exams_by_program_dense(remaining_courses.copy(), sched_start, sched_end, holidays, weekends)
-                    
-                    if schedule is None:
-                        st.error("Not enough valid business days to schedule all exams.")
-                    else:
-                        if st.session_state.combination_groups:
-                            schedule = assign_combination_groups_to_schedule(schedule, st.session_state.combination_groups)
-                        
-                        if "UELS-201" in selected_courses:
-                            uels_date = find_valid_date_for_UELS(sched_start, sched_end, holidays, weekends, schedule)
-                            schedule[uels_date.strftime("%Y-%m-%d")] = {"09:00 - 10:30": ["UELS-201"]}
-                        
-                        final_list = flatten_schedule_to_list(schedule)
-                        st.session_state.exam_date_list = final_list
-                        assigned_data = [{"Paper Code": c, "Exam Date": d.strftime("%Y-%m-%d"), "Time Slot": slot} for c, d, slot in final_list]
-                        st.success("Exams assigned successfully.")
-                        st.table(pd.DataFrame(assigned_data))
+                        mode = "dense"
+                    start_job("schedule", "Schedule Exams", schedule_job, mode, n_starts, list(selected_courses),
+                              sched_start, sched_end, list(holidays), weekends, selected_semester,
+                              groups=deepcopy(st.session_state.combination_groups), index=get_enrollment_index(),
+                              pmf_df=df, seat_capacity=slot_seats or None, time_limit=exact_time_limit,
+                              slots=exam_slots)
         
+        schedule_result = finished_job("schedule")
+        if schedule_result is not None:
+            mode, n_starts, schedule, details = schedule_result
+            if schedule is None and mode == "exact":
+                st.error(f"The exact solver found no feasible timetable (status: {details['status']}). "
+                         "Widen the date range, raise the seat capacity or relax the combination groups.")
+            elif schedule is None:
+                st.error("Not enough valid business days or slot seats to schedule all exams.")
+            else:
+                if mode == "exact":
+                    st.info(f"Exact solver ({details['backend']}): {details['status']}, warm start {details['warm_start']}.")
+                if mode == "best-of-n":
+                    best_run = details["runs"][0]
+                    st.info(f"Best of {n_starts} runs: seed {details['seed']} (cost {best_run['cost']:.0f}, clashes {best_run['components']['clashes']}).")
+                final_list = flatten_schedule_to_list(schedule)
+                st.session_state.exam_date_list = final_list
+                assigned_data = [{"Paper Code": c, "Exam Date": d.strftime("%Y-%m-%d"), "Time Slot": slot} for c, d, slot in final_list]
+                st.success("Exams assigned successfully.")
+                st.table(pd.DataFrame(assigned_data))
+        
+        st.markdown("#### Joint Term Scheduling")
+        st.info("Schedules every semester of the chosen degree types in one run against shared days and slots, "
+                "so students enrolled across semesters cannot clash between separately scheduled timetables.")
+        joint_degrees = st.multiselect("Degree Types", DEGREE_TYPES, default=DEGREE_TYPES, key="joint_degrees")
+        if st.button("Schedule Whole Term", key="joint_schedule_btn"):
+            index = get_enrollment_index()
+            if index is None:
+                st.error("Joint scheduling needs the Nominal Role File. Upload the NRF first.")
+            elif not joint_degrees:
+                st.error("Select at least one degree type.")
+            else:
+                runs = joint_term_runs(st.session_state.pmf_hash, rules_hash, st.session_state.nrf_hash,
+                                       tuple(joint_degrees), st.session_state.paper_master_df, semester_rules, index)
+                start_job("joint_schedule", "Schedule Whole Term", joint_schedule_job, runs, index, sched_start,
+                          sched_end, list(holidays), weekends, groups=deepcopy(st.session_state.combination_groups),
+                          slots=exam_slots, seat_capacity=slot_seats or None)
+
+        joint_result = finished_job("joint_schedule")
+        if joint_result is not None:
+            runs, final_list, details, n_clashes = joint_result
+            if final_list is None:
+                st.error("Not enough valid business days or slot seats to schedule the whole term.")
+            else:
+                st.session_state.exam_date_list = final_list
+                # the Time Table Generator then covers the papers of every run
+                st.session_state.filtered_pmf = pd.concat([papers for _, _, papers in runs]).drop_duplicates(subset=['Paper Code'])
+                summary = []
+                for run_degree, run_semester, papers in runs:
+                    run_exams = run_exam_list(final_list, papers)
+                    summary.append({"Degree": run_degree, "Semester": run_semester, "Papers": len(run_exams),
+                                    "Exam Days": len({d for _, d, _ in run_exams}),
+                                    "First Exam": min(d for _, d, _ in run_exams).strftime("%Y-%m-%d") if run_exams else "",
+                                    "Last Exam": max(d for _, d, _ in run_exams).strftime("%Y-%m-%d") if run_exams else ""})
+                st.success(f"Scheduled {details['courses']} papers from {len(runs)} degree/semester runs "
+                           f"on {len({d for _, d, _ in final_list})} exam days with {n_clashes} clashing course pairs.")
+                st.dataframe(pd.DataFrame(summary))
+
         if st.button("Send Dates to Time Table Generator", key="send_dates"):
             if st.session_state.exam_date_list:
-                st.session_state.timetable_exam_dates = st.session_state.exam_date_list.copy()
+                replace_exam_dates(st.session_state.exam_date_list)
                 st.success("Exam dates sent to Time Table Generator.")
             else:
                 st.error("No exam dates available. Please schedule exams first.")
@@ -611,36 +703,167 @@ elif nav_tab == "Time Table Generator":
         if st.button("Check Conflicts", key="check_conflicts_mod2"):
             if not exam_dates:
                 st.info("No exam dates to check.")
-            elif st.session_state.nominal_role_df is None:
+            elif get_enrollment_index() is None:
                 st.error("Please upload the Nominal Role File first.")
             else:
-                conflicts = check_full_schedule_conflict(st.session_state.nominal_role_df, exam_dates)
-                if conflicts:
-                    st.error("Conflicts detected:")
-                    for c in conflicts:
-                        st.write(c)
+                clashes = find_clashes(get_enrollment_index(), exam_dates,
+                                       include_students=st.session_state.get("show_clash_students", False))
+                if clashes:
+                    clash_df = clashes_to_frame(clashes)
+                    slot_totals = clash_df.groupby(["Exam Date", "Time Slot"], as_index=False)["Shared Students"].sum()
+                    st.error(f"Conflicts detected: {len(clash_df)} clashing course pairs in {len(slot_totals)} slots.")
+                    st.dataframe(slot_totals)
+                    st.dataframe(clash_df)
+                    download_csv(clash_df, "conflict_report.csv")
                 else:
                     st.success("No scheduling conflicts found.")
+        st.checkbox("Show affected registration numbers", key="show_clash_students")
     with conflict_col2:
         if st.button("Auto-Resolve Conflicts", key="auto_resolve_mod2"):
             if not exam_dates:
                 st.error("No scheduled exams found. Please schedule exams first.")
-            elif st.session_state.nominal_role_df is None:
+            elif get_enrollment_index() is None:
                 st.error("Please upload the Nominal Role File first.")
             else:
-                with st.spinner("Resolving conflicts..."):
-                    resolved_list, log = resolve_conflicts(
-                        exam_dates,
-                        st.session_state.nominal_role_df,
-                        st.session_state.holiday_dates,
-                        weekends={6}
-                    )
-                    st.session_state.timetable_exam_dates = resolved_list
-                    st.session_state.exam_date_list = resolved_list
-                    st.success("Conflict resolution completed. Regenerate timetable to see updates.")
-                    st.write("Resolution Log:")
-                    for entry in log:
-                        st.write(entry)
+                idm_courses = idm_courses_from_pmf(st.session_state.paper_master_df)
+                exam_slots, slot_seats = exam_slot_config()
+                start_job(
+                    "resolve",
+                    "Auto-Resolve Conflicts",
+                    resolve_conflicts,
+                    list(exam_dates),
+                    get_enrollment_index(),
+                    list(st.session_state.holiday_dates),
+                    weekends=set(st.session_state.weekends),
+                    idm_courses=idm_courses,
+                    slots=exam_slots,
+                    seat_capacity=slot_seats or None
+                )
+        resolve_result = finished_job("resolve")
+        if resolve_result is not None:
+            resolved_list, log = resolve_result
+            replace_exam_dates(resolved_list)
+            st.success("Conflict resolution completed. Regenerate timetable to see updates.")
+            st.write("Resolution Log:")
+            for entry in log:
+                st.write(entry)
+    
+    st.subheader("Timetable Optimization")
+    optimize_budget = st.number_input("Optimization Time Budget (seconds)", min_value=1, max_value=120, value=5, key="optimize_budget")
+    if st.button("Optimize Timetable", key="optimize_mod2"):
+        if not exam_dates:
+            st.error("No scheduled exams found. Please schedule exams first.")
+        elif get_enrollment_index() is None:
+            st.error("Please upload the Nominal Role File first.")
+        else:
+            fixed_courses = {c for grp in st.session_state.combination_groups for c in grp["courses"]} | {"UELS-201"}
+            # the semester's paper limits hold per sitting, like the schedulers apply them
+            min_papers, max_papers = papers_per_day_bounds(st.session_state.selected_semester) if st.session_state.selected_semester else (None, None)
+            exam_slots, slot_seats = exam_slot_config()
+            start_job(
+                "optimize",
+                "Optimize Timetable",
+                optimize_schedule,
+                list(exam_dates),
+                get_enrollment_index(),
+                list(st.session_state.holiday_dates),
+                weekends=set(st.session_state.weekends),
+                time_limit=optimize_budget,
+                fixed_courses=fixed_courses,
+                min_papers_per_slot=min_papers,
+                max_papers_per_slot=max_papers,
+                slots=exam_slots,
+                seat_capacity=slot_seats or None,
+                pmf_df=st.session_state.paper_master_df
+            )
+    optimize_result = finished_job("optimize")
+    if optimize_result is not None:
+        optimized_list, report = optimize_result
+        replace_exam_dates(optimized_list)
+        st.success(f"Optimization completed: cost {report['initial_cost']:.0f} -> {report['final_cost']:.0f} "
+                   f"in {report['iterations']} iterations. Regenerate timetable to see updates.")
+        st.table(pd.DataFrame([report["initial_components"], report["final_components"]], index=["Before", "After"]))
+        st.line_chart(pd.DataFrame(report["trajectory"]).set_index("time")[["cost", "best"]])
+    
+    st.subheader("Student Load")
+    if st.button("Compute Student Load Metrics", key="student_load_mod2"):
+        if not exam_dates:
+            st.error("No scheduled exams found. Please schedule exams first.")
+        elif get_enrollment_index() is None:
+            st.error("Please upload the Nominal Role File first.")
+        else:
+            st.session_state.student_load = student_load_metrics(get_enrollment_index(), exam_dates,
+                                                                 st.session_state.paper_master_df)
+    load_df = st.session_state.student_load
+    if load_df is not None:
+        overall = student_load_summary(load_df, by=())
+        st.dataframe(student_load_summary(load_df))
+        load_col1, load_col2 = st.columns(2)
+        with load_col1:
+            metric = st.selectbox("Distribution of", LOAD_METRIC_COLUMNS, index=2, key="load_metric")
+            st.dataframe(metric_distribution(load_df, metric))
+        with load_col2:
+            worst_n = st.number_input("Worst Students per Programme/Semester", min_value=1, max_value=100, value=5, key="worst_n")
+            worst_df = worst_student_loads(load_df, worst_n)
+            st.dataframe(worst_df)
+        if st.button("Keep as Baseline for Comparison", key="load_baseline_mod2"):
+            st.session_state.student_load_baseline = overall
+        if st.session_state.student_load_baseline is not None:
+            st.table(pd.concat([st.session_state.student_load_baseline, overall], ignore_index=True)
+                     .drop(columns="All").set_axis(["Baseline", "Current"]))
+        download_csv(load_df, "student_load.csv")
+    
+    st.subheader("Export")
+    export_col1, export_col2 = st.columns(2)
+    with export_col1:
+        export_formats = st.multiselect("Formats", EXPORT_FORMATS, default=EXPORT_FORMATS, key="export_formats")
+    with export_col2:
+        export_personal = st.checkbox("Personal timetables for every NRF student", value=True, key="export_personal")
+    if st.button("Build Export Bundle", key="export_mod2"):
+        if not exam_dates:
+            st.error("No scheduled exams found. Please schedule exams first.")
+        elif st.session_state.filtered_pmf is None:
+            st.error("Please upload the Paper Master File (PMF) first.")
+        else:
+            if export_personal and get_enrollment_index() is None:
+                st.info("Personal timetables need the Nominal Role File and will be left out.")
+            start_job("export", "Export Bundle", export_job, list(exam_dates), st.session_state.filtered_pmf,
+                      get_enrollment_index(), formats=list(export_formats), personal=export_personal)
+    export_result = finished_job("export")
+    if export_result is not None:
+        exported, bundle = export_result
+        if not exported:
+            st.error("No matching courses found to export.")
+        else:
+            st.download_button("Download Export Bundle", data=bundle, file_name="timetable_export.zip",
+                               mime="application/zip")
+    
+    st.subheader("Seating Allocation")
+    hall_file = st.file_uploader("Hall Inventory (Hall, and Capacity and/or Rows, Columns)", type=["xlsx", "xls", "csv"],
+                                 key="hall_inventory")
+    seating_interleave = st.checkbox("Interleave papers seat by seat within each hall", value=False,
+                                     key="seating_interleave")
+    if st.button("Allocate Seats", key="seating_mod2"):
+        if not exam_dates:
+            st.error("No scheduled exams found. Please schedule exams first.")
+        elif get_enrollment_index() is None:
+            st.error("Seating needs the Nominal Role File (NRF). Please upload it first.")
+        elif hall_file is None:
+            st.error("Please upload the hall inventory first.")
+        else:
+            start_job("seating", "Seating Allocation", seating_job, get_enrollment_index(), list(exam_dates),
+                      read_upload(hall_file.getvalue(), hall_file.name), seating_interleave)
+    seating_result = finished_job("seating")
+    if seating_result is not None:
+        n_seats, seating_summary, seating_zip = seating_result
+        unseated = seating_summary[seating_summary['Hall'] == UNSEATED]
+        if len(unseated):
+            st.warning(f"{int(unseated['Students'].sum())} students across {len(unseated)} sittings "
+                       "did not fit the halls and are listed as Unseated.")
+        st.success(f"Allocated {n_seats} seats in {len(seating_summary)} hall sittings.")
+        st.dataframe(seating_summary)
+        st.download_button("Download Seat Lists", data=seating_zip, file_name="seating.zip",
+                           mime="application/zip")
     
     if st.button("Generate Timetable", key="generate_timetable_mod2"):
         if not exam_dates:
@@ -648,47 +871,38 @@ elif nav_tab == "Time Table Generator":
         elif st.session_state.filtered_pmf is None:
             st.error("Please upload the Paper Master File (PMF) first.")
         else:
-            df_papers = st.session_state.filtered_pmf.copy()
-            if timetable_type == "By Program" and programme:
-                df_papers = df_papers[df_papers['Programme Name'] == programme]
-            if df_papers.empty:
+            display_df, original_df = build_timetable(exam_dates, st.session_state.filtered_pmf,
+                                                      programme if timetable_type == "By Program" else None)
+            if display_df is None:
                 st.error("No matching courses found with the selected filters.")
             else:
-                timetable_entries = []
-                for course, dt_obj, slot in exam_dates:
-                    row_match = df_papers[df_papers['Paper Code'].astype(str).str.strip() == course.strip()]
-                    if not row_match.empty:
-                        paper_title = row_match.iloc[0]['Paper Title']
-                        programme_entry = row_match.iloc[0]['Programme Name']
-                        timetable_entries.append((dt_obj, slot, course, paper_title, programme_entry))
-                    else:
-                        timetable_entries.append((dt_obj, slot, course, "Unknown Title", "Unknown Programme"))
-                timetable_entries.sort(key=lambda x: (x[0], x[1]))
-                grouped = {}
-                for entry in timetable_entries:
-                    date_key = entry[0].strftime('%d/%m/%Y')
-                    if date_key not in grouped:
-                        grouped[date_key] = []
-                    grouped[date_key].append(entry)
-
-                merged_rows = []
-                for date, entries in grouped.items():
-                    merged_rows.append([date, "", "", "", ""])
-                    for entry in entries:
-                        dt_obj, slot, code, title, program = entry
-                        merged_rows.append(["", slot, code, title, program])
-
-                display_columns = ['Date', 'Time Slot', 'Paper Code', 'Paper Title', 'Programs']
-                display_df = pd.DataFrame(merged_rows, columns=display_columns)
-
                 st.session_state.generated_timetable = display_df
-                st.session_state.original_timetable = pd.DataFrame(timetable_entries, columns=display_columns)
+                st.session_state.original_timetable = original_df
                 st.success("Exam Timetable generated successfully.")
+
+    if timetable_type == "By Program" and st.button("Generate All Programme Timetables", key="generate_all_programmes_mod2"):
+        if not exam_dates:
+            st.error("No exam dates assigned. Please schedule exams in Exam Date Entry first.")
+        elif st.session_state.filtered_pmf is None:
+            st.error("Please upload the Paper Master File (PMF) first.")
+        else:
+            start_job("programme_timetables", "Programme Timetables", build_programme_timetables, list(exam_dates),
+                      st.session_state.filtered_pmf)
+    programme_timetables = finished_job("programme_timetables")
+    if programme_timetables is not None:
+        for programme_name, (programme_display_df, _) in programme_timetables.items():
+            with st.expander(programme_name):
+                st.dataframe(programme_display_df)
+        if programme_timetables:
+            all_programmes_df = pd.concat(
+                [df.assign(Programme=name) for name, (_, df) in programme_timetables.items()], ignore_index=True)
+            all_programmes_df['Date'] = all_programmes_df['Date'].dt.strftime('%d/%m/%Y')
+            download_csv(all_programmes_df, "programme_timetables.csv")
                 
     
-        if st.session_state.generated_timetable is not None:
-            st.subheader("Editable Timetable")
-            edited_df = st.data_editor(
+    if st.session_state.generated_timetable is not None:
+        st.subheader("Editable Timetable")
+        edited_df = st.data_editor(
             st.session_state.original_timetable,
             num_rows="dynamic",
             column_config={
@@ -699,37 +913,30 @@ elif nav_tab == "Time Table Generator":
                 ),
                 "Time Slot": st.column_config.SelectboxColumn(
                     "Time Slot",
-                    options=["09:00 - 10:30", "09:00 - 11:00"],
+                    options=slot_options(exam_dates),
                     required=True
                 )
             },
             key="edit_timetable_mod2"
         )
+        edited_exams, errors = edited_exam_list(edited_df, slot_options(exam_dates))
+        # exams the editor does not show (other programmes, papers outside the PMF) keep their dates
+        shown_codes = set(st.session_state.original_timetable['Paper Code'].astype(str).str.strip())
+        updated_exams = [exam for exam in exam_dates if exam[0].strip() not in shown_codes] + edited_exams
+
+        # live feedback: only the clashes of papers whose date or slot changed are recomputed
+        if not errors and get_enrollment_index() is not None:
+            added, removed, moved = clash_delta(get_enrollment_index(), exam_dates, updated_exams)
+            if moved:
+                st.info(f"{len(moved)} papers changed: {len(added)} new clashes, {len(removed)} clashes removed.")
+            if added:
+                st.error("New clashes from these edits:")
+                st.dataframe(clashes_to_frame(added))
+            if removed:
+                st.success("Clashes removed by these edits:")
+                st.dataframe(clashes_to_frame(removed))
         
         if st.button("Save Edited Dates", key="save_edit_timetable_mod2"):
-            errors = []
-            updated_exams = []
-            
-            for idx, row in edited_df.iterrows():
-                try:
-                    if isinstance(row['Date'], str):
-                        dt_obj = datetime.strptime(row['Date'], '%d/%m/%Y')
-                    else:
-                        dt_obj = row['Date']
-                    
-                    valid_slots = ["09:00 - 10:30", "09:00 - 11:00"]
-                    if row['Time Slot'] not in valid_slots:
-                        raise ValueError(f"Invalid time slot: {row['Time Slot']}")
-                    
-                    updated_exams.append((
-                        row['Paper Code'],
-                        dt_obj,
-                        row['Time Slot']
-                    ))
-                    
-                except Exception as e:
-                    errors.append(f"Row {idx+1} ({row['Paper Code']}): {str(e)}")
-            
             if errors:
                 st.error("Errors found:")
                 for error in errors:
@@ -738,7 +945,7 @@ elif nav_tab == "Time Table Generator":
                 st.session_state.timetable_exam_dates = updated_exams
                 st.session_state.exam_date_list = updated_exams
                 st.success("Edited exam dates saved successfully!")
-                st.experimental_rerun()
+                st.rerun()
         
         st.dataframe(edited_df)
         download_csv(edited_df, "exam_timetable.csv")
@@ -747,20 +954,28 @@ elif nav_tab == "Time Table Generator":
 elif nav_tab == "Student Count":
     st.header("Student Count Module")
     if st.button("Calculate Student Count", key="calc_student_count"):
-        if st.session_state.nominal_role_df is None:
+        if get_enrollment_index() is None:
             st.error("Please upload the Nominal Role File (NRF) first.")
         else:
-            count_dict = {}
-            df_nrf = st.session_state.nominal_role_df
-            for col in df_nrf.columns:
-                if "Code" in col and not col.startswith(("Programme", "Sl")):
-                    for val in df_nrf[col].dropna():
-                        code = str(val).strip()
-                        if code:
-                            count_dict[code] = count_dict.get(code, 0) + 1
-            student_count_df = pd.DataFrame(list(count_dict.items()), columns=['Paper Code', 'Student Count'])
-            student_count_df.sort_values(by='Paper Code', inplace=True)
+            student_count_df = get_enrollment_index().student_counts_frame()
             st.session_state.student_count_data = student_count_df
             st.success("Student count calculated successfully.")
             st.dataframe(student_count_df)
             download_csv(student_count_df, "student_count.csv")
+
+# Profiling Panel
+with st.sidebar:
+    with st.expander("Profiling"):
+        st.checkbox("Profile runs", key="profile_runs")
+        st.checkbox("Trace peak memory (slower)", key="profile_memory")
+        if job_profiles:
+            st.session_state.last_profile = job_profiles[-1]
+        elif profiler is not None and profiler.spans:
+            st.session_state.last_profile = profiler
+        last_profile = st.session_state.last_profile
+        if last_profile is None:
+            st.caption("Enable profiling and run an action to see its breakdown.")
+        else:
+            st.dataframe(pd.DataFrame(last_profile.summary()).set_index("name"))
+            st.download_button("Download Profile JSON", data=last_profile.to_json(), file_name="profile.json",
+                               mime="application/json")